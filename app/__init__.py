@@ -17,8 +17,35 @@ def create_app():
     # --- Konfigurasi ---
     app.config['SECRET_KEY'] = 'rahasia123'
     basedir = os.path.abspath(os.path.dirname(__file__))
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, '..', 'instance', 'users.db')
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+        'DATABASE_URL', 'sqlite:///' + os.path.join(basedir, '..', 'instance', 'users.db'))
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # SQLite connection profile: 'production' (WAL, busy timeout, pragmas) or 'default'
+    app.config['SQLITE_PROFILE'] = os.environ.get('SQLITE_PROFILE', 'production')
+    app.config['SQLITE_BUSY_TIMEOUT'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 15000))
+    app.config['SQLITE_POOL_SIZE'] = int(os.environ.get('SQLITE_POOL_SIZE', 10))
+    # PostgreSQL (DATABASE_URL=postgresql://...): pool size and session time zone
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+    app.config['DB_TIMEZONE'] = os.environ.get('DB_TIMEZONE', 'Asia/Jakarta')
+    # Per-request SQL instrumentation (superadmin 'Performa SQL' page)
+    app.config['SQL_INSTRUMENTATION'] = os.environ.get('SQL_INSTRUMENTATION', 'true').lower() in ['true', '1', 'yes', 'on']
+    app.config['SQL_SLOW_QUERY_MS'] = float(os.environ.get('SQL_SLOW_QUERY_MS', 200))
+    app.config['SQL_NPLUS1_THRESHOLD'] = int(os.environ.get('SQL_NPLUS1_THRESHOLD', 5))
+    # Create missing model indexes on startup (disable if the DB user cannot run DDL)
+    app.config['DB_AUTO_INDEX'] = os.environ.get('DB_AUTO_INDEX', 'true').lower() in ['true', '1', 'yes', 'on']
+    # On-demand request profiler for superadmins (header X-Profile: 1 or ?_profile=1)
+    app.config['PROFILER_ENABLED'] = os.environ.get('PROFILER_ENABLED', 'true').lower() in ['true', '1', 'yes', 'on']
+    app.config['PROFILER_KEEP'] = int(os.environ.get('PROFILER_KEEP', 50))
+    # Prometheus /metrics: localhost only unless a bearer token is configured
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', 'true').lower() in ['true', '1', 'yes', 'on']
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+    app.config['METRICS_ALLOWED_IPS'] = [ip.strip() for ip in os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip.strip()]
+    # Number of reverse proxies (nginx) in front of the app; >0 enables ProxyFix for X-Forwarded-*
+    app.config['TRUSTED_PROXIES'] = int(os.environ.get('TRUSTED_PROXIES', 0))
+    if app.config['TRUSTED_PROXIES']:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        count = app.config['TRUSTED_PROXIES']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=count, x_proto=count, x_host=count)
     
     # Email Configuration - Add these configurations
     app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
@@ -28,15 +55,60 @@ def create_app():
     app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME')
     app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
     app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', os.environ.get('MAIL_USERNAME'))
+    app.config['MAIL_TIMEOUT'] = int(os.environ.get('MAIL_TIMEOUT', 30))
+
+    # Email outbox: dikirim di background, dicoba ulang dengan backoff
+    app.config['EMAIL_OUTBOX_ENABLED'] = os.environ.get('EMAIL_OUTBOX_ENABLED', 'true').lower() in ['true', '1', 'yes', 'on']
+    app.config['EMAIL_OUTBOX_INTERVAL'] = int(os.environ.get('EMAIL_OUTBOX_INTERVAL', 10))
+    app.config['EMAIL_OUTBOX_MAX_ATTEMPTS'] = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 5))
+    # Broadcast email: jumlah koneksi SMTP paralel & batas pesan per detik (0 = tanpa batas)
+    app.config['BROADCAST_SMTP_POOL'] = int(os.environ.get('BROADCAST_SMTP_POOL', 3))
+    app.config['BROADCAST_RATE_LIMIT'] = float(os.environ.get('BROADCAST_RATE_LIMIT', 5))
     
     # File Upload Configuration
     app.config['MAX_CONTENT_LENGTH'] = 2 * 1024 * 1024  # 2MB max file size
     app.config['UPLOAD_FOLDER'] = os.path.join(basedir, 'static', 'uploads', 'resi')
+
+    # Statistics rollup: rebuild fully in the background when older than this many seconds
+    app.config['STATISTIK_CUBE_MAX_AGE'] = int(os.environ.get('STATISTIK_CUBE_MAX_AGE', 900))
+    # A background rebuild claim older than this is considered dead and can be taken over
+    app.config['STATISTIK_CUBE_REBUILD_TIMEOUT'] = int(os.environ.get('STATISTIK_CUBE_REBUILD_TIMEOUT', 600))
+    # Superadmin dashboard summary: invalidated on writes, rebuilt at least this often
+    app.config['DASHBOARD_CACHE_MAX_AGE'] = int(os.environ.get('DASHBOARD_CACHE_MAX_AGE', 300))
+    # Query result cache for reference data: 'sqlite' (shared by workers), 'memory' or 'none'
+    app.config['QUERY_CACHE_BACKEND'] = os.environ.get('QUERY_CACHE_BACKEND', 'sqlite')
+    app.config['QUERY_CACHE_DEFAULT_TTL'] = int(os.environ.get('QUERY_CACHE_DEFAULT_TTL', 300))
+    # Full-page cache for anonymous public pages; stale pages are served while re-rendering
+    app.config['PAGE_CACHE_ENABLED'] = os.environ.get('PAGE_CACHE_ENABLED', 'true').lower() in ['true', '1', 'yes', 'on']
+    app.config['PAGE_CACHE_BACKEND'] = os.environ.get('PAGE_CACHE_BACKEND', 'sqlite')
+    app.config['PAGE_CACHE_TTL'] = int(os.environ.get('PAGE_CACHE_TTL', 300))
+    app.config['PAGE_CACHE_STALE'] = int(os.environ.get('PAGE_CACHE_STALE', 600))
+    # ETag / Last-Modified validators -> 304 for public pages and chart APIs
+    app.config['CONDITIONAL_ENABLED'] = os.environ.get('CONDITIONAL_ENABLED', 'true').lower() in ['true', '1', 'yes', 'on']
+    # Jinja {% cache %} fragments (navbar, sidebars, news cards): 'sqlite', 'memory' or 'none'
+    app.config['FRAGMENT_CACHE_BACKEND'] = os.environ.get('FRAGMENT_CACHE_BACKEND', 'sqlite')
+    app.config['FRAGMENT_CACHE_DEFAULT_TTL'] = int(os.environ.get('FRAGMENT_CACHE_DEFAULT_TTL', 600))
+    # Compiled Jinja templates on disk, shared by all workers (fill with `flask template-warmup`)
+    app.config['TEMPLATE_BYTECODE_CACHE'] = os.environ.get('TEMPLATE_BYTECODE_CACHE', 'true').lower() in ['true', '1', 'yes', 'on']
+    if os.environ.get('TEMPLATE_CACHE_DIR'):
+        app.config['TEMPLATE_CACHE_DIR'] = os.environ['TEMPLATE_CACHE_DIR']
+    # gzip/brotli for HTML, JSON and CSS/JS responses; static files use `flask static-compress` siblings
+    app.config['COMPRESS_ENABLED'] = os.environ.get('COMPRESS_ENABLED', 'true').lower() in ['true', '1', 'yes', 'on']
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 500))
+    app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', 6))
+    # Uploads / PDFs / receipts: 'direct' (Flask, with Range), 'x-accel' (nginx) or 'x-sendfile' (Apache)
+    app.config['FILE_DELIVERY'] = os.environ.get('FILE_DELIVERY', 'direct')
+    app.config['FILE_DELIVERY_ACCEL_PREFIX'] = os.environ.get('FILE_DELIVERY_ACCEL_PREFIX', '/_berkas/')
     instance_path = os.path.join(basedir, '..', 'instance')
     os.makedirs(instance_path, exist_ok=True)
 
     # --- Inisialisasi Ekstensi ---
+    from .utils.sqlite_profile import configure_sqlite_engine, init_sqlite_profile
+    from .utils.db_compat import configure_postgresql_engine
+    configure_sqlite_engine(app)
+    configure_postgresql_engine(app)
     db.init_app(app)
+    init_sqlite_profile(app)
     migrate.init_app(app, db)
 
     # --- Impor & Daftarkan Blueprint dari Controllers ---
@@ -49,6 +121,73 @@ def create_app():
     # --- Impor Model ---
     from . import models
 
+    # Jumlah & waktu query per request, dugaan N+1, log query lambat
+    from .utils.sql_instrumentation import init_sql_instrumentation
+    init_sql_instrumentation(app)
+
+    # Latensi per endpoint, status, waktu DB, render PDF, upload -> /metrics
+    from .utils.metrics import init_metrics
+    init_metrics(app)
+
+    # Profil cProfile on-demand untuk superadmin (X-Profile: 1 / ?_profile=1)
+    from .utils.request_profiler import init_request_profiler
+    init_request_profiler(app)
+
+    # Lengkapi index model yang belum ada di database lama
+    from .utils.db_indexes import init_db_indexes
+    init_db_indexes(app)
+
+    # Hook rollup statistik (ditambal otomatis setelah commit)
+    from .utils.statistik_cube import init_statistik_cube
+    init_statistik_cube(app)
+
+    # Cache hasil query data referensi (diinvalidasi per tabel setelah commit)
+    from .utils.query_cache import init_query_cache
+    init_query_cache(app)
+
+    # Cache halaman publik anonim (ikut hook invalidasi query cache)
+    from .utils.page_cache import init_page_cache
+    init_page_cache(app)
+
+    # Respons 304 dari validator murah (COUNT + MAX(updated_at) / versi rollup)
+    from .utils.conditional import init_conditional
+    init_conditional(app)
+
+    # Tag {% cache %} untuk fragmen template bersama
+    from .utils.fragment_cache import init_fragment_cache
+    init_fragment_cache(app)
+
+    # Bytecode template di instance/jinja_cache (worker baru tidak kompilasi ulang)
+    from .utils.template_cache import init_template_cache
+    init_template_cache(app)
+
+    # Kompresi respons & file static .br/.gz
+    from .utils.compression import init_compression
+    init_compression(app)
+
+    # Pengiriman file (X-Accel-Redirect / X-Sendfile) dan URL upload berversi hash
+    from .utils.file_delivery import init_file_delivery
+    init_file_delivery(app)
+
+    # Hook invalidasi cache dashboard superadmin
+    from .utils.dashboard_cache import init_dashboard_cache
+    init_dashboard_cache(app)
+
+    # Hook tabel peringkat donatur (dihitung ulang per donatur setelah commit)
+    from .utils.peringkat_donatur import init_peringkat_donatur
+    init_peringkat_donatur(app)
+
+    # Pengirim email outbox di background
+    from .utils.email_outbox import init_email_outbox
+    init_email_outbox(app)
+
+    from .utils.email_broadcast import init_email_broadcast
+    init_email_broadcast(app)
+
+    # Perintah CLI (flask statistik-refresh, ...)
+    from .commands import register_commands
+    register_commands(app)
+
     # Import SessionManager saja
     from .utils.session_manager import SessionManager
     
@@ -1,10 +1,8 @@
 from .models import db, User, PerpusDesa, KegiatanPerpus, KebutuhanKoleksi, DetailKebutuhanKoleksi, SubjekBuku, \
                     DetailPerpus, get_wib_datetime, Donasi, DetailDonasi
 from werkzeug.security import generate_password_hash
-import pandas as pd
 import random
 from datetime import datetime, timedelta
-import requests
 import os
 
 def setup_database():
@@ -43,6 +41,8 @@ def setup_database():
     # --- Impor Data Perpustakaan ---
     print("\n--- Memulai Proses Impor Data Perpustakaan ---")
     try:
+        import pandas as pd
+
         df = pd.read_excel("DATA PERPUSDES & TBM.xlsx")
         df.columns = df.columns.str.strip()
         print(f"INFO: Kolom yang terdeteksi di Excel: {list(df.columns)}")
@@ -609,6 +609,8 @@ def generate_dummy_data():
 def download_sample_image(filename):
     """Download sample image from internet and save to static folder"""
     try:
+        import requests
+
         # Create directory if not exists
         from flask import current_app
         upload_folder = os.path.join('app', 'static', 'public', 'kegiatan-perpus')
@@ -648,4 +650,177 @@ def download_sample_image(filename):
             
     except Exception as e:
         print(f"  ❌ Error download foto {filename}: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def register_commands(app):
+    """Daftarkan perintah CLI `flask ...` untuk aplikasi"""
+    import click
+
+    @app.cli.command('statistik-refresh')
+    def statistik_refresh_command():
+        """Bangun ulang rollup statistik (jalankan berkala lewat cron)."""
+        from .utils.statistik_cube import refresh_statistik_cube
+        refresh_statistik_cube()
+        click.echo("✅ Rollup statistik berhasil dibangun ulang.")
+
+    @app.cli.command('donatur-refresh')
+    def donatur_refresh_command():
+        """Hitung ulang seluruh tabel peringkat donatur."""
+        from .utils.peringkat_donatur import refresh_peringkat_donatur
+        refresh_peringkat_donatur()
+        click.echo("✅ Peringkat donatur berhasil dihitung ulang.")
+
+    @app.cli.command('email-outbox')
+    @click.option('--limit', default=100, show_default=True, help='Jumlah email maksimal yang dikirim.')
+    def email_outbox_command(limit):
+        """Kirim email yang menunggu di outbox (tanpa thread background)."""
+        from .utils.email_outbox import process_outbox
+        sent, failed = process_outbox(limit=limit)
+        click.echo(f"📧 Outbox: {sent} terkirim, {failed} gagal.")
+
+    @app.cli.command('broadcast-kirim')
+    @click.argument('broadcast_id', type=int)
+    def broadcast_kirim_command(broadcast_id):
+        """Jalankan / lanjutkan broadcast email di foreground dari checkpoint terakhir."""
+        from .models import db, EmailBroadcast
+        from .utils.email_broadcast import run_broadcast
+        if not run_broadcast(broadcast_id):
+            click.echo("⚠️ Broadcast tidak ditemukan, sudah selesai, atau sedang dijalankan proses lain.")
+            return
+        broadcast = db.session.get(EmailBroadcast, broadcast_id)
+        click.echo(f"📧 Broadcast {broadcast_id}: {broadcast.status}, {broadcast.terkirim}/{broadcast.total} terkirim, "
+                   f"{broadcast.gagal} dialihkan ke outbox, {broadcast.throughput} pesan/detik.")
+
+    @app.cli.command('cache-clear')
+    def cache_clear_command():
+        """Kosongkan query cache, cache halaman publik dan fragmen template (mis. setelah mengubah data langsung di database)."""
+        from .utils.fragment_cache import fragment_cache
+        from .utils.page_cache import page_cache
+        from .utils.query_cache import query_cache
+        query_cache.clear()
+        page_cache.clear()
+        fragment_cache.clear()
+        click.echo("✅ Query cache, cache halaman dan fragmen template dikosongkan.")
+
+    @app.cli.command('db-salin')
+    @click.argument('sumber')
+    @click.option('--ganti', is_flag=True, help='Hapus data yang sudah ada di database tujuan.')
+    def db_salin_command(sumber, ganti):
+        """Salin data dari SUMBER (URL database, mis. sqlite:///instance/users.db) ke DATABASE_URL."""
+        from .utils.db_compat import copy_database
+        try:
+            copied = copy_database(sumber, replace=ganti)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        for table, count in copied:
+            click.echo(f"  {table}: {count} baris")
+        click.echo(f"✅ {len(copied)} tabel disalin.")
+
+    @app.cli.command('db-cek')
+    def db_cek_command():
+        """Uji query yang bergantung dialek (SQLite / PostgreSQL) pada DATABASE_URL aktif."""
+        from .utils.db_compat import check_portability
+        results = check_portability()
+        click.echo(f"Database: {db.engine.dialect.name}")
+        for name, ok, detail in results:
+            click.echo(f"  {'✅' if ok else '❌'} {name}" + (f" ({detail})" if detail else ''))
+        if not all(ok for _, ok, _ in results):
+            raise SystemExit(1)
+
+    @app.cli.command('db-index')
+    def db_index_command():
+        """Buat index yang dideklarasikan di model tetapi belum ada di database."""
+        from .utils.db_indexes import ensure_indexes
+        created = ensure_indexes()
+        click.echo(f"✅ {len(created)} index dibuat." + (f" ({', '.join(created)})" if created else ''))
+
+    @app.cli.command('db-explain')
+    @click.option('--verbose', '-v', is_flag=True, help='Tampilkan seluruh query plan.')
+    def db_explain_command(verbose):
+        """Cek EXPLAIN QUERY PLAN query utama; gagal jika ada full scan tabel besar."""
+        from .utils.db_indexes import explain_key_queries
+        try:
+            results = explain_key_queries()
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        for name, plan, scans in results:
+            click.echo(f"{'❌' if scans else '✅'} {name}" + (f" (full scan: {', '.join(scans)})" if scans else ''))
+            if verbose or scans:
+                for detail in plan:
+                    click.echo(f"      {detail}")
+        if any(scans for _, _, scans in results):
+            raise SystemExit(1)
+
+    @app.cli.command('template-warmup')
+    @click.option('--verbose', is_flag=True, help='Tampilkan waktu kompilasi setiap template.')
+    def template_warmup_command(verbose):
+        """Kompilasi semua template Jinja ke cache bytecode (jalankan saat deploy)."""
+        from .utils.template_cache import warm_templates
+
+        if app.jinja_env.bytecode_cache is None:
+            raise click.ClickException("Cache bytecode template tidak aktif (TEMPLATE_BYTECODE_CACHE=false).")
+        results = warm_templates(app)
+        failed = [(name, error) for name, _, error in results if error]
+        if verbose:
+            for name, elapsed_ms, error in sorted(results, key=lambda item: -item[1]):
+                click.echo(f"  {'❌' if error else '✅'} {name} {elapsed_ms:.1f} ms")
+        for name, error in failed:
+            click.echo(f"❌ {name}: {error}")
+        total_ms = sum(elapsed_ms for _, elapsed_ms, _ in results)
+        click.echo(f"✅ {len(results) - len(failed)} template dikompilasi dalam {total_ms:.0f} ms "
+                   f"-> {app.config['TEMPLATE_CACHE_DIR']}")
+        if failed:
+            raise SystemExit(1)
+
+    @app.cli.command('static-compress')
+    @click.option('--hapus', is_flag=True, help='Hapus semua file .gz/.br hasil kompresi.')
+    def static_compress_command(hapus):
+        """Tulis file .gz (dan .br jika paket brotli ada) di samping file static (jalankan saat deploy)."""
+        from .utils.compression import brotli, precompress_static, remove_precompressed
+
+        folder = app.static_folder
+        if hapus:
+            click.echo(f"✅ {remove_precompressed(folder)} file terkompresi dihapus.")
+            return
+        if brotli is None:
+            click.echo("ℹ️ Paket brotli tidak terpasang, hanya membuat .gz")
+        written = precompress_static(folder, app.config['COMPRESS_MIN_SIZE'])
+        for path, size, sizes in written:
+            detail = ', '.join(f"{encoding} {compressed / 1024:.1f} KB" for encoding, compressed in sizes.items())
+            click.echo(f"  {os.path.relpath(path, folder)}: {size / 1024:.1f} KB -> {detail}")
+        click.echo(f"✅ {len(written)} file static dikompresi.")
+
+    @app.cli.command('data-sintetis')
+    @click.option('--skala', type=click.Choice(['kecil', 'sedang', 'produksi']), default='kecil', show_default=True,
+                  help='Preset jumlah data; opsi per jenis di bawah menimpa preset.')
+    @click.option('--donatur', type=int, help='Jumlah user donatur baru.')
+    @click.option('--kunjungan', type=int, help='Jumlah kunjungan.')
+    @click.option('--donasi', type=int, help='Jumlah donasi (masing-masing 1-4 detail).')
+    @click.option('--distribusi', type=int, help='Jumlah riwayat distribusi.')
+    @click.option('--kebutuhan', type=int, help='Jumlah pengajuan kebutuhan koleksi.')
+    @click.option('--kegiatan', type=int, help='Jumlah artikel kegiatan perpus.')
+    @click.option('--hari', default=730, show_default=True, help='Rentang tanggal data ke belakang (hari).')
+    @click.option('--sampai', type=click.DateTime(formats=['%Y-%m-%d']),
+                  help='Tanggal data terbaru (YYYY-MM-DD); default tanggal tetap agar hasil bisa diulang.')
+    @click.option('--seed', default=42, show_default=True, help='Seed acak; seed sama menghasilkan data sama.')
+    @click.option('--gambar', default=12, show_default=True, help='Jumlah gambar placeholder per jenis.')
+    @click.option('--batch', default=5000, show_default=True, help='Baris per insert.')
+    def data_sintetis_command(skala, hari, sampai, seed, gambar, batch, **jumlah):
+        """Isi database dengan data sintetis berskala besar untuk uji performa."""
+        import time
+        from app.utils.synthetic_data import SCALE_PRESETS, SyntheticDataGenerator
+
+        target = dict(SCALE_PRESETS[skala])
+        target.update({key: value for key, value in jumlah.items() if value is not None})
+        click.echo(f"Target: {', '.join(f'{key}={value}' for key, value in target.items())} (seed {seed})")
+        started = time.perf_counter()
+        generator = SyntheticDataGenerator(seed=seed, hari=hari, batch_size=batch, sampai=sampai,
+                                           progress=lambda message: click.echo(f"  {message}"))
+        try:
+            counts = generator.run(target, gambar=gambar)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        for table, count in counts.items():
+            click.echo(f"✅ {table}: {count} baris")
+        click.echo(f"Selesai dalam {time.perf_counter() - started:.1f} detik")
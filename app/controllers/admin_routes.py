@@ -1,9 +1,13 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
 from app.models import db, User, PerpusDesa, KebutuhanKoleksi, DetailKebutuhanKoleksi, Kunjungan, DetailPerpus, KegiatanPerpus,\
-                       SubjekBuku, RiwayatDistribusi, DetailRiwayatDistribusi, Donasi
+                       RiwayatDistribusi, DetailRiwayatDistribusi, Donasi
 from app.utils.session_manager import SessionManager
+from app.utils.reference_data import get_subjek_list
+from app.utils.statistik_cube import month_range
+from app.utils.conditional import conditional, table_state
 from sqlalchemy import extract, func
-from datetime import datetime, date
+from sqlalchemy.orm import selectinload
+from datetime import datetime, date, timedelta
 import pytz
 from functools import wraps
 import os
@@ -177,18 +181,21 @@ def dashboard():
     # Calculate today's visits for this perpus (will reset to 0 when date changes in WIB)
     total_kunjungan_hari_ini = 0
     if perpus_id:
+        awal_hari = datetime.combine(current_date, datetime.min.time())
         total_kunjungan_hari_ini = Kunjungan.query.filter(
-            func.date(Kunjungan.tanggal) == current_date,
-            Kunjungan.perpus_id == perpus_id
+            Kunjungan.perpus_id == perpus_id,
+            Kunjungan.tanggal >= awal_hari,
+            Kunjungan.tanggal < awal_hari + timedelta(days=1)
         ).count()
     
     # Calculate this month's visits for this perpus (will reset to 0 when month changes in WIB)
     total_kunjungan_bulan_ini = 0
     if perpus_id:
+        awal_bulan, awal_bulan_depan = month_range(current_year, current_month)
         total_kunjungan_bulan_ini = Kunjungan.query.filter(
-            extract('month', Kunjungan.tanggal) == current_month,
-            extract('year', Kunjungan.tanggal) == current_year,
-            Kunjungan.perpus_id == perpus_id
+            Kunjungan.perpus_id == perpus_id,
+            Kunjungan.tanggal >= awal_bulan,
+            Kunjungan.tanggal < awal_bulan_depan
         ).count()
     
     # Calculate Kegiatan Tercatat - based on kegiatan_perpus table for this perpus
@@ -513,8 +520,11 @@ def kebutuhan_koleksi():
         return redirect(url_for('admin.kebutuhan_koleksi'))
     
     # GET request - show page with data
-    data_kebutuhan = KebutuhanKoleksi.query.filter_by(perpus_id=user.perpus_id).order_by(KebutuhanKoleksi.tanggal_pengajuan.desc()).all()
-    subjek_list = SubjekBuku.query.order_by(SubjekBuku.nama).all()
+    # Detail & subjek dimuat sekaligus (subjek_list dipakai per baris di template)
+    data_kebutuhan = KebutuhanKoleksi.query.options(
+        selectinload(KebutuhanKoleksi.detail_kebutuhan).joinedload(DetailKebutuhanKoleksi.subjek)
+    ).filter_by(perpus_id=user.perpus_id).order_by(KebutuhanKoleksi.tanggal_pengajuan.desc()).all()
+    subjek_list = get_subjek_list()
     
     return render_template('admin/kebutuhan_koleksi.html', 
                          data_kebutuhan=data_kebutuhan,
@@ -773,8 +783,14 @@ def kunjungan_analytics():
                          current_year=current_year,
                          perpus_id=perpus_id)
 
+def _kunjungan_tahun_state(year):
+    perpus_id = SessionManager.get_current_perpus_id('admin')
+    return [table_state(Kunjungan, Kunjungan.perpus_id == perpus_id,
+                        Kunjungan.tanggal >= datetime(year, 1, 1), Kunjungan.tanggal < datetime(year + 1, 1, 1))]
+
 @bp.route('/api/kunjungan-data/<int:year>')
 @admin_login_required
+@conditional(_kunjungan_tahun_state)
 def api_kunjungan_data(year):
     perpus_id = SessionManager.get_current_perpus_id('admin')
     
@@ -839,9 +855,11 @@ def kurangi_kunjungan():
         current_date = datetime.now(wib_tz).date()  # Get current date in WIB
         
         # Find the most recent visit for today (WIB date)
+        awal_hari = datetime.combine(current_date, datetime.min.time())
         kunjungan = Kunjungan.query.filter(
-            func.date(Kunjungan.tanggal) == current_date,
-            Kunjungan.perpus_id == perpus_id
+            Kunjungan.perpus_id == perpus_id,
+            Kunjungan.tanggal >= awal_hari,
+            Kunjungan.tanggal < awal_hari + timedelta(days=1)
         ).order_by(Kunjungan.tanggal.desc()).first()
         
         if kunjungan:
@@ -2,16 +2,22 @@ import os
 import re
 import platform
 from datetime import datetime
+from functools import lru_cache
 import hashlib
-import pdfkit
 from flask import (
     Blueprint, render_template, request, redirect, url_for, session, flash,
-    send_file, current_app, send_from_directory, jsonify
+    current_app, jsonify
 )
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
 from app.models import db, User, Donasi, DetailDonasi, KegiatanPerpus, PerpusDesa, DetailPerpus, SubjekBuku, RiwayatDistribusi, DetailRiwayatDistribusi
 from app.utils.session_manager import SessionManager
-from authlib.integrations.flask_client import OAuth
+from app.utils.reference_data import get_subjek_list, get_perpus_options
+from app.utils.db_compat import group_concat
+from app.utils.metrics import observe_pdf_render
+from app.utils.page_cache import page_cache
+from app.utils.conditional import conditional, table_state
+from app.utils.file_delivery import deliver_file
 from sqlalchemy import or_, func, distinct
 import random
 
@@ -28,13 +34,23 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+_NON_SLUG_CHARS = re.compile(r'[^a-zA-Z0-9\s-]')
+_SLUG_SEPARATORS = re.compile(r'[-\s]+')
+_HTML_TAGS = re.compile(r'<[^>]+>')
+
+BULAN_INDONESIA = ('', 'Januari', 'Februari', 'Maret', 'April', 'Mei', 'Juni', 'Juli',
+                   'Agustus', 'September', 'Oktober', 'November', 'Desember')
+
+# Slug dihitung untuk setiap berita/perpus di setiap listing; nama yang sama
+# berulang terus, jadi hasilnya di-memo (fungsi murni atas string).
+@lru_cache(maxsize=4096)
 def create_slug(text):
     """Convert text to URL-friendly slug"""
     # Convert to lowercase and replace spaces with hyphens
-    slug = re.sub(r'[^a-zA-Z0-9\s-]', '', text).strip().lower()
-    slug = re.sub(r'[-\s]+', '-', slug)
-    return slug
+    slug = _NON_SLUG_CHARS.sub('', text).strip().lower()
+    return _SLUG_SEPARATORS.sub('-', slug)
 
+@lru_cache(maxsize=4096)
 def create_perpus_slug(perpus_name, kecamatan_name=None):
     """Convert perpus name and kecamatan to URL-friendly slug for perpus"""
     if not perpus_name:
@@ -43,45 +59,48 @@ def create_perpus_slug(perpus_name, kecamatan_name=None):
     # Clean perpus name
     clean_perpus = perpus_name.lower()
     clean_perpus = clean_perpus.replace('perpustakaan', '').replace('perpusdes', '').replace('desa', '').replace('tbm', '')
-    clean_perpus = re.sub(r'[^a-zA-Z0-9\s-]', '', clean_perpus).strip()
-    clean_perpus = re.sub(r'[-\s]+', '', clean_perpus)
+    clean_perpus = _SLUG_SEPARATORS.sub('', _NON_SLUG_CHARS.sub('', clean_perpus).strip())
     
     # Clean kecamatan name if provided
     clean_kecamatan = ''
     if kecamatan_name:
         clean_kecamatan = kecamatan_name.lower()
         clean_kecamatan = clean_kecamatan.replace('kecamatan', '').replace('kec', '')
-        clean_kecamatan = re.sub(r'[^a-zA-Z0-9\s-]', '', clean_kecamatan).strip()
-        clean_kecamatan = re.sub(r'[-\s]+', '', clean_kecamatan)
+        clean_kecamatan = _SLUG_SEPARATORS.sub('', _NON_SLUG_CHARS.sub('', clean_kecamatan).strip())
     
     # Combine perpus and kecamatan
     if clean_perpus and clean_kecamatan:
-        result = f'perpus{clean_perpus}{clean_kecamatan}'
+        return f'perpus{clean_perpus}{clean_kecamatan}'
     elif clean_perpus:
-        result = f'perpus{clean_perpus}'
-    else:
-        result = 'perpusdesa'
-    
-    # Add debug logging
-    current_app.logger.debug(f"Python slug creation: '{perpus_name}' + '{kecamatan_name}' -> '{result}'")
-    return result
+        return f'perpus{clean_perpus}'
+    return 'perpusdesa'
 
 def format_indonesian_date(date_obj):
     """Format date to Indonesian format"""
-    months = {
-        1: 'Januari', 2: 'Februari', 3: 'Maret', 4: 'April',
-        5: 'Mei', 6: 'Juni', 7: 'Juli', 8: 'Agustus',
-        9: 'September', 10: 'Oktober', 11: 'November', 12: 'Desember'
-    }
-    
     if isinstance(date_obj, str):
         date_obj = datetime.strptime(date_obj, '%Y-%m-%d').date()
     
-    day = date_obj.day
-    month = months[date_obj.month]
-    year = date_obj.year
-    
-    return f"{day:02d} {month} {year}"
+    return f"{date_obj.day:02d} {BULAN_INDONESIA[date_obj.month]} {date_obj.year}"
+
+def make_excerpt(html, limit=150):
+    """Teks polos dari deskripsi HTML, dipotong `limit` karakter.
+
+    Sama dengan menghapus semua tag lalu memotong, tetapi berhenti membaca
+    begitu teks sudah melewati batas (deskripsi kegiatan bisa panjang).
+    """
+    pieces, length, pos = [], 0, 0
+    for match in _HTML_TAGS.finditer(html):
+        pieces.append(html[pos:match.start()])
+        length += len(pieces[-1])
+        pos = match.end()
+        if length > limit:
+            break
+    else:
+        pieces.append(html[pos:])
+    excerpt = ''.join(pieces)
+    if len(excerpt) > limit:
+        excerpt = excerpt[:limit] + '...'
+    return excerpt
 
 def format_author_name(full_name):
     """Format author name from 'Admin ...' to 'Perpus ...'"""
@@ -100,7 +119,26 @@ def format_author_name(full_name):
     
     return full_name
 
+# Validator respons kondisional (ETag / Last-Modified) per jenis halaman
+def _static_page_state(**kwargs):
+    return []
+
+def _berita_state(**kwargs):
+    return [table_state(KegiatanPerpus), table_state(PerpusDesa)]
+
+def _perpus_state(**kwargs):
+    return [table_state(PerpusDesa), table_state(DetailPerpus)]
+
+def _perpus_detail_state(perpus_id):
+    return [table_state(PerpusDesa, PerpusDesa.id == perpus_id),
+            table_state(DetailPerpus, DetailPerpus.perpus_id == perpus_id)]
+
+def _perpus_profile_state(**kwargs):
+    return _perpus_state() + _berita_state()
+
 @bp.route('/')
+@page_cache.cached('kegiatan_perpus', 'perpus_desa')
+@conditional(_berita_state)
 def home():
     # Get latest 3 news from kegiatan_perpus
     latest_news = db.session.query(
@@ -126,9 +164,7 @@ def home():
     news_data = []
     for news in latest_news:
         # Create excerpt from description (strip HTML and limit to 150 chars)
-        excerpt = re.sub(r'<[^>]+>', '', news.deskripsi_kegiatan)
-        if len(excerpt) > 150:
-            excerpt = excerpt[:150] + '...'
+        excerpt = make_excerpt(news.deskripsi_kegiatan)
         
         news_data.append({
             'id': news.id,
@@ -144,6 +180,8 @@ def home():
     return render_template('pengguna/index.html', latest_news=news_data)
 
 @bp.route('/syarat')
+@page_cache.cached()
+@conditional(_static_page_state)
 def syarat():
     return render_template('pengguna/syarat_ketentuan.html')
 
@@ -198,7 +236,7 @@ def transparansi():
         PerpusDesa.kecamatan.label('kecamatan_nama'),
         RiwayatDistribusi.status,
         func.sum(DetailRiwayatDistribusi.jumlah).label('total_buku'),
-        func.group_concat(SubjekBuku.nama).label('subjek_list')
+        group_concat(SubjekBuku.nama).label('subjek_list')
     ).select_from(DetailRiwayatDistribusi)\
      .join(Donasi, DetailRiwayatDistribusi.donasi_id == Donasi.id)\
      .join(RiwayatDistribusi, DetailRiwayatDistribusi.distribusi_id == RiwayatDistribusi.id)\
@@ -278,7 +316,7 @@ def riwayat():
         User.full_name.label('donatur_name'),
         func.sum(DetailDonasi.diterima).label('total_buku'),
         func.sum(DetailDonasi.ditolak).label('tidak_sesuai'),
-        func.group_concat(distinct(SubjekBuku.nama)).label('subjek_list'),
+        group_concat(SubjekBuku.nama, distinct=True).label('subjek_list'),
         func.count(distinct(DetailRiwayatDistribusi.distribusi_id)).label('total_distribusi')
     ).select_from(Donasi)\
      .join(User, Donasi.user_id == User.id)\
@@ -359,22 +397,32 @@ def riwayat():
     return render_template('pengguna/riwayat_transparansi.html', donasi=donasi_list)
 
 @bp.route('/faq')
+@page_cache.cached()
+@conditional(_static_page_state)
 def faq():
     return render_template('pengguna/faq.html')
 
 @bp.route('/kontak')
+@page_cache.cached()
+@conditional(_static_page_state)
 def kontak():
     return render_template('pengguna/kontak.html')
 
 @bp.route('/profil')
+@page_cache.cached()
+@conditional(_static_page_state)
 def profil():
     return render_template('pengguna/profil.html')
 
 @bp.route('/panduan-donasi')
+@page_cache.cached()
+@conditional(_static_page_state)
 def panduan_donasi():
     return render_template('pengguna/panduan_donasi.html')
 
 @bp.route('/perpusdes')
+@page_cache.cached('perpus_desa', 'detail_perpus')
+@conditional(_perpus_state)
 def perpusdes():
     # Query all perpusdes data with join to get details
     perpusdess_query = db.session.query(
@@ -555,7 +603,7 @@ def formulir_donasi():
 
     user_id = SessionManager.get_current_user_id('user')
     user = User.query.get(user_id)
-    subjek_list = SubjekBuku.query.all()
+    subjek_list = get_subjek_list(order_by='id')
 
     if request.method == 'POST':
         if not request.form.get('setuju_syarat') or not request.form.get('setuju_pengiriman'):
@@ -742,6 +790,9 @@ def generate_pdf(invoice):
                         break
         
         try:
+            # pdfkit hanya dibutuhkan di sini; tidak dimuat saat worker start
+            import pdfkit
+
             # Configure pdfkit with detected path
             if wkhtmltopdf_path == 'wkhtmltopdf':
                 # Let pdfkit use system PATH
@@ -761,12 +812,13 @@ def generate_pdf(invoice):
                 'no-outline': None
             }
             
-            pdfkit.from_string(
-                rendered,
-                pdf_path,
-                configuration=config,
-                options=options
-            )
+            with observe_pdf_render('bukti_donasi'):
+                pdfkit.from_string(
+                    rendered,
+                    pdf_path,
+                    configuration=config,
+                    options=options
+                )
             
         except Exception as e:
             # If PDF generation fails, log error and show user-friendly message
@@ -774,13 +826,15 @@ def generate_pdf(invoice):
             flash("Maaf, terjadi kesalahan saat membuat PDF. Silakan coba lagi nanti.", "error")
             return redirect(url_for('public.konfirmasi_berhasil', invoice=donasi.invoice))
     
-    return send_file(
+    return deliver_file(
         pdf_path,
         as_attachment=True,
         download_name=f"bukti_donasi_{invoice}.pdf"
     )
 
 @bp.route('/semua-berita')
+@page_cache.cached('kegiatan_perpus', 'perpus_desa')
+@conditional(_berita_state)
 def semua_berita():
     # Get pagination parameters
     page = request.args.get('page', 1, type=int)
@@ -828,9 +882,7 @@ def semua_berita():
     news_data = []
     for news in pagination.items:
         # Create excerpt from description
-        excerpt = re.sub(r'<[^>]+>', '', news.deskripsi_kegiatan)
-        if len(excerpt) > 150:
-            excerpt = excerpt[:150] + '...'
+        excerpt = make_excerpt(news.deskripsi_kegiatan)
         
         news_data.append({
             'id': news.id,
@@ -849,6 +901,8 @@ def semua_berita():
                          search=search)
 
 @bp.route('/berita/<perpus_slug>/<slug>')
+@page_cache.cached('kegiatan_perpus', 'perpus_desa')
+@conditional(_berita_state)
 def detail_berita(perpus_slug, slug):
     # Find news by perpus_slug and slug
     all_news = db.session.query(
@@ -902,9 +956,7 @@ def detail_berita(perpus_slug, slug):
     other_news.sort(key=lambda x: x.tanggal_kegiatan, reverse=True)
     
     for news in other_news[:3]:
-        excerpt = re.sub(r'<[^>]+>', '', news.deskripsi_kegiatan)
-        if len(excerpt) > 100:
-            excerpt = excerpt[:100] + '...'
+        excerpt = make_excerpt(news.deskripsi_kegiatan, 100)
         
         related_news.append({
             'id': news.id,
@@ -931,12 +983,13 @@ def view_resi(invoice):
         return redirect(url_for('public.home'))
     
     # Serve the image from bukti-pengiriman folder
-    return send_from_directory(
+    return deliver_file(safe_join(
         os.path.join(current_app.root_path, 'static', 'public', 'bukti-pengiriman'),
         donasi.bukti_pengiriman
-    )
+    ))
 
 @bp.route('/api/check-perpus-detail/<int:perpus_id>')
+@conditional(_perpus_detail_state)
 def check_perpus_detail(perpus_id):
     """API endpoint to check if perpus has detail profile"""
     try:
@@ -1002,16 +1055,16 @@ def check_perpus_detail(perpus_id):
         return jsonify({'has_detail': False, 'error': str(e)}), 500
 
 @bp.route('/perpusdes/<slug>')
+@page_cache.cached('kegiatan_perpus', 'perpus_desa', 'detail_perpus')
+@conditional(_perpus_profile_state)
 def detail_perpusdes(slug):
     """Display detailed profile of a specific perpustakaan desa"""
     # Find perpus by slug
-    all_perpus = PerpusDesa.query.all()
-    
     current_perpus = None
-    for perpus in all_perpus:
-        perpus_slug = create_perpus_slug(perpus.nama, perpus.kecamatan)
+    for perpus in get_perpus_options():
+        perpus_slug = create_perpus_slug(perpus['nama'], perpus['kecamatan'])
         if perpus_slug == slug:
-            current_perpus = perpus
+            current_perpus = PerpusDesa.query.get(perpus['id'])
             break
     
     if not current_perpus:
@@ -1050,9 +1103,7 @@ def detail_perpusdes(slug):
     related_news = []
     for news in related_news_query:
         # Create excerpt from description
-        excerpt = re.sub(r'<[^>]+>', '', news.deskripsi_kegiatan)
-        if len(excerpt) > 150:
-            excerpt = excerpt[:150] + '...'
+        excerpt = make_excerpt(news.deskripsi_kegiatan)
         
         related_news.append({
             'id': news.id,
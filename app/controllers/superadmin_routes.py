@@ -1,8 +1,20 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, current_app
-from app.models import db, User, PerpusDesa, DetailDonasi, Donasi, KebutuhanKoleksi, DetailKebutuhanKoleksi, DetailPerpus, SubjekBuku, RiwayatDistribusi, DetailRiwayatDistribusi, Kunjungan
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, current_app, send_file, abort
+from app.models import db, User, PerpusDesa, DetailDonasi, Donasi, KebutuhanKoleksi, DetailKebutuhanKoleksi, DetailPerpus, SubjekBuku, RiwayatDistribusi, DetailRiwayatDistribusi, StatistikBulanan, PeringkatDonatur, EmailBroadcast
 from app.utils.session_manager import SessionManager
-from app.utils.email_utils import EmailService
-from sqlalchemy import func, case
+from app.utils.email_utils import get_email_service
+from app.utils.email_outbox import notify_outbox
+from app.utils.email_broadcast import (
+    BROADCAST_TARGETS, can_resume, count_recipients, ensure_broadcast_table, is_stalled, start_broadcast,
+    validate_template
+)
+from app.utils.statistik_cube import ensure_statistik_fresh, statistik_version
+from app.utils.conditional import conditional
+from app.utils.dashboard_cache import get_dashboard_summary
+from app.utils.peringkat_donatur import ensure_peringkat_tables
+from app.utils.reference_data import get_subjek_list, get_perpus_options, get_kecamatan_list
+from app.utils.sql_instrumentation import get_sql_stats
+from app.utils.request_profiler import list_profiles, profile_path, profile_summary
+from sqlalchemy import func, case, or_
 from sqlalchemy.orm import joinedload
 from functools import wraps
 import os
@@ -44,9 +56,8 @@ def login():
             flash("Login gagal. Username atau password salah.")
     return render_template('superadmin/login.html')
 
-@bp.route('/dashboard')
-@superadmin_login_required
-def dashboard():
+def _build_dashboard_summary():
+    """Hitung ringkasan dashboard (dipanggil hanya saat cache tidak berlaku)"""
     # Count unique donators with status 'confirmed' only
     total_donatur = db.session.query(Donasi.user_id)\
         .filter(Donasi.status == 'confirmed')\
@@ -60,24 +71,25 @@ def dashboard():
     
     total_perpus = PerpusDesa.query.count()
     
-    # Get pending kebutuhan koleksi with perpus info and calculate total books
-    permintaan_list = db.session.query(KebutuhanKoleksi)\
-        .options(joinedload(KebutuhanKoleksi.perpus),
-                joinedload(KebutuhanKoleksi.detail_kebutuhan))\
+    # Get pending kebutuhan koleksi with perpus info and total books (summed in SQL)
+    total_buku_subq = _total_buku_pengajuan_subquery()
+    permintaan_raw = db.session.query(
+        PerpusDesa.nama,
+        PerpusDesa.kecamatan,
+        func.coalesce(total_buku_subq.c.total_buku, 0).label('total_buku')
+    )\
+        .select_from(KebutuhanKoleksi)\
+        .join(PerpusDesa, PerpusDesa.id == KebutuhanKoleksi.perpus_id)\
+        .outerjoin(total_buku_subq, total_buku_subq.c.kebutuhan_id == KebutuhanKoleksi.id)\
         .filter(KebutuhanKoleksi.status == 'pending')\
-        .order_by(
-            case(
-                (KebutuhanKoleksi.prioritas == 'tinggi', 1),
-                (KebutuhanKoleksi.prioritas == 'sedang', 2),
-                (KebutuhanKoleksi.prioritas == 'rendah', 3),
-                else_=4
-            ),
-            KebutuhanKoleksi.tanggal_pengajuan.desc()
-        ).limit(5).all()
-
-    # Calculate total books for each kebutuhan
-    for kebutuhan in permintaan_list:
-        kebutuhan.total_buku = sum(detail.jumlah_buku for detail in kebutuhan.detail_kebutuhan)
+        .order_by(PENGAJUAN_PRIORITAS_ORDER, KebutuhanKoleksi.tanggal_pengajuan.desc())\
+        .limit(5).all()
+
+    # Plain dicts so the summary can be shared across requests (no ORM instances)
+    permintaan_list = [{
+        'perpus': {'nama': item.nama, 'kecamatan': item.kecamatan},
+        'total_buku': int(item.total_buku or 0)
+    } for item in permintaan_raw]
 
     riwayat_donasi_raw = db.session.query(
         SubjekBuku.nama.label('subjek'),
@@ -97,12 +109,19 @@ def dashboard():
         'donatur': {'full_name': item.nama}
     } for item in riwayat_donasi_raw]
 
-    return render_template('superadmin/tampilan_depan.html',
-                           total_donatur=total_donatur,
-                           total_buku=total_buku,
-                           total_perpus=total_perpus,
-                           permintaan_list=permintaan_list,
-                           riwayat_donasi=riwayat_donasi)
+    return {
+        'total_donatur': total_donatur,
+        'total_buku': total_buku,
+        'total_perpus': total_perpus,
+        'permintaan_list': permintaan_list,
+        'riwayat_donasi': riwayat_donasi
+    }
+
+@bp.route('/dashboard')
+@superadmin_login_required
+def dashboard():
+    summary = get_dashboard_summary(_build_dashboard_summary)
+    return render_template('superadmin/tampilan_depan.html', **summary)
 
 @bp.route('/perpusdes')
 @superadmin_login_required
@@ -435,28 +454,95 @@ def delete_subjek(subjek_id):
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Gagal menghapus subjek: {str(e)}'})
 
+# ==== Donatur ====
+DONATUR_PER_PAGE = 10
+DONATUR_MAX_PER_PAGE = 100
+
 @bp.route('/donatur')
 @superadmin_login_required
 def daftar_donatur():
-    # Query untuk menampilkan setiap donatur HANYA SEKALI dengan agregat data:
-    # - jumlah_subjek: menghitung subjek UNIK yang pernah didonasikan
-    # - total_books: menjumlahkan SEMUA buku dari semua donasi user
-    data_donatur = db.session.query(
-        User.id,
-        User.full_name,
-        User.username,
-        User.email,
-        func.count(func.distinct(DetailDonasi.subjek_id)).label('jumlah_subjek'),  # Count unique subjects
-        func.sum(DetailDonasi.jumlah).label('total_books')  # Sum all books across all donations
-    )\
-     .join(Donasi, Donasi.user_id == User.id)\
-     .join(DetailDonasi, DetailDonasi.donasi_id == Donasi.id)\
-     .filter(Donasi.status == 'confirmed')\
-     .group_by(User.id)\
-     .order_by(User.full_name.asc())\
-     .all()
+    # Tabel diisi per halaman lewat api_daftar_donatur dari tabel PeringkatDonatur
+    ensure_peringkat_tables()
+    total_donatur = db.session.query(func.count(PeringkatDonatur.user_id)).scalar() or 0
+
+    return render_template('superadmin/donatur.html',
+                           total_donatur=total_donatur,
+                           per_page=DONATUR_PER_PAGE)
+
+@bp.route('/api/donatur')
+@superadmin_login_required
+def api_daftar_donatur():
+    """Paginated donor directory with search & sort (DataTables server-side format)"""
+    try:
+        ensure_peringkat_tables()
+        draw = request.args.get('draw', 0, type=int)
+        start = max(request.args.get('start', 0, type=int), 0)
+        length = request.args.get('length', DONATUR_PER_PAGE, type=int)
+        if length <= 0 or length > DONATUR_MAX_PER_PAGE:
+            length = DONATUR_MAX_PER_PAGE
+        search = (request.args.get('search[value]') or request.args.get('search') or '').strip()
+
+        # Agregat (jumlah subjek & total buku) sudah dihitung di PeringkatDonatur
+        base_query = db.session.query(
+            User.id,
+            User.full_name,
+            User.username,
+            User.email,
+            PeringkatDonatur.jumlah_subjek,
+            PeringkatDonatur.total_buku
+        ).join(User, User.id == PeringkatDonatur.user_id)
+
+        records_total = db.session.query(func.count(PeringkatDonatur.user_id)).scalar() or 0
+        filtered_query = base_query
+        if search:
+            filtered_query = filtered_query.filter(or_(
+                User.full_name.ilike(f'%{search}%'),
+                User.username.ilike(f'%{search}%'),
+                User.email.ilike(f'%{search}%')
+            ))
+        records_filtered = filtered_query.order_by(None).count() if search else records_total
+
+        # Kolom yang bisa diurutkan dari DataTables (index kolom -> ekspresi SQL)
+        sortable_columns = {
+            1: User.full_name,
+            2: User.username,
+            3: User.email,
+            4: PeringkatDonatur.jumlah_subjek,
+            5: PeringkatDonatur.total_buku
+        }
+        order_column = request.args.get('order[0][column]', type=int)
+        if order_column in sortable_columns:
+            expression = sortable_columns[order_column]
+            direction = request.args.get('order[0][dir]', 'asc')
+            ordering = [expression.desc() if direction == 'desc' else expression.asc(), User.id.asc()]
+        else:
+            # Default: peringkat donatur dengan buku terbanyak
+            ordering = [PeringkatDonatur.total_buku.desc(), User.id.asc()]
+
+        rows = filtered_query.order_by(*ordering).offset(start).limit(length).all()
+
+        data = [
+            {
+                'no': start + index,
+                'id': row.id,
+                'full_name': row.full_name,
+                'username': row.username,
+                'email': row.email,
+                'jumlah_subjek': row.jumlah_subjek or 0,
+                'total_books': row.total_buku or 0
+            }
+            for index, row in enumerate(rows, start=1)
+        ]
 
-    return render_template('superadmin/donatur.html', data_donatur=data_donatur)
+        return jsonify({
+            'draw': draw,
+            'recordsTotal': records_total,
+            'recordsFiltered': records_filtered,
+            'data': data
+        })
+    except Exception as e:
+        current_app.logger.error(f'Error loading donatur: {str(e)}')
+        return jsonify({'error': f'Gagal memuat data donatur: {str(e)}'})
 
 # ==== Donasi (updated routes) ====
 ALLOWED_CERT_EXT = {'png', 'jpg', 'jpeg'}
@@ -652,9 +738,6 @@ def edit_donasi(donasi_id):
             # If no new file, keep the existing certificate filename
             certificate_filename = d.sertifikat
 
-        # Commit changes first
-        db.session.commit()
-        
         # Email notification logic - only send if:
         # 1. Status changed from non-confirmed to confirmed AND certificate exists, OR
         # 2. Status is confirmed AND certificate was just uploaded (new certificate)
@@ -677,28 +760,24 @@ def edit_donasi(donasi_id):
                 current_app.logger.info(f"Email skipped: Donation already confirmed with existing certificate")
         
         if should_send_email:
-            try:
-                email_service = EmailService()
-                success, message = email_service.send_donation_confirmation(
-                    donatur_email=d.user.email,
-                    donatur_name=d.user.full_name or d.user.username,
-                    invoice=d.invoice or f'INV-{d.id}',
-                    certificate_filename=certificate_filename
-                )
-                
-                if success:
-                    current_app.logger.info(f"Email sent successfully to {d.user.email} for donation {d.id}")
-                    return jsonify({'ok': True, 'msg': 'Donasi berhasil diperbarui dan notifikasi email telah dikirim'})
-                else:
-                    current_app.logger.warning(f"Failed to send email to {d.user.email}: {message}")
-                    return jsonify({'ok': True, 'msg': f'Donasi berhasil diperbarui, tetapi gagal mengirim email: {message}'})
-            
-            except Exception as e:
-                current_app.logger.error(f"Error sending email notification: {str(e)}")
-                return jsonify({'ok': True, 'msg': f'Donasi berhasil diperbarui, tetapi gagal mengirim email: {str(e)}'})
-        else:
-            # No email needed
-            return jsonify({'ok': True, 'msg': 'Donasi berhasil diperbarui'})
+            # Email masuk outbox dalam transaksi yang sama, dikirim di background
+            get_email_service().queue_donation_confirmation(
+                donatur_email=d.user.email,
+                donatur_name=d.user.full_name or d.user.username,
+                invoice=d.invoice or f'INV-{d.id}',
+                certificate_filename=certificate_filename,
+                ref_id=d.id
+            )
+
+        db.session.commit()
+
+        if should_send_email:
+            notify_outbox()
+            current_app.logger.info(f"Email for donation {d.id} queued to {d.user.email}")
+            return jsonify({'ok': True, 'msg': 'Donasi berhasil diperbarui dan notifikasi email akan segera dikirim'})
+
+        # No email needed
+        return jsonify({'ok': True, 'msg': 'Donasi berhasil diperbarui'})
         
     except Exception as e:
         db.session.rollback()
@@ -1029,57 +1108,166 @@ def tambah_distribusi():
             return jsonify({'success': False, 'message': f'Gagal menyimpan data: {str(e)}'})
     
     # GET request - return form data
-    perpus_list = PerpusDesa.query.order_by(PerpusDesa.nama.asc()).all()
-    subjek_list = SubjekBuku.query.order_by(SubjekBuku.nama.asc()).all()
+    perpus_list = get_perpus_options()
+    subjek_list = get_subjek_list()
     
     return render_template('superadmin/partials/tambah_distribusi.html', 
                          perpus_list=perpus_list, subjek_list=subjek_list)
     
+# ==== Pengajuan Perpusdes ====
+PENGAJUAN_PER_PAGE = 10
+PENGAJUAN_MAX_PER_PAGE = 100
+
+PENGAJUAN_STATUS_ORDER = case(
+    (KebutuhanKoleksi.status == 'pending', 1),
+    (KebutuhanKoleksi.status == 'approved', 2),
+    (KebutuhanKoleksi.status == 'rejected', 3),
+    else_=4
+)
+
+PENGAJUAN_PRIORITAS_ORDER = case(
+    (KebutuhanKoleksi.prioritas == 'tinggi', 1),
+    (KebutuhanKoleksi.prioritas == 'sedang', 2),
+    (KebutuhanKoleksi.prioritas == 'rendah', 3),
+    else_=4
+)
+
+def _total_buku_pengajuan_subquery():
+    """SUM(jumlah_buku) per pengajuan, computed in SQL instead of per row in Python"""
+    return db.session.query(
+        DetailKebutuhanKoleksi.kebutuhan_id.label('kebutuhan_id'),
+        func.sum(DetailKebutuhanKoleksi.jumlah_buku).label('total_buku')
+    ).group_by(DetailKebutuhanKoleksi.kebutuhan_id).subquery()
+
+def _filter_pengajuan(query, args):
+    """Apply status, prioritas, kecamatan, subjek and search filters from request args"""
+    status = args.get('status')
+    prioritas = args.get('prioritas')
+    kecamatan = args.get('kecamatan')
+    subjek_id = args.get('subjek_id', type=int)
+    search = (args.get('search[value]') or args.get('search') or '').strip()
+
+    if status:
+        query = query.filter(KebutuhanKoleksi.status == status)
+    if prioritas:
+        query = query.filter(KebutuhanKoleksi.prioritas == prioritas)
+    if kecamatan:
+        query = query.filter(PerpusDesa.kecamatan == kecamatan)
+    if subjek_id:
+        query = query.filter(
+            db.session.query(DetailKebutuhanKoleksi.id)
+            .filter(DetailKebutuhanKoleksi.kebutuhan_id == KebutuhanKoleksi.id,
+                    DetailKebutuhanKoleksi.subjek_id == subjek_id)
+            .exists()
+        )
+    if search:
+        query = query.filter(or_(
+            PerpusDesa.nama.ilike(f'%{search}%'),
+            PerpusDesa.kecamatan.ilike(f'%{search}%')
+        ))
+    return query
+
+def _get_pengajuan_stats():
+    """Status counts for the cards, grouped in one SQL query"""
+    status_counts = dict(
+        db.session.query(KebutuhanKoleksi.status, func.count(KebutuhanKoleksi.id))
+        .group_by(KebutuhanKoleksi.status)
+        .all()
+    )
+    return {
+        'pending': status_counts.get('pending', 0),
+        'approved': status_counts.get('approved', 0),
+        'rejected': status_counts.get('rejected', 0),
+        'total': sum(status_counts.values())
+    }
+
 @bp.route('/pengajuan-perpusdes')
 @superadmin_login_required
 def pengajuan_perpusdes():
-    # Get kebutuhan koleksi data with perpus and total books calculation
-    # Custom ordering: Status Pending first, then Priority Tinggi first, then by date
-    from sqlalchemy import case
-    
-    data_pengajuan = db.session.query(KebutuhanKoleksi)\
-        .options(joinedload(KebutuhanKoleksi.perpus),
-                joinedload(KebutuhanKoleksi.detail_kebutuhan).joinedload(DetailKebutuhanKoleksi.subjek))\
-        .order_by(
-            case(
-                (KebutuhanKoleksi.status == 'pending', 1),
-                (KebutuhanKoleksi.status == 'approved', 2),
-                (KebutuhanKoleksi.status == 'rejected', 3),
-                else_=4
-            ),
-            case(
-                (KebutuhanKoleksi.prioritas == 'tinggi', 1),
-                (KebutuhanKoleksi.prioritas == 'sedang', 2),
-                (KebutuhanKoleksi.prioritas == 'rendah', 3),
-                else_=4
-            ),
-            KebutuhanKoleksi.tanggal_pengajuan.desc()
-        )\
-        .all()
-    
-    # Calculate total books for each kebutuhan
-    for kebutuhan in data_pengajuan:
-        kebutuhan.total_buku = sum(detail.jumlah_buku for detail in kebutuhan.detail_kebutuhan)
-    
-    # Statistics for pengajuan
-    count_of_pending_requests = sum(1 for k in data_pengajuan if k.status == 'pending')
-    count_of_approved_requests = sum(1 for k in data_pengajuan if k.status == 'approved')
-    count_of_rejected_requests = sum(1 for k in data_pengajuan if k.status == 'rejected')
-    total_count_of_requests = len(data_pengajuan)
-    
-    stats_pengajuan = {
-        'pending': count_of_pending_requests,
-        'approved': count_of_approved_requests, 
-        'rejected': count_of_rejected_requests,
-        'total': total_count_of_requests
-    }
-    
-    return render_template('superadmin/pengajuan_perpusdes.html', data_pengajuan=data_pengajuan, stats_pengajuan=stats_pengajuan)
+    # Tabel diisi bertahap lewat api_pengajuan_perpusdes, halaman ini hanya memuat statistik & filter
+    stats_pengajuan = _get_pengajuan_stats()
+
+    kecamatan_list = get_kecamatan_list()
+    subjek_list = get_subjek_list()
+
+    return render_template('superadmin/pengajuan_perpusdes.html',
+                           stats_pengajuan=stats_pengajuan,
+                           kecamatan_list=kecamatan_list,
+                           subjek_list=subjek_list,
+                           per_page=PENGAJUAN_PER_PAGE)
+
+@bp.route('/api/pengajuan-perpusdes')
+@superadmin_login_required
+def api_pengajuan_perpusdes():
+    """Paginated, filterable pengajuan queue (DataTables server-side format)"""
+    try:
+        draw = request.args.get('draw', 0, type=int)
+        start = max(request.args.get('start', 0, type=int), 0)
+        length = request.args.get('length', PENGAJUAN_PER_PAGE, type=int)
+        if length <= 0 or length > PENGAJUAN_MAX_PER_PAGE:
+            length = PENGAJUAN_MAX_PER_PAGE
+
+        total_buku_subq = _total_buku_pengajuan_subquery()
+        total_buku_col = func.coalesce(total_buku_subq.c.total_buku, 0)
+
+        base_query = db.session.query(
+            KebutuhanKoleksi.id,
+            KebutuhanKoleksi.prioritas,
+            KebutuhanKoleksi.status,
+            KebutuhanKoleksi.tanggal_pengajuan,
+            PerpusDesa.nama.label('perpus_nama'),
+            PerpusDesa.kecamatan.label('kecamatan'),
+            total_buku_col.label('total_buku')
+        ).join(PerpusDesa, PerpusDesa.id == KebutuhanKoleksi.perpus_id)\
+         .outerjoin(total_buku_subq, total_buku_subq.c.kebutuhan_id == KebutuhanKoleksi.id)
+
+        records_total = db.session.query(func.count(KebutuhanKoleksi.id)).scalar() or 0
+        filtered_query = _filter_pengajuan(base_query, request.args)
+        records_filtered = filtered_query.order_by(None).count()
+
+        # Kolom yang bisa diurutkan dari DataTables (index kolom -> ekspresi SQL)
+        sortable_columns = {
+            0: PerpusDesa.nama,
+            1: PENGAJUAN_PRIORITAS_ORDER,
+            2: total_buku_col,
+            3: KebutuhanKoleksi.tanggal_pengajuan,
+            4: PENGAJUAN_STATUS_ORDER
+        }
+        order_column = request.args.get('order[0][column]', type=int)
+        if order_column in sortable_columns:
+            expression = sortable_columns[order_column]
+            direction = request.args.get('order[0][dir]', 'asc')
+            ordering = [expression.desc() if direction == 'desc' else expression.asc(),
+                        KebutuhanKoleksi.id.desc()]
+        else:
+            # Default: Pending dulu, lalu prioritas Tinggi, lalu tanggal terbaru
+            ordering = [PENGAJUAN_STATUS_ORDER, PENGAJUAN_PRIORITAS_ORDER,
+                        KebutuhanKoleksi.tanggal_pengajuan.desc()]
+
+        rows = filtered_query.order_by(*ordering).offset(start).limit(length).all()
+
+        data = [
+            {
+                'id': row.id,
+                'perpus_nama': row.perpus_nama,
+                'kecamatan': row.kecamatan,
+                'prioritas': row.prioritas,
+                'total_buku': int(row.total_buku or 0),
+                'tanggal_pengajuan': row.tanggal_pengajuan.strftime('%d/%m/%Y') if row.tanggal_pengajuan else '-',
+                'status': row.status
+            }
+            for row in rows
+        ]
+
+        return jsonify({
+            'draw': draw,
+            'recordsTotal': records_total,
+            'recordsFiltered': records_filtered,
+            'data': data
+        })
+    except Exception as e:
+        current_app.logger.error(f'Error loading pengajuan: {str(e)}')
+        return jsonify({'error': f'Gagal memuat data pengajuan: {str(e)}'})
 
 @bp.route('/pengajuan-perpusdes/detail/<int:pengajuan_id>')
 @superadmin_login_required
@@ -1166,9 +1354,7 @@ def delete_pengajuan_perpusdes(pengajuan_id):
 def api_get_subjects():
     """Get all available subjects"""
     try:
-        subjects = SubjekBuku.query.order_by(SubjekBuku.nama.asc()).all()
-        subjects_data = [{'id': s.id, 'nama': s.nama} for s in subjects]
-        return jsonify(subjects_data)
+        return jsonify(get_subjek_list())
     except Exception as e:
         return jsonify({'error': f'Gagal memuat subjects: {str(e)}'})
 
@@ -1249,61 +1435,65 @@ def api_get_donation_details(donasi_id):
     except Exception as e:
         return jsonify({'error': f'Gagal memuat detail donasi: {str(e)}'})
 
+def _filter_statistik_wilayah(query, perpus_id=None, kecamatan=None):
+    """Filter rollup by perpus (prioritas) atau kecamatan"""
+    if perpus_id:
+        return query.filter(StatistikBulanan.perpus_id == perpus_id)
+    if kecamatan:
+        return query.filter(StatistikBulanan.kecamatan == kecamatan)
+    return query
+
+def _monthly_chart_data(results):
+    """Ubah hasil (bulan, jumlah) menjadi 12 titik data untuk Chart.js"""
+    monthly_data = [0] * 12
+    for result in results:
+        month_index = int(result.month) - 1  # Convert to 0-based index
+        if 0 <= month_index < 12:
+            monthly_data[month_index] = int(result.count or 0)
+
+    chart_data = [
+        {'month': i + 1, 'count': count}
+        for i, count in enumerate(monthly_data)
+    ]
+    return chart_data, sum(monthly_data)
+
 @bp.route('/statistik')
 @superadmin_login_required
 def statistik():
+    # Semua angka dibaca dari rollup StatistikBulanan, bukan dari tabel detail
+    ensure_statistik_fresh()
+
     # Get current year and available years
     current_year = datetime.now().year
-    available_years_query = db.session.query(
-        func.extract('year', Donasi.created_at).label('year')
-    ).distinct().filter(
-        func.extract('year', Donasi.created_at).isnot(None)
-    ).order_by('year').all()
+    available_years_query = db.session.query(StatistikBulanan.tahun)\
+        .distinct().order_by(StatistikBulanan.tahun).all()
     
-    available_years = [int(year.year) for year in available_years_query if year.year]
+    available_years = [int(row.tahun) for row in available_years_query if row.tahun]
     if current_year not in available_years:
         available_years.append(current_year)
     available_years.sort(reverse=True)
     
     # Get perpus list and kecamatan list - Convert to serializable format
-    perpus_query = PerpusDesa.query.order_by(PerpusDesa.nama.asc()).all()
-    perpus_list = [
-        {
-            'id': perpus.id,
-            'nama': perpus.nama,
-            'kecamatan': perpus.kecamatan,
-            'desa': perpus.desa
-        }
-        for perpus in perpus_query
-    ]
+    perpus_list = get_perpus_options()
+    kecamatan_list = get_kecamatan_list()
     
-    kecamatan_list = db.session.query(PerpusDesa.kecamatan).distinct().order_by(PerpusDesa.kecamatan.asc()).all()
-    kecamatan_list = [k[0] for k in kecamatan_list]
-    
-    # Calculate statistics
-    # Total buku diterima (confirmed donations only)
-    total_buku_diterima = db.session.query(func.sum(DetailDonasi.diterima))\
-        .join(Donasi, Donasi.id == DetailDonasi.donasi_id)\
-        .filter(Donasi.status == 'confirmed')\
-        .scalar() or 0
-    
-    # Total buku tersalurkan (from distribution records)
-    total_buku_tersalurkan = db.session.query(func.sum(DetailRiwayatDistribusi.jumlah))\
-        .scalar() or 0
-    
-    # Total kunjungan
-    total_kunjungan = Kunjungan.query.count()
+    # Total buku diterima, tersalurkan dan kunjungan dalam satu query
+    totals = db.session.query(
+        func.coalesce(func.sum(StatistikBulanan.buku_donasi), 0).label('buku_donasi'),
+        func.coalesce(func.sum(StatistikBulanan.buku_distribusi), 0).label('buku_distribusi'),
+        func.coalesce(func.sum(StatistikBulanan.kunjungan), 0).label('kunjungan')
+    ).one()
     
     # Top 5 subjects by total donations - Convert to serializable format
+    total_donasi_subjek = func.sum(StatistikBulanan.buku_donasi)
     top_subjects_query = db.session.query(
         SubjekBuku.nama,
-        func.sum(DetailDonasi.diterima).label('total_donasi')
+        total_donasi_subjek.label('total_donasi')
     )\
-    .join(DetailDonasi, DetailDonasi.subjek_id == SubjekBuku.id)\
-    .join(Donasi, Donasi.id == DetailDonasi.donasi_id)\
-    .filter(Donasi.status == 'confirmed')\
+    .join(StatistikBulanan, StatistikBulanan.subjek_id == SubjekBuku.id)\
+    .filter(StatistikBulanan.buku_donasi > 0)\
     .group_by(SubjekBuku.id, SubjekBuku.nama)\
-    .order_by(func.sum(DetailDonasi.diterima).desc())\
+    .order_by(total_donasi_subjek.desc())\
     .limit(5).all()
     
     top_subjects = [
@@ -1315,15 +1505,16 @@ def statistik():
     ]
     
     # Top 5 libraries by total books received - Convert to serializable format
+    total_diterima_perpus = func.sum(StatistikBulanan.buku_distribusi)
     top_libraries_query = db.session.query(
         PerpusDesa.nama,
         PerpusDesa.kecamatan,
-        func.sum(DetailRiwayatDistribusi.jumlah).label('total_diterima')
+        total_diterima_perpus.label('total_diterima')
     )\
-    .join(RiwayatDistribusi, RiwayatDistribusi.perpus_id == PerpusDesa.id)\
-    .join(DetailRiwayatDistribusi, DetailRiwayatDistribusi.distribusi_id == RiwayatDistribusi.id)\
+    .join(StatistikBulanan, StatistikBulanan.perpus_id == PerpusDesa.id)\
+    .filter(StatistikBulanan.buku_distribusi > 0)\
     .group_by(PerpusDesa.id, PerpusDesa.nama, PerpusDesa.kecamatan)\
-    .order_by(func.sum(DetailRiwayatDistribusi.jumlah).desc())\
+    .order_by(total_diterima_perpus.desc())\
     .limit(5).all()
     
     top_libraries = [
@@ -1336,9 +1527,9 @@ def statistik():
     ]
     
     stats = {
-        'total_buku_diterima': total_buku_diterima,
-        'total_buku_tersalurkan': total_buku_tersalurkan,
-        'total_kunjungan': total_kunjungan
+        'total_buku_diterima': totals.buku_donasi,
+        'total_buku_tersalurkan': totals.buku_distribusi,
+        'total_kunjungan': totals.kunjungan
     }
     
     return render_template('superadmin/statistik.html',
@@ -1350,130 +1541,218 @@ def statistik():
                          top_subjects=top_subjects,
                          top_libraries=top_libraries)
 
+def _visit_series(year, perpus_id=None, kecamatan=None):
+    """Kunjungan per bulan dari rollup"""
+    query = db.session.query(
+        StatistikBulanan.bulan.label('month'),
+        func.sum(StatistikBulanan.kunjungan).label('count')
+    ).filter(StatistikBulanan.tahun == year, StatistikBulanan.kunjungan > 0)
+    query = _filter_statistik_wilayah(query, perpus_id, kecamatan)
+    chart_data, total = _monthly_chart_data(query.group_by(StatistikBulanan.bulan).all())
+    return {'data': chart_data, 'total': total}
+
+def _donation_series(year):
+    """Buku donasi diterima per subjek dari rollup"""
+    total_jumlah = func.sum(StatistikBulanan.buku_donasi)
+    results = db.session.query(
+        SubjekBuku.nama.label('subjek_nama'),
+        total_jumlah.label('total_jumlah')
+    )\
+    .join(StatistikBulanan, StatistikBulanan.subjek_id == SubjekBuku.id)\
+    .filter(StatistikBulanan.tahun == year, StatistikBulanan.buku_donasi > 0)\
+    .group_by(SubjekBuku.id, SubjekBuku.nama)\
+    .order_by(total_jumlah.desc())\
+    .all()
+
+    chart_data = [
+        {
+            'subjek_nama': result.subjek_nama,
+            'total_jumlah': result.total_jumlah or 0
+        }
+        for result in results
+    ]
+    return {'data': chart_data, 'total': sum(item['total_jumlah'] for item in chart_data)}
+
+def _distribution_series(year, perpus_id=None, kecamatan=None):
+    """Buku tersalurkan per bulan dari rollup"""
+    query = db.session.query(
+        StatistikBulanan.bulan.label('month'),
+        func.sum(StatistikBulanan.buku_distribusi).label('count')
+    ).filter(StatistikBulanan.tahun == year, StatistikBulanan.buku_distribusi > 0)
+    query = _filter_statistik_wilayah(query, perpus_id, kecamatan)
+    chart_data, total = _monthly_chart_data(query.group_by(StatistikBulanan.bulan).all())
+    return {'data': chart_data, 'total': total}
+
 # API Endpoints for Statistics Charts
+def _statistik_state(**kwargs):
+    """Validator chart: versi rollup naik setiap rebuild / tambal (hanya dibaca, rebuild dijadwalkan view)"""
+    return [statistik_version(), datetime.now().year]
+
+@bp.route('/api/statistik-data')
+@superadmin_login_required
+@conditional(_statistik_state)
+def api_statistik_data():
+    """All statistik chart series for the selected filters in one response.
+
+    The ETag is derived from the rollup version and the filters, so an
+    unchanged chart costs one version lookup and a 304.
+    """
+    try:
+        ensure_statistik_fresh()
+        current_year = datetime.now().year
+        perpus_id = request.args.get('perpus_id', type=int)
+        kecamatan = request.args.get('kecamatan') or None
+        year = request.args.get('year', current_year, type=int)
+        donation_year = request.args.get('donation_year', year, type=int)
+        distribution_year = request.args.get('distribution_year', year, type=int)
+
+        return jsonify({
+            'visits': _visit_series(year, perpus_id, kecamatan),
+            'donations': _donation_series(donation_year),
+            'distributions': _distribution_series(distribution_year, perpus_id, kecamatan)
+        })
+
+    except Exception as e:
+        return jsonify({'error': f'Gagal memuat data statistik: {str(e)}'}), 500
+
 @bp.route('/api/visit-data')
 @superadmin_login_required
+@conditional(_statistik_state)
 def api_visit_data():
     """Get visit data for charts with optional filters"""
     try:
-        perpus_id = request.args.get('perpus_id')
+        ensure_statistik_fresh()
+        perpus_id = request.args.get('perpus_id', type=int)
         kecamatan = request.args.get('kecamatan')
         year = request.args.get('year', datetime.now().year, type=int)
-        
-        # Build query with filters
-        query = db.session.query(
-            func.extract('month', Kunjungan.tanggal).label('month'),
-            func.count(Kunjungan.id).label('count')
-        )
-        
-        # Apply filters
-        if perpus_id:
-            query = query.filter(Kunjungan.perpus_id == perpus_id)
-        elif kecamatan:
-            query = query.join(PerpusDesa, PerpusDesa.id == Kunjungan.perpus_id)\
-                         .filter(PerpusDesa.kecamatan == kecamatan)
-        
-        query = query.filter(func.extract('year', Kunjungan.tanggal) == year)\
-                     .group_by(func.extract('month', Kunjungan.tanggal))\
-                     .order_by('month')
-        
-        results = query.all()
-        
-        # Create monthly data array (12 months)
-        monthly_data = [0] * 12
-        total_visits = 0
-        
-        for result in results:
-            month_index = int(result.month) - 1  # Convert to 0-based index
-            if 0 <= month_index < 12:
-                monthly_data[month_index] = result.count
-                total_visits += result.count
-        
-        # Format data for Chart.js
-        chart_data = [
-            {'month': i + 1, 'count': count}
-            for i, count in enumerate(monthly_data)
-        ]
-        
-        return jsonify({
-            'data': chart_data,
-            'total': total_visits
-        })
+        return jsonify(_visit_series(year, perpus_id, kecamatan))
         
     except Exception as e:
-        return jsonify({'error': f'Gagal memuat data kunjungan: {str(e)}'})
+        return jsonify({'error': f'Gagal memuat data kunjungan: {str(e)}'}), 500
 
 @bp.route('/api/donation-data/<int:year>')
 @superadmin_login_required
+@conditional(_statistik_state)
 def api_donation_data(year):
     """Get donation data by subject for specified year"""
     try:
-        results = db.session.query(
-            SubjekBuku.nama.label('subjek_nama'),
-            func.sum(DetailDonasi.diterima).label('total_jumlah')
-        )\
-        .join(DetailDonasi, DetailDonasi.subjek_id == SubjekBuku.id)\
-        .join(Donasi, Donasi.id == DetailDonasi.donasi_id)\
-        .filter(Donasi.status == 'confirmed')\
-        .filter(func.extract('year', Donasi.created_at) == year)\
-        .group_by(SubjekBuku.id, SubjekBuku.nama)\
-        .order_by(func.sum(DetailDonasi.diterima).desc())\
-        .all()
-        
-        chart_data = [
-            {
-                'subjek_nama': result.subjek_nama,
-                'total_jumlah': result.total_jumlah or 0
-            }
-            for result in results
-        ]
-        
-        return jsonify({
-            'data': chart_data,
-            'total': sum(item['total_jumlah'] for item in chart_data)
-        })
+        ensure_statistik_fresh()
+        return jsonify(_donation_series(year))
         
     except Exception as e:
-        return jsonify({'error': f'Gagal memuat data donasi: {str(e)}'})
+        return jsonify({'error': f'Gagal memuat data donasi: {str(e)}'}), 500
 
 @bp.route('/api/distribution-data/<int:year>')
 @superadmin_login_required
+@conditional(_statistik_state)
 def api_distribution_data(year):
-    """Get distribution data by month for specified year"""
+    """Get distribution data by month for specified year, optionally per perpus/kecamatan"""
     try:
-        results = db.session.query(
-            func.extract('month', RiwayatDistribusi.created_at).label('month'),
-            func.sum(DetailRiwayatDistribusi.jumlah).label('count')
-        )\
-        .join(DetailRiwayatDistribusi, DetailRiwayatDistribusi.distribusi_id == RiwayatDistribusi.id)\
-        .filter(func.extract('year', RiwayatDistribusi.created_at) == year)\
-        .group_by(func.extract('month', RiwayatDistribusi.created_at))\
-        .order_by('month')\
-        .all()
-        
-        # Create monthly data array (12 months)
-        monthly_data = [0] * 12
-        total_distributed = 0
-        
-        for result in results:
-            month_index = int(result.month) - 1  # Convert to 0-based index
-            if 0 <= month_index < 12:
-                monthly_data[month_index] = result.count or 0
-                total_distributed += result.count or 0
-        
-        # Format data for Chart.js
-        chart_data = [
-            {'month': i + 1, 'count': count}
-            for i, count in enumerate(monthly_data)
-        ]
-        
-        return jsonify({
-            'data': chart_data,
-            'total': total_distributed
-        })
+        ensure_statistik_fresh()
+        perpus_id = request.args.get('perpus_id', type=int)
+        kecamatan = request.args.get('kecamatan')
+        return jsonify(_distribution_series(year, perpus_id, kecamatan))
         
     except Exception as e:
-        return jsonify({'error': f'Gagal memuat data distribusi: {str(e)}'})
+        return jsonify({'error': f'Gagal memuat data distribusi: {str(e)}'}), 500
+
+# ==== Broadcast Email ====
+def _broadcast_dict(item):
+    return {
+        'id': item.id,
+        'subject': item.subject,
+        'target': BROADCAST_TARGETS.get(item.target, item.target),
+        'status': item.status,
+        'total': item.total,
+        'terkirim': item.terkirim,
+        'gagal': item.gagal,
+        'progres': round((item.terkirim + item.gagal) * 100 / item.total, 1) if item.total else 100,
+        'throughput': item.throughput,
+        'last_error': item.last_error,
+        'macet': is_stalled(item, current_app.config['BROADCAST_STALE_AFTER']),
+        'created_at': item.created_at.strftime('%d/%m/%Y %H:%M') if item.created_at else '-'
+    }
+
+@bp.route('/broadcast', methods=['GET', 'POST'])
+@superadmin_login_required
+def broadcast_email():
+    ensure_broadcast_table()
+    if request.method == 'POST':
+        try:
+            subject = request.form.get('subject', '').strip()
+            isi = request.form.get('isi', '').strip()
+            target = request.form.get('target', 'donatur')
+            if not subject or not isi:
+                return jsonify({'success': False, 'message': 'Subjek dan isi email wajib diisi.'})
+            if target not in BROADCAST_TARGETS:
+                return jsonify({'success': False, 'message': 'Target penerima tidak valid.'})
+            try:
+                validate_template(subject)
+                validate_template(isi)
+            except Exception as e:
+                return jsonify({'success': False, 'message': f'Template tidak valid: {str(e)}'})
+
+            total = count_recipients(target)
+            if not total:
+                return jsonify({'success': False, 'message': 'Tidak ada penerima untuk target ini.'})
+
+            user_data = SessionManager.get_user_session('superadmin') or {}
+            broadcast = EmailBroadcast(subject=subject, isi=isi, target=target, status='queued',
+                                       total=total, created_by=user_data.get('user_id'))
+            db.session.add(broadcast)
+            db.session.commit()
+
+            start_broadcast(current_app._get_current_object(), broadcast.id)
+            return jsonify({'success': True, 'message': f'Broadcast ke {total} penerima sedang dikirim.',
+                            'broadcast': _broadcast_dict(broadcast)})
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': f'Gagal membuat broadcast: {str(e)}'})
+
+    broadcasts = EmailBroadcast.query.order_by(EmailBroadcast.id.desc()).limit(20).all()
+    jumlah_penerima = {target: count_recipients(target) for target in BROADCAST_TARGETS}
+    return render_template('superadmin/broadcast_email.html',
+                           broadcasts=[_broadcast_dict(item) for item in broadcasts],
+                           targets=BROADCAST_TARGETS,
+                           jumlah_penerima=jumlah_penerima)
+
+@bp.route('/api/broadcast')
+@superadmin_login_required
+def api_broadcast_status():
+    """Progres & throughput broadcast terbaru (dipolling halaman broadcast)"""
+    try:
+        ensure_broadcast_table()
+        broadcasts = EmailBroadcast.query.order_by(EmailBroadcast.id.desc()).limit(20).all()
+        return jsonify({'success': True, 'data': [_broadcast_dict(item) for item in broadcasts]})
+    except Exception as e:
+        return jsonify({'error': f'Gagal memuat status broadcast: {str(e)}'})
+
+@bp.route('/broadcast/<int:broadcast_id>/jeda', methods=['POST'])
+@superadmin_login_required
+def jeda_broadcast(broadcast_id):
+    try:
+        broadcast = EmailBroadcast.query.get_or_404(broadcast_id)
+        if broadcast.status not in ['queued', 'running']:
+            return jsonify({'success': False, 'message': 'Broadcast tidak sedang berjalan.'})
+        # Thread pengirim berhenti setelah checkpoint batch berikutnya
+        broadcast.status = 'paused'
+        db.session.commit()
+        return jsonify({'success': True, 'message': 'Broadcast dijeda.'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Gagal menjeda broadcast: {str(e)}'})
+
+@bp.route('/broadcast/<int:broadcast_id>/lanjutkan', methods=['POST'])
+@superadmin_login_required
+def lanjutkan_broadcast(broadcast_id):
+    broadcast = EmailBroadcast.query.get_or_404(broadcast_id)
+    if broadcast.status == 'done':
+        return jsonify({'success': False, 'message': 'Broadcast sudah selesai.'})
+    # 'running' dengan heartbeat basi = worker mati di tengah jalan, boleh diambil alih
+    if not can_resume(broadcast.id, current_app.config['BROADCAST_STALE_AFTER']):
+        return jsonify({'success': False, 'message': 'Broadcast masih berjalan.'})
+    start_broadcast(current_app._get_current_object(), broadcast.id)
+    return jsonify({'success': True, 'message': 'Broadcast dilanjutkan dari checkpoint terakhir.'})
 
 @bp.route('/test-email', methods=['GET', 'POST'])
 @superadmin_login_required
@@ -1484,7 +1763,7 @@ def test_email():
             return jsonify({'success': False, 'message': 'Email address is required'})
         
         try:
-            email_service = EmailService()
+            email_service = get_email_service()
             success, message = email_service.send_test_email(test_email_address)
             
             if success:
@@ -1508,3 +1787,76 @@ def test_email():
     }
     
     return render_template('superadmin/test_email.html', config=email_config)
+
+# ==== Performa SQL ====
+SQL_STATS_ORDER = {
+    'avg_queries': 'Rata-rata query',
+    'avg_db_ms': 'Rata-rata waktu DB',
+    'nplus1': 'Dugaan N+1',
+    'slow': 'Query lambat'
+}
+
+@bp.route('/performa-sql')
+@superadmin_login_required
+def performa_sql():
+    """Endpoint dengan query terbanyak / terlama dari instrumentasi SQL per request"""
+    order_by = request.args.get('urut', 'avg_queries')
+    if order_by not in SQL_STATS_ORDER:
+        order_by = 'avg_queries'
+    store = get_sql_stats()
+    routes = store.worst_routes(order_by) if store else []
+    return render_template('superadmin/performa_sql.html',
+                           routes=routes,
+                           order_by=order_by,
+                           order_options=SQL_STATS_ORDER,
+                           enabled=store is not None,
+                           slow_ms=current_app.config.get('SQL_SLOW_QUERY_MS'),
+                           nplus1_threshold=current_app.config.get('SQL_NPLUS1_THRESHOLD'))
+
+@bp.route('/performa-sql/reset', methods=['POST'])
+@superadmin_login_required
+def reset_performa_sql():
+    store = get_sql_stats()
+    if store is None:
+        return jsonify({'success': False, 'message': 'Instrumentasi SQL tidak aktif.'})
+    try:
+        store.reset()
+        return jsonify({'success': True, 'message': 'Statistik SQL direset.'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Gagal mereset statistik: {str(e)}'})
+
+# ==== Profil Request ====
+PROFILE_SORT = {
+    'cumulative': 'Waktu kumulatif',
+    'tottime': 'Waktu sendiri',
+    'ncalls': 'Jumlah panggilan'
+}
+
+@bp.route('/profil-request')
+@superadmin_login_required
+def profil_request():
+    """Daftar profil request terbaru; ?id= menampilkan ringkasan pstats"""
+    directory = current_app.config.get('PROFILER_DIR')
+    profiles = list_profiles(directory) if directory else []
+    selected = request.args.get('id')
+    sort = request.args.get('urut', 'cumulative')
+    if sort not in PROFILE_SORT:
+        sort = 'cumulative'
+    summary = profile_summary(directory, selected, sort) if selected and directory else None
+    return render_template('superadmin/profil_request.html',
+                           profiles=profiles,
+                           selected=selected,
+                           summary=summary,
+                           sort=sort,
+                           sort_options=PROFILE_SORT,
+                           enabled=current_app.config.get('PROFILER_ENABLED', False))
+
+@bp.route('/profil-request/<profile_id>/<ext>')
+@superadmin_login_required
+def unduh_profil_request(profile_id, ext):
+    if ext not in ('prof', 'collapsed'):
+        abort(404)
+    path = profile_path(current_app.config['PROFILER_DIR'], profile_id, ext)
+    if path is None:
+        abort(404)
+    return send_file(path, as_attachment=True, download_name=f'{profile_id}.{ext}')
@@ -26,6 +26,8 @@ class User(db.Model, UserMixin):
 
     __table_args__ = (
         UniqueConstraint('email', name='uq_user_email'),
+        db.Index('ix_user_perpus_id', 'perpus_id'),
+        db.Index('ix_user_role', 'role'),
     )
 
     def check_password(self, password):
@@ -36,7 +38,7 @@ class User(db.Model, UserMixin):
 
 class Donasi(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     invoice = db.Column(db.String(100))
     whatsapp = db.Column(db.String(20), nullable=False)
     metode = db.Column(db.String(100), nullable=False, default='mandiri')
@@ -46,7 +48,7 @@ class Donasi(db.Model):
     bukti_pengiriman = db.Column(db.String(255))
     status = db.Column(db.String(20), default='draft')  # draft, pending, confirmed
     sertifikat = db.Column(db.String(255), nullable=True)
-    created_at = db.Column(db.DateTime, default=get_wib_datetime)
+    created_at = db.Column(db.DateTime, default=get_wib_datetime, index=True)
     updated_at = db.Column(db.DateTime, default=get_wib_datetime, onupdate=get_wib_datetime)
 
     user = db.relationship('User', backref='donasi_list', lazy=True)
@@ -54,6 +56,11 @@ class Donasi(db.Model):
     # Tambahkan relasi ke detail donasi
     details = db.relationship('DetailDonasi', backref='donasi', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_donasi_invoice', 'invoice'),
+        db.Index('ix_donasi_status_created_at', 'status', 'created_at'),
+    )
+
     @property
     def jumlah_buku(self):
         # total keseluruhan buku diterima dari semua detail
@@ -78,6 +85,11 @@ class DetailDonasi(db.Model):
 
     # Relationships
     subjek = db.relationship('SubjekBuku', backref='detail_donasi', lazy=True)
+
+    __table_args__ = (
+        db.Index('ix_detail_donasi_donasi_subjek', 'donasi_id', 'subjek_id'),
+        db.Index('ix_detail_donasi_subjek_id', 'subjek_id'),
+    )
 class SubjekBuku(db.Model):
     __tablename__ = 'subjek_buku'
     
@@ -106,6 +118,11 @@ class KebutuhanKoleksi(db.Model):
     # Relationships
     perpus = db.relationship('PerpusDesa', backref='kebutuhan_koleksi', lazy=True)
     detail_kebutuhan = db.relationship('DetailKebutuhanKoleksi', backref='kebutuhan_koleksi', lazy=True)
+
+    __table_args__ = (
+        db.Index('ix_kebutuhan_koleksi_status_prioritas', 'status', 'prioritas'),
+        db.Index('ix_kebutuhan_koleksi_perpus_tanggal', 'perpus_id', 'tanggal_pengajuan'),
+    )
     
     # Properties for template compatibility
     @property
@@ -142,6 +159,10 @@ class DetailKebutuhanKoleksi(db.Model):
     
     # Relationships
     subjek = db.relationship('SubjekBuku', backref='detail_kebutuhan_koleksi', lazy=True)
+
+    __table_args__ = (
+        db.Index('ix_detail_kebutuhan_koleksi_kebutuhan_id', 'kebutuhan_id'),
+    )
     
     def __repr__(self):
         return f'<DetailKebutuhanKoleksi {self.id}>'
@@ -153,12 +174,17 @@ class RiwayatDistribusi(db.Model):
     perpus_id = db.Column(db.Integer, db.ForeignKey('perpus_desa.id'), nullable=False)
     status = db.Column(db.String(20), default='pengiriman')  # pengiriman, diterima
     bukti_foto = db.Column(db.String(255))
-    created_at = db.Column(db.DateTime, default=get_wib_datetime)
+    created_at = db.Column(db.DateTime, default=get_wib_datetime, index=True)
     updated_at = db.Column(db.DateTime, default=get_wib_datetime, onupdate=get_wib_datetime)
     
     # Relationships
     perpus = db.relationship('PerpusDesa', backref='riwayat_distribusi', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_riwayat_distribusi_perpus_created_at', 'perpus_id', 'created_at'),
+        db.Index('ix_riwayat_distribusi_status_perpus', 'status', 'perpus_id'),
+    )
+
     # mengembalikan subjek (dari detail pertama) agar template {{ item.subjek_buku.nama }} tidak error
     @property
     def subjek_buku(self):
@@ -204,15 +230,24 @@ class DetailRiwayatDistribusi(db.Model):
     donasi = db.relationship('Donasi', backref='detail_riwayat_distribusi_list', lazy=True)
     subjek = db.relationship('SubjekBuku', backref='detail_riwayat_distribusi', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_detail_riwayat_distribusi_donasi_subjek', 'donasi_id', 'subjek_id'),
+        db.Index('ix_detail_riwayat_distribusi_distribusi_id', 'distribusi_id'),
+    )
+
 class Kunjungan(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     perpus_id = db.Column(db.Integer, db.ForeignKey('perpus_desa.id'), nullable=True)
-    tanggal = db.Column(db.DateTime, default=get_wib_datetime)  # Always stores WIB time
+    tanggal = db.Column(db.DateTime, default=get_wib_datetime, index=True)  # Always stores WIB time
     created_at = db.Column(db.DateTime, default=get_wib_datetime)
     updated_at = db.Column(db.DateTime, default=get_wib_datetime, onupdate=get_wib_datetime)
     
     perpus = db.relationship('PerpusDesa', backref='kunjungan_list')
 
+    __table_args__ = (
+        db.Index('ix_kunjungan_perpus_tanggal', 'perpus_id', 'tanggal'),
+    )
+
 class PerpusDesa(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nama = db.Column(db.String(100), nullable=False)
@@ -241,6 +276,10 @@ class DetailPerpus(db.Model):
     
     perpus = db.relationship('PerpusDesa', backref='detail_perpus')
 
+    __table_args__ = (
+        db.Index('ix_detail_perpus_perpus_id', 'perpus_id'),
+    )
+
 class KegiatanPerpus(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -257,4 +296,130 @@ class KegiatanPerpus(db.Model):
     updated_at = db.Column(db.DateTime, default=get_wib_datetime, onupdate=get_wib_datetime)
     
     user = db.relationship('User', backref='kegiatan_perpus_list')
-    perpus = db.relationship('PerpusDesa', backref='kegiatan_list')
\ No newline at end of file
+    perpus = db.relationship('PerpusDesa', backref='kegiatan_list')
+
+    __table_args__ = (
+        db.Index('ix_kegiatan_perpus_perpus_status_tanggal', 'perpus_id', 'status', 'tanggal_kegiatan'),
+        db.Index('ix_kegiatan_perpus_status_tanggal', 'status', 'tanggal_kegiatan'),
+    )
+class StatistikBulanan(db.Model):
+    """Rollup donasi, distribusi dan kunjungan per bulan x perpus x kecamatan x subjek.
+
+    Donasi tidak terikat ke perpustakaan (perpus_id/kecamatan NULL), kunjungan
+    tidak terikat ke subjek (subjek_id NULL). Diisi ulang oleh
+    app.utils.statistik_cube, jangan diubah langsung dari route.
+    """
+    __tablename__ = 'statistik_bulanan'
+
+    id = db.Column(db.Integer, primary_key=True)
+    tahun = db.Column(db.Integer, nullable=False)
+    bulan = db.Column(db.Integer, nullable=False)
+    perpus_id = db.Column(db.Integer, nullable=True)
+    kecamatan = db.Column(db.String(100), nullable=True)
+    subjek_id = db.Column(db.Integer, nullable=True)
+    buku_donasi = db.Column(db.Integer, nullable=False, default=0)  # SUM(DetailDonasi.diterima), donasi confirmed
+    buku_distribusi = db.Column(db.Integer, nullable=False, default=0)  # SUM(DetailRiwayatDistribusi.jumlah)
+    kunjungan = db.Column(db.Integer, nullable=False, default=0)  # COUNT(Kunjungan.id)
+
+    __table_args__ = (
+        db.Index('ix_statistik_bulanan_periode', 'tahun', 'bulan'),
+        db.Index('ix_statistik_bulanan_perpus', 'perpus_id', 'tahun'),
+        db.Index('ix_statistik_bulanan_kecamatan', 'kecamatan', 'tahun'),
+    )
+
+    def __repr__(self):
+        return f'<StatistikBulanan {self.tahun}-{self.bulan:02d}>'
+
+class StatistikRefresh(db.Model):
+    """Satu baris penanda kapan StatistikBulanan terakhir dibangun ulang penuh"""
+    __tablename__ = 'statistik_refresh'
+
+    id = db.Column(db.Integer, primary_key=True)
+    refreshed_at = db.Column(db.DateTime, nullable=True)
+    is_stale = db.Column(db.Boolean, default=False)
+    versi = db.Column(db.Integer, nullable=False, default=0)  # naik setiap rebuild/tambal, dipakai untuk ETag
+    rebuild_started_at = db.Column(db.DateTime, nullable=True)  # klaim worker yang sedang rebuild di background
+
+class PeringkatDonatur(db.Model):
+    """Agregat donasi confirmed per donatur untuk halaman Daftar Donatur.
+
+    Satu baris per user yang punya donasi confirmed. Dijaga oleh
+    app.utils.peringkat_donatur setelah commit, jangan diubah langsung dari route.
+    """
+    __tablename__ = 'peringkat_donatur'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    jumlah_subjek = db.Column(db.Integer, nullable=False, default=0)  # COUNT(DISTINCT DetailDonasi.subjek_id)
+    total_buku = db.Column(db.Integer, nullable=False, default=0)  # SUM(DetailDonasi.jumlah)
+
+    __table_args__ = (
+        db.Index('ix_peringkat_donatur_total_buku', 'total_buku'),
+    )
+
+    def __repr__(self):
+        return f'<PeringkatDonatur user={self.user_id} buku={self.total_buku}>'
+
+class EmailOutbox(db.Model):
+    """Antrian email keluar, dikirim di background oleh app.utils.email_outbox"""
+    __tablename__ = 'email_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(100), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    html_body = db.Column(db.Text, nullable=True)
+    text_body = db.Column(db.Text, nullable=True)
+    kategori = db.Column(db.String(50), nullable=True)  # donasi_confirmed, test, ...
+    ref_id = db.Column(db.Integer, nullable=True)  # id data terkait (mis. Donasi.id)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    next_attempt_at = db.Column(db.DateTime, nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=get_wib_datetime)
+
+    __table_args__ = (
+        db.Index('ix_email_outbox_antrian', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f'<EmailOutbox {self.id} {self.to_email} {self.status}>'
+
+class EmailBroadcast(db.Model):
+    """Email massal ke donatur / admin perpustakaan, dijalankan oleh app.utils.email_broadcast"""
+    __tablename__ = 'email_broadcast'
+
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    isi = db.Column(db.Text, nullable=False)  # template Jinja: {{ nama }}, {{ email }}, {{ total_buku }}
+    target = db.Column(db.String(20), nullable=False, default='donatur')  # donatur, admin_perpus, semua
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, paused, done
+    total = db.Column(db.Integer, nullable=False, default=0)
+    terkirim = db.Column(db.Integer, nullable=False, default=0)
+    gagal = db.Column(db.Integer, nullable=False, default=0)  # gagal percobaan pertama, dicoba ulang lewat outbox
+    last_recipient_id = db.Column(db.Integer, nullable=False, default=0)  # checkpoint: User.id terakhir yang selesai
+    durasi_detik = db.Column(db.Float, nullable=False, default=0)  # waktu kirim aktif, untuk pesan/detik
+    last_error = db.Column(db.Text, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=get_wib_datetime)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    @property
+    def throughput(self):
+        """Pesan per detik selama broadcast benar-benar mengirim"""
+        return round(self.terkirim / self.durasi_detik, 2) if self.durasi_detik else 0
+
+    def __repr__(self):
+        return f'<EmailBroadcast {self.id} {self.status} {self.terkirim}/{self.total}>'
+
+class CacheVersion(db.Model):
+    """Penghitung versi bersama untuk invalidasi cache antar worker gunicorn"""
+    __tablename__ = 'cache_version'
+
+    nama = db.Column(db.String(100), primary_key=True)
+    versi = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=get_wib_datetime, onupdate=get_wib_datetime)
+
+    def __repr__(self):
+        return f'<CacheVersion {self.nama}={self.versi}>'
@@ -0,0 +1,76 @@
+"""Cache per proses yang divalidasi dengan penghitung versi bersama di database.
+
+Setiap worker gunicorn menyimpan nilainya sendiri, tetapi sebelum dipakai
+nilai tersebut dibandingkan dengan baris CacheVersion (satu lookup primary
+key). Penulis cukup memanggil bump_version() setelah commit agar semua worker
+membangun ulang nilainya pada request berikutnya.
+"""
+import threading
+import time
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import CacheVersion, get_wib_datetime
+
+_table_ready = False
+
+
+def ensure_cache_version_table():
+    global _table_ready
+    if not _table_ready:
+        CacheVersion.__table__.create(db.engine, checkfirst=True)
+        _table_ready = True
+
+
+def get_version(nama):
+    """Versi saat ini untuk nama tertentu (0 jika belum pernah dinaikkan)"""
+    ensure_cache_version_table()
+    table = CacheVersion.__table__
+    with db.engine.connect() as conn:
+        versi = conn.execute(select(table.c.versi).where(table.c.nama == nama)).scalar()
+    return versi or 0
+
+
+def bump_version(*nama_list):
+    """Naikkan versi (dipanggil setelah commit yang mengubah data sumber cache)"""
+    ensure_cache_version_table()
+    table = CacheVersion.__table__
+    for nama in nama_list:
+        for _ in range(2):
+            try:
+                with db.engine.begin() as conn:
+                    result = conn.execute(update(table).where(table.c.nama == nama)
+                                          .values(versi=table.c.versi + 1, updated_at=get_wib_datetime()))
+                    if result.rowcount == 0:
+                        conn.execute(insert(table).values(nama=nama, versi=1, updated_at=get_wib_datetime()))
+                break
+            except IntegrityError:
+                # Worker lain baru saja membuat barisnya, ulangi sebagai UPDATE
+                continue
+
+
+class VersionedCache:
+    """Nilai hasil hitung per proses, berlaku selama versi bersama belum berubah"""
+
+    def __init__(self, nama):
+        self.nama = nama
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_or_build(self, build, key=None, max_age=None):
+        versi = get_version(self.nama)
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry_versi, created, value = entry
+            if entry_versi == versi and (max_age is None or time.monotonic() - created < max_age):
+                return value
+
+        value = build()
+        with self._lock:
+            self._entries[key] = (versi, time.monotonic(), value)
+        return value
+
+    def invalidate(self):
+        bump_version(self.nama)
@@ -0,0 +1,167 @@
+"""Kompresi respons gzip / brotli dan file static yang sudah dikompresi.
+
+Respons dinamis (HTML, JSON chart, CSS/JS) dikompresi di after_request jika
+klien menerima encoding-nya, tipe kontennya ada di COMPRESS_MIMETYPES dan
+ukurannya minimal COMPRESS_MIN_SIZE byte. Brotli dipakai jika paket `brotli`
+terpasang dan diterima klien, selain itu gzip.
+
+File static dilayani dari sibling `.br` / `.gz` yang dibuat
+`flask static-compress` saat deploy, jadi tidak ada biaya kompresi per request.
+Sibling yang lebih tua dari file aslinya diabaikan.
+"""
+import gzip
+import mimetypes
+import os
+
+from flask import request, send_file
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # opsional: tanpa brotli hanya gzip
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.xml', '.html', '.ico')
+
+# Ekstensi sibling -> nama Content-Encoding, urut prioritas
+_ENCODINGS = (('.br', 'br'), ('.gz', 'gzip'))
+
+
+def _available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def _negotiate(encodings):
+    """Encoding pertama (urut prioritas server) yang diterima klien"""
+    accepted = request.accept_encodings
+    for encoding in encodings:
+        if accepted[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress_bytes(data, encoding, level):
+    """level: compresslevel gzip (1-9) atau quality brotli (0-11)"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _should_compress(app, response):
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or response.status_code in (204, 206, 304) or 'Content-Encoding' in response.headers):
+        return False
+    if response.mimetype not in app.config['COMPRESS_MIMETYPES']:
+        return False
+    return (response.content_length or 0) >= app.config['COMPRESS_MIN_SIZE']
+
+
+def _compress_response(app, response):
+    if not _should_compress(app, response):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = _negotiate(_available_encodings())
+    if encoding is None:
+        return response
+
+    level = app.config['COMPRESS_BR_QUALITY'] if encoding == 'br' else app.config['COMPRESS_LEVEL']
+    compressed = compress_bytes(response.get_data(), encoding, level)
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    # Body berbeda per encoding: ETag kuat jadi lemah (If-None-Match tetap cocok)
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def _precompressed_static(app, static_view):
+    def static(filename):
+        path = safe_join(app.static_folder, filename)
+        if path is not None and os.path.isfile(path):
+            candidates = {encoding: ext for ext, encoding in _ENCODINGS
+                          if os.path.isfile(path + ext) and os.path.getmtime(path + ext) >= os.path.getmtime(path)}
+            encoding = _negotiate(list(candidates)) if candidates else None
+            if encoding is not None:
+                ext = candidates[encoding]
+                mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+                response = send_file(path + ext, mimetype=mimetype, conditional=True,
+                                     max_age=app.get_send_file_max_age(filename))
+                response.headers['Content-Encoding'] = encoding
+                response.vary.add('Accept-Encoding')
+                return response
+            if candidates or filename.endswith(COMPRESSIBLE_EXTENSIONS):
+                response = static_view(filename=filename)
+                response.vary.add('Accept-Encoding')
+                return response
+        return static_view(filename=filename)
+    return static
+
+
+def precompress_static(folder, min_size, encodings=None):
+    """Tulis sibling .gz (dan .br) untuk file static yang bisa dikompresi.
+
+    Mengembalikan list (path, ukuran_asli, {encoding: ukuran}) untuk file yang
+    ditulis; file yang siblingnya masih baru dilewati. Sibling yang tidak lebih
+    kecil minimal 10% dihapus supaya tidak dipakai.
+    """
+    encodings = encodings or _available_encodings()
+    written = []
+    for root, _dirs, files in os.walk(folder):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            size = os.path.getsize(path)
+            if size < min_size:
+                continue
+            mtime = os.path.getmtime(path)
+            pending = [(ext, encoding) for ext, encoding in _ENCODINGS if encoding in encodings
+                       and not (os.path.isfile(path + ext) and os.path.getmtime(path + ext) >= mtime)]
+            if not pending:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            sizes = {}
+            for ext, encoding in pending:
+                compressed = compress_bytes(data, encoding, 11 if encoding == 'br' else 9)
+                if len(compressed) > size * 0.9:
+                    if os.path.isfile(path + ext):
+                        os.remove(path + ext)
+                    continue
+                with open(path + ext, 'wb') as f:
+                    f.write(compressed)
+                sizes[encoding] = len(compressed)
+            if sizes:
+                written.append((path, size, sizes))
+    return written
+
+
+def remove_precompressed(folder):
+    removed = 0
+    for root, _dirs, files in os.walk(folder):
+        for name in files:
+            if name.endswith(('.gz', '.br')) and name[:-3].endswith(COMPRESSIBLE_EXTENSIONS):
+                os.remove(os.path.join(root, name))
+                removed += 1
+    return removed
+
+
+def init_compression(app):
+    app.config.setdefault('COMPRESS_ENABLED', True)
+    app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+    app.config.setdefault('COMPRESS_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BR_QUALITY', 4)
+    app.config.setdefault('COMPRESS_MIMETYPES', {
+        'text/html', 'text/css', 'text/plain', 'text/xml', 'text/javascript', 'text/csv',
+        'application/json', 'application/javascript', 'application/xml', 'image/svg+xml'
+    })
+    if not app.config['COMPRESS_ENABLED']:
+        return
+
+    if 'static' in app.view_functions:
+        app.view_functions['static'] = _precompressed_static(app, app.view_functions['static'])
+
+    @app.after_request
+    def _compress(response):
+        return _compress_response(app, response)
@@ -0,0 +1,107 @@
+"""Respons kondisional (ETag / Last-Modified -> 304) tanpa merender body.
+
+View diberi decorator `@conditional(validator)`. `validator(**view_args)`
+mengembalikan daftar bagian murah yang menentukan isi respons, biasanya
+`table_state(Model, *kriteria)` (satu query COUNT + MAX(updated_at)) atau
+versi rollup statistik. Dari bagian itu, endpoint, argumen, query string,
+identitas login dan versi template dibentuk ETag; Last-Modified diambil dari
+updated_at terbaru. Jika header If-None-Match / If-Modified-Since cocok, view
+tidak dijalankan sama sekali dan klien mendapat 304.
+
+COUNT ikut dalam ETag agar penghapusan baris (yang tidak mengubah
+MAX(updated_at)) tetap mengganti validator.
+"""
+import functools
+import hashlib
+import os
+from collections import namedtuple
+from datetime import timezone
+
+import pytz
+from flask import current_app, make_response, request, session
+from sqlalchemy import func, select
+from werkzeug.http import is_resource_modified
+
+from app import db
+from app.utils.session_manager import SessionManager
+
+TableState = namedtuple('TableState', ['table', 'count', 'updated_at'])
+
+_WIB = pytz.timezone('Asia/Jakarta')
+_ROLES = ('user', 'admin', 'superadmin')
+
+
+def table_state(model, *criteria):
+    """Jumlah baris dan updated_at terbaru dari model (opsional difilter)"""
+    query = select(func.count(), func.max(model.updated_at)).select_from(model)
+    if criteria:
+        query = query.where(*criteria)
+    count, updated_at = db.session.execute(query).one()
+    return TableState(model.__tablename__, count, updated_at)
+
+
+def _to_utc(value):
+    # Kolom updated_at disimpan sebagai waktu WIB tanpa zona
+    if value.tzinfo is None:
+        value = _WIB.localize(value)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def template_version(app):
+    """mtime terbaru folder templates: ETag berganti saat tampilan di-deploy ulang"""
+    latest = 0
+    for root, _dirs, files in os.walk(os.path.join(app.root_path, app.template_folder)):
+        for name in files:
+            latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+    return int(latest)
+
+
+def _identity():
+    return tuple(SessionManager.get_current_user_id(role) for role in _ROLES)
+
+
+def conditional(validator):
+    """Decorator view: jawab 304 jika validator tidak berubah sejak request klien"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(**kwargs):
+            app = current_app._get_current_object()
+            if (not app.config.get('CONDITIONAL_ENABLED', True) or request.method not in ('GET', 'HEAD')
+                    or '_flashes' in session):
+                return func(**kwargs)
+
+            try:
+                parts = validator(**kwargs)
+            except Exception as e:
+                app.logger.error(f"Gagal menghitung validator {request.endpoint}: {str(e)}")
+                return func(**kwargs)
+
+            identity = _identity()
+            source = repr((request.endpoint, sorted(kwargs.items()), sorted(request.args.items(multi=True)),
+                           identity, app.config['CONDITIONAL_TEMPLATE_VERSION'], list(parts)))
+            etag = hashlib.sha1(source.encode('utf-8')).hexdigest()
+            # Last-Modified tidak memuat identitas login, jadi hanya untuk pengunjung anonim
+            timestamps = [part.updated_at for part in parts
+                          if isinstance(part, TableState) and part.updated_at is not None]
+            last_modified = _to_utc(max(timestamps)) if timestamps and not any(identity) else None
+
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = app.response_class(status=304)
+            else:
+                response = make_response(func(**kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Simpan boleh, tapi selalu tanya ulang; respons milik pengguna login tidak untuk proxy
+            response.headers['Cache-Control'] = 'private, no-cache' if any(identity) else 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+def init_conditional(app):
+    app.config.setdefault('CONDITIONAL_ENABLED', True)
+    app.config.setdefault('CONDITIONAL_TEMPLATE_VERSION', template_version(app))
@@ -0,0 +1,78 @@
+"""Cache ringkasan dashboard superadmin dengan invalidasi write-through.
+
+Ringkasan dibangun ulang hanya jika versi 'superadmin_dashboard' berubah
+(lihat app.utils.cache_version) atau umurnya melewati DASHBOARD_CACHE_MAX_AGE.
+Versi dinaikkan setelah commit yang mengubah status Donasi, detail donasi,
+KebutuhanKoleksi, atau menambah/menghapus/mengganti nama PerpusDesa.
+"""
+from flask import current_app
+from sqlalchemy import event, inspect
+
+from app import db
+from app.models import Donasi, DetailDonasi, KebutuhanKoleksi, DetailKebutuhanKoleksi, PerpusDesa
+from app.utils.cache_version import VersionedCache
+
+DASHBOARD_CACHE_NAME = 'superadmin_dashboard'
+
+_PENDING_KEY = 'dashboard_cache_dirty'
+_dashboard_cache = VersionedCache(DASHBOARD_CACHE_NAME)
+
+
+def get_dashboard_summary(build):
+    """Ambil ringkasan dari cache, atau bangun dengan build() jika sudah tidak berlaku"""
+    max_age = current_app.config.get('DASHBOARD_CACHE_MAX_AGE', 300)
+    return _dashboard_cache.get_or_build(build, max_age=max_age)
+
+
+def invalidate_dashboard_summary():
+    _dashboard_cache.invalidate()
+
+
+def _attr_changed(obj, *names):
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in names)
+
+
+def _affects_dashboard(session):
+    for obj in session.new:
+        if isinstance(obj, (Donasi, DetailDonasi, KebutuhanKoleksi, DetailKebutuhanKoleksi, PerpusDesa)):
+            return True
+    for obj in session.deleted:
+        if isinstance(obj, (Donasi, DetailDonasi, KebutuhanKoleksi, DetailKebutuhanKoleksi, PerpusDesa)):
+            return True
+    for obj in session.dirty:
+        if isinstance(obj, (KebutuhanKoleksi, DetailKebutuhanKoleksi)):
+            return True
+        if isinstance(obj, Donasi) and _attr_changed(obj, 'status', 'user_id'):
+            return True
+        if isinstance(obj, DetailDonasi) and _attr_changed(obj, 'jumlah', 'subjek_id'):
+            return True
+        if isinstance(obj, PerpusDesa) and _attr_changed(obj, 'nama', 'kecamatan'):
+            return True
+    return False
+
+
+def _track_changes(session, flush_context, instances):
+    if not session.info.get(_PENDING_KEY) and _affects_dashboard(session):
+        session.info[_PENDING_KEY] = True
+
+
+def _invalidate_after_commit(session):
+    if session.info.pop(_PENDING_KEY, False):
+        try:
+            invalidate_dashboard_summary()
+        except Exception as e:
+            current_app.logger.error(f"Gagal menginvalidasi cache dashboard: {str(e)}")
+
+
+def _discard_pending(session, previous_transaction=None):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def init_dashboard_cache(app):
+    """Pasang hook invalidasi cache dashboard pada sesi SQLAlchemy"""
+    app.config.setdefault('DASHBOARD_CACHE_MAX_AGE', 300)
+    if not event.contains(db.session, 'before_flush', _track_changes):
+        event.listen(db.session, 'before_flush', _track_changes)
+        event.listen(db.session, 'after_commit', _invalidate_after_commit)
+        event.listen(db.session, 'after_soft_rollback', _discard_pending)
@@ -0,0 +1,174 @@
+"""Helper query yang berjalan sama di SQLite dan PostgreSQL (DATABASE_URL).
+
+Fungsi agregat di sini dikompilasi sesuai dialek saat query dijalankan, jadi
+controller cukup memakai group_concat(...) tanpa peduli database yang aktif.
+"""
+from sqlalchemy import (
+    Boolean, MetaData, String, Table, create_engine, delete, func, insert, inspect, literal, select, text
+)
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
+# Jumlah baris maksimal yang dibaca setiap cek portabilitas
+CHECK_LIMIT = 50
+
+
+class group_concat(FunctionElement):
+    """Gabungkan nilai teks per grup: group_concat() di SQLite, string_agg() di PostgreSQL.
+
+    group_concat(SubjekBuku.nama, distinct=True) -> 'Novel,Sains'
+    """
+    type = String()
+    inherit_cache = True
+    # separator & distinct ikut kunci cache kompilasi SQLAlchemy
+    _traverse_internals = FunctionElement._traverse_internals + [
+        ('separator', InternalTraversal.dp_string),
+        ('distinct', InternalTraversal.dp_boolean)
+    ]
+    name = 'group_concat'
+
+    def __init__(self, expr, separator=',', distinct=False):
+        self.separator = separator
+        self.distinct = distinct
+        super().__init__(expr)
+
+
+@compiles(group_concat)
+def _group_concat_default(element, compiler, **kw):
+    expr = compiler.process(element.clauses, **kw)
+    if element.distinct:
+        # SQLite tidak menerima separator bersama DISTINCT; pemisahnya selalu ','
+        return f'group_concat(DISTINCT {expr})'
+    separator = compiler.process(literal(element.separator, String), **kw)
+    return f'group_concat({expr}, {separator})'
+
+
+@compiles(group_concat, 'postgresql')
+def _group_concat_postgresql(element, compiler, **kw):
+    expr = compiler.process(element.clauses, **kw)
+    separator = compiler.process(literal(element.separator, String), **kw)
+    distinct = 'DISTINCT ' if element.distinct else ''
+    return f'string_agg({distinct}CAST({expr} AS TEXT), {separator})'
+
+
+def is_postgresql(app):
+    return make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name() == 'postgresql'
+
+
+def configure_postgresql_engine(app):
+    """Opsi engine PostgreSQL; harus dipanggil sebelum db.init_app.
+
+    Kolom DateTime disimpan tanpa zona waktu sedangkan model memakai waktu WIB
+    yang timezone-aware. Zona sesi disamakan (DB_TIMEZONE) agar jam yang
+    tersimpan, func.date() dan extract() sama persis dengan di SQLite.
+    """
+    app.config.setdefault('DB_TIMEZONE', 'Asia/Jakarta')
+    app.config.setdefault('DB_POOL_SIZE', 10)
+    if not is_postgresql(app):
+        return
+
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    options.setdefault('pool_size', app.config['DB_POOL_SIZE'])
+    options.setdefault('max_overflow', app.config['DB_POOL_SIZE'])
+    options.setdefault('pool_pre_ping', True)
+    options.setdefault('pool_recycle', 1800)
+    connect_args = options.setdefault('connect_args', {})
+    connect_args.setdefault('options', f"-c timezone={app.config['DB_TIMEZONE']}")
+
+
+def sync_sequences(conn, tables):
+    """PostgreSQL: lanjutkan sequence id dari id terbesar setelah insert dengan id eksplisit"""
+    if conn.dialect.name != 'postgresql':
+        return
+    for table in tables:
+        if 'id' in table.c and table.c.id.primary_key:
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('\"{table.name}\"', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM \"{table.name}\"), 0) + 1, false)"))
+
+
+def copy_database(source_url, replace=False):
+    """Salin seluruh data dari database lain (mis. SQLite lama) ke database aplikasi.
+
+    Tabel dibuat dengan db.create_all() jika belum ada. Mengembalikan
+    [(nama_tabel, jumlah_baris)]; tabel yang tidak ada di sumber dilewati.
+    """
+    from app import db
+
+    source = create_engine(source_url)
+    source_tables = set(inspect(source).get_table_names())
+    tables = db.metadata.sorted_tables
+    db.create_all()
+
+    copied = []
+    with source.connect() as src, db.engine.begin() as dst:
+        for table in tables:
+            if not replace and dst.execute(select(func.count()).select_from(table)).scalar():
+                raise ValueError(f"Tabel {table.name} di database tujuan sudah berisi data")
+        if replace:
+            for table in reversed(tables):
+                dst.execute(delete(table))
+
+        for table in tables:
+            if table.name not in source_tables:
+                continue
+            source_table = Table(table.name, MetaData(), autoload_with=src)
+            names = [column.name for column in table.columns if column.name in source_table.c]
+            # SQLite menyimpan boolean sebagai 0/1; PostgreSQL butuh True/False
+            booleans = [name for name in names if isinstance(table.c[name].type, Boolean)]
+            rows = []
+            for row in src.execute(select(*[source_table.c[name] for name in names])):
+                values = dict(zip(names, row))
+                for name in booleans:
+                    if values[name] is not None:
+                        values[name] = bool(values[name])
+                rows.append(values)
+            if rows:
+                dst.execute(insert(table), rows)
+            copied.append((table.name, len(rows)))
+
+        sync_sequences(dst, tables)
+    return copied
+
+
+def check_portability():
+    """Jalankan query yang bergantung dialek pada database aktif.
+
+    Dipakai `flask db-cek` untuk matriks SQLite / PostgreSQL: jalankan sekali
+    per DATABASE_URL. Hanya SELECT (dengan LIMIT), tidak ada data yang diubah.
+    Mengembalikan [(nama_cek, berhasil, keterangan)].
+    """
+    from app import db
+    from app.models import DetailDonasi, Donasi, Kunjungan, SubjekBuku, get_wib_datetime
+    from app.utils.peringkat_donatur import _peringkat_select
+    from app.utils.statistik_cube import _distribusi_select, _donasi_select, _kunjungan_select
+
+    subjek_per_donasi = select(Donasi.id, group_concat(SubjekBuku.nama))\
+        .join(DetailDonasi, DetailDonasi.donasi_id == Donasi.id)\
+        .join(SubjekBuku, SubjekBuku.id == DetailDonasi.subjek_id)\
+        .group_by(Donasi.id)
+    checks = [
+        ('group_concat', lambda: len(db.session.execute(subjek_per_donasi).all())),
+        ('group_concat distinct', lambda: len(db.session.execute(
+            select(group_concat(SubjekBuku.nama, distinct=True))
+            .join(DetailDonasi, DetailDonasi.subjek_id == SubjekBuku.id)).all())),
+        ('date() hari ini', lambda: db.session.execute(
+            select(func.count(Kunjungan.id))
+            .where(func.date(Kunjungan.tanggal) == get_wib_datetime().date())).scalar()),
+        ('rollup statistik (extract)', lambda: sum(
+            db.session.execute(select(func.count()).select_from(source().limit(CHECK_LIMIT).subquery())).scalar()
+            for source in (_donasi_select, _distribusi_select, _kunjungan_select))),
+        ('peringkat donatur', lambda: len(db.session.execute(_peringkat_select().limit(CHECK_LIMIT)).all()))
+    ]
+
+    results = []
+    for name, check in checks:
+        try:
+            value = check()
+            results.append((name, True, '' if value is None else str(value)))
+        except Exception as e:
+            db.session.rollback()
+            results.append((name, False, str(e).splitlines()[0]))
+    return results
@@ -0,0 +1,125 @@
+"""Index foreign key & kolom filter, plus pemeriksaan EXPLAIN QUERY PLAN.
+
+Index dideklarasikan di models.py (__table_args__ / index=True). Database lama
+yang dibuat sebelum index itu ada dilengkapi oleh ensure_indexes() saat
+aplikasi start (DB_AUTO_INDEX) atau lewat `flask db-index`.
+
+`flask db-explain` menjalankan EXPLAIN QUERY PLAN untuk query utama di route
+dan gagal jika ada tabel besar yang dibaca dengan full scan.
+"""
+import re
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, inspect, select
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from app import db
+from app.models import (
+    DetailDonasi, DetailKebutuhanKoleksi, DetailPerpus, DetailRiwayatDistribusi, Donasi, KebutuhanKoleksi,
+    KegiatanPerpus, Kunjungan, PerpusDesa, RiwayatDistribusi, SubjekBuku, User
+)
+
+# Tabel referensi kecil yang memang wajar di-scan (dropdown, join ke nama)
+SCAN_ALLOWED = {'subjek_buku', 'perpus_desa'}
+
+_SCAN_PATTERN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+
+
+def ensure_indexes():
+    """Buat index model yang belum ada di database. Mengembalikan nama index yang dibuat."""
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                index.create(db.engine)
+                created.append(index.name)
+            except (OperationalError, ProgrammingError):
+                # Worker lain membuat index yang sama pada saat bersamaan
+                pass
+    if created:
+        current_app.logger.info(f"Index dibuat: {', '.join(created)}")
+    return created
+
+
+def _key_queries():
+    """Query utama per route (bentuk sama dengan di controller, parameter contoh)"""
+    awal_hari = datetime.combine(datetime.now().date(), datetime.min.time())
+    return [
+        ('riwayat donatur', select(Donasi.id).where(Donasi.user_id == 1, Donasi.status == 'confirmed')
+            .order_by(Donasi.created_at.desc())),
+        ('donasi per invoice', select(Donasi).where(Donasi.invoice == 'DNSI')),
+        ('daftar donasi per status', select(Donasi.id).where(Donasi.status == 'pending')
+            .order_by(Donasi.created_at.desc()).limit(10)),
+        ('detail donasi', select(DetailDonasi.jumlah, SubjekBuku.nama)
+            .join(SubjekBuku, SubjekBuku.id == DetailDonasi.subjek_id)
+            .where(DetailDonasi.donasi_id == 1)),
+        ('distribusi per donasi', select(func.sum(DetailRiwayatDistribusi.jumlah))
+            .where(DetailRiwayatDistribusi.donasi_id == 1, DetailRiwayatDistribusi.subjek_id == 1)),
+        ('detail distribusi', select(DetailRiwayatDistribusi.jumlah)
+            .where(DetailRiwayatDistribusi.distribusi_id == 1)),
+        ('buku diterima perpus', select(func.sum(DetailRiwayatDistribusi.jumlah))
+            .join(RiwayatDistribusi, RiwayatDistribusi.id == DetailRiwayatDistribusi.distribusi_id)
+            .where(RiwayatDistribusi.perpus_id == 1, RiwayatDistribusi.status == 'diterima')),
+        ('riwayat distribusi perpus', select(RiwayatDistribusi.id).where(RiwayatDistribusi.perpus_id == 1)
+            .order_by(RiwayatDistribusi.created_at.desc())),
+        ('kunjungan hari ini', select(func.count(Kunjungan.id))
+            .where(Kunjungan.perpus_id == 1, Kunjungan.tanggal >= awal_hari,
+                   Kunjungan.tanggal < awal_hari + timedelta(days=1))),
+        ('berita terbaru', select(KegiatanPerpus.id, User.full_name, PerpusDesa.nama)
+            .join(User, User.id == KegiatanPerpus.user_id)
+            .join(PerpusDesa, PerpusDesa.id == KegiatanPerpus.perpus_id)
+            .where(KegiatanPerpus.status == 'active')
+            .order_by(KegiatanPerpus.tanggal_kegiatan.desc()).limit(3)),
+        ('kegiatan perpus', select(KegiatanPerpus.id)
+            .where(KegiatanPerpus.perpus_id == 1, KegiatanPerpus.status == 'active')
+            .order_by(KegiatanPerpus.tanggal_kegiatan.desc())),
+        ('pengajuan pending', select(KebutuhanKoleksi.id).where(KebutuhanKoleksi.status == 'pending')
+            .order_by(KebutuhanKoleksi.prioritas)),
+        ('kebutuhan perpus', select(KebutuhanKoleksi.id).where(KebutuhanKoleksi.perpus_id == 1)
+            .order_by(KebutuhanKoleksi.tanggal_pengajuan.desc())),
+        ('detail kebutuhan', select(DetailKebutuhanKoleksi.jumlah_buku)
+            .where(DetailKebutuhanKoleksi.kebutuhan_id == 1)),
+        ('admin perpus', select(User.id).where(User.perpus_id == 1)),
+        ('profil perpus', select(DetailPerpus.id).where(DetailPerpus.perpus_id == 1)),
+    ]
+
+
+def explain_key_queries():
+    """EXPLAIN QUERY PLAN (SQLite) untuk setiap query utama.
+
+    Mengembalikan [(nama, [baris plan], [tabel yang di-full-scan])].
+    """
+    if db.engine.dialect.name != 'sqlite':
+        raise RuntimeError("EXPLAIN QUERY PLAN hanya tersedia di SQLite")
+    results = []
+    with db.engine.connect() as conn:
+        for name, query in _key_queries():
+            compiled = query.compile(dialect=conn.dialect)
+            rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}',
+                                        tuple(compiled.params[key] for key in compiled.positiontup)).all()
+            plan = [row[-1] for row in rows]
+            scans = []
+            for detail in plan:
+                match = _SCAN_PATTERN.match(detail)
+                if match and match.group(1) not in SCAN_ALLOWED:
+                    scans.append(match.group(1))
+            results.append((name, plan, scans))
+    return results
+
+
+def init_db_indexes(app):
+    app.config.setdefault('DB_AUTO_INDEX', True)
+    if app.config['DB_AUTO_INDEX']:
+        with app.app_context():
+            try:
+                ensure_indexes()
+            except Exception as e:
+                app.logger.error(f"Gagal membuat index database: {str(e)}")
@@ -0,0 +1,275 @@
+"""Email massal (broadcast) ke donatur dan admin perpustakaan.
+
+Penerima diproses per batch berurutan User.id. Setiap batch dikirim paralel
+lewat beberapa sesi SMTP yang dipakai ulang (BROADCAST_SMTP_POOL), dibatasi
+BROADCAST_RATE_LIMIT pesan/detik, lalu progresnya disimpan (checkpoint
+last_recipient_id) sehingga broadcast yang terputus cukup dilanjutkan dari
+batch terakhir. Email yang gagal dikirim dialihkan ke outbox untuk dicoba ulang.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from queue import Queue
+
+from flask import current_app
+from jinja2.sandbox import SandboxedEnvironment
+from markupsafe import Markup
+from sqlalchemy import func, or_, select, update
+
+from app import db
+from app.models import EmailBroadcast, PeringkatDonatur, User
+from app.utils.email_outbox import SMTPSession, SMTPUnavailable, enqueue_email_batch
+from app.utils.peringkat_donatur import ensure_peringkat_tables
+
+BROADCAST_TARGETS = {
+    'donatur': 'Donatur',
+    'admin_perpus': 'Admin Perpustakaan Desa',
+    'semua': 'Donatur & Admin Perpustakaan Desa'
+}
+
+BROADCAST_LAYOUT = 'email/broadcast.html'
+
+_tables_ready = False
+_html_env = SandboxedEnvironment(autoescape=True)
+_text_env = SandboxedEnvironment(autoescape=False)
+_template_cache = {}
+_template_lock = threading.Lock()
+
+
+def ensure_broadcast_table():
+    global _tables_ready
+    if not _tables_ready:
+        # Penerima 'donatur' dibaca dari tabel peringkat donatur
+        ensure_peringkat_tables()
+        EmailBroadcast.__table__.create(db.engine, checkfirst=True)
+        _tables_ready = True
+
+
+def _compiled(env, source):
+    """Template hasil kompilasi di-cache per isi, dipakai ulang untuk semua penerima"""
+    key = (id(env), source)
+    template = _template_cache.get(key)
+    if template is None:
+        with _template_lock:
+            template = _template_cache.get(key)
+            if template is None:
+                if len(_template_cache) > 64:
+                    _template_cache.clear()
+                template = env.from_string(source)
+                _template_cache[key] = template
+    return template
+
+
+def validate_template(source):
+    """Kompilasi template sekali untuk menolak sintaks yang salah sebelum broadcast dibuat"""
+    _compiled(_text_env, source)
+
+
+def render_broadcast(subject_source, isi_source, recipient, layout):
+    """Return (subject, html, text) untuk satu penerima; layout = template email/broadcast.html"""
+    context = {
+        'nama': recipient.full_name or recipient.username or recipient.email,
+        'email': recipient.email,
+        'username': recipient.username,
+        'total_buku': recipient.total_buku or 0
+    }
+    subject = _compiled(_text_env, subject_source).render(context)
+    text_body = _compiled(_text_env, isi_source).render(context)
+    html_isi = _compiled(_html_env, isi_source).render(context)
+    html_body = layout.render(subject=subject, isi=Markup(html_isi.replace('\n', '<br>\n')))
+    return subject, html_body, text_body
+
+
+def _recipients_query(target):
+    query = select(User.id, User.full_name, User.username, User.email,
+                   PeringkatDonatur.total_buku)\
+        .select_from(User)\
+        .outerjoin(PeringkatDonatur, PeringkatDonatur.user_id == User.id)\
+        .where(User.email.isnot(None), User.email != '')
+    if target == 'donatur':
+        query = query.where(PeringkatDonatur.user_id.isnot(None))
+    elif target == 'admin_perpus':
+        query = query.where(User.role == 'admin')
+    else:
+        query = query.where(or_(PeringkatDonatur.user_id.isnot(None), User.role == 'admin'))
+    return query
+
+
+def count_recipients(target):
+    query = _recipients_query(target)
+    return db.session.execute(select(func.count()).select_from(query.subquery())).scalar() or 0
+
+
+def _next_batch(target, after_id, limit):
+    query = _recipients_query(target).where(User.id > after_id).order_by(User.id).limit(limit)
+    with db.engine.connect() as conn:
+        return conn.execute(query).all()
+
+
+class RateLimiter:
+    """Token bucket sederhana yang aman dipakai beberapa thread"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def _claimable(table, stale_after, now):
+    """Broadcast boleh diambil worker ini: belum/dijeda, atau 'running' dengan heartbeat basi (worker mati)"""
+    return or_(table.c.status.in_(['queued', 'paused']),
+               (table.c.status == 'running') & (table.c.heartbeat_at < now - timedelta(seconds=stale_after)))
+
+
+def is_stalled(broadcast, stale_after):
+    """Broadcast 'running' yang heartbeat-nya basi (sisi Python dari _claimable, untuk UI)"""
+    return (broadcast.status == 'running' and broadcast.heartbeat_at is not None
+            and broadcast.heartbeat_at < datetime.now() - timedelta(seconds=stale_after))
+
+
+def can_resume(broadcast_id, stale_after):
+    """True jika broadcast bisa dilanjutkan sekarang (predikat yang sama dengan _claim)"""
+    table = EmailBroadcast.__table__
+    with db.engine.connect() as conn:
+        return conn.execute(select(table.c.id).where(
+            table.c.id == broadcast_id, _claimable(table, stale_after, datetime.now()))).first() is not None
+
+
+def _claim(broadcast_id, stale_after):
+    """Tandai broadcast 'running' jika belum dijalankan worker lain (atau worker lama sudah mati)"""
+    table = EmailBroadcast.__table__
+    now = datetime.now()
+    with db.engine.begin() as conn:
+        result = conn.execute(update(table).where(
+            table.c.id == broadcast_id, _claimable(table, stale_after, now)
+        ).values(status='running', heartbeat_at=now, last_error=None))
+    return result.rowcount == 1
+
+
+def _checkpoint(broadcast_id, last_id, sent, failed, elapsed):
+    """Simpan progres batch; mengembalikan status terbaru (bisa 'paused' dari UI)"""
+    table = EmailBroadcast.__table__
+    with db.engine.begin() as conn:
+        conn.execute(update(table).where(table.c.id == broadcast_id).values(
+            last_recipient_id=last_id,
+            terkirim=table.c.terkirim + sent,
+            gagal=table.c.gagal + failed,
+            durasi_detik=table.c.durasi_detik + elapsed,
+            heartbeat_at=datetime.now()))
+        return conn.execute(select(table.c.status).where(table.c.id == broadcast_id)).scalar()
+
+
+def _set_status(broadcast_id, status, **values):
+    table = EmailBroadcast.__table__
+    with db.engine.begin() as conn:
+        conn.execute(update(table).where(table.c.id == broadcast_id).values(status=status, **values))
+
+
+def run_broadcast(broadcast_id):
+    """Kirim broadcast dari checkpoint terakhir sampai selesai atau dijeda. Butuh app context."""
+    from app.utils.email_utils import get_email_service
+
+    config = current_app.config
+    ensure_broadcast_table()
+    if not _claim(broadcast_id, config['BROADCAST_STALE_AFTER']):
+        return False
+
+    app = current_app._get_current_object()
+    broadcast = db.session.get(EmailBroadcast, broadcast_id)
+    subject_source, isi_source, target = broadcast.subject, broadcast.isi, broadcast.target
+    layout = app.jinja_env.get_template(BROADCAST_LAYOUT)
+    pool_size = max(config.get('BROADCAST_SMTP_POOL', 3), 1)
+    batch_size = config.get('BROADCAST_BATCH_SIZE', 50)
+    limiter = RateLimiter(config.get('BROADCAST_RATE_LIMIT', 5))
+    email_service = get_email_service(app)
+    sessions = Queue()
+    for _ in range(pool_size):
+        sessions.put(SMTPSession(email_service))
+
+    def send_one(recipient):
+        subject, html_body, text_body = render_broadcast(subject_source, isi_source, recipient, layout)
+        limiter.acquire()
+        smtp_session = sessions.get()
+        try:
+            smtp_session.send(recipient.email, subject, html_body, text_body)
+            return None
+        except Exception as e:
+            smtp_session.close()
+            return e, {'to_email': recipient.email, 'subject': subject,
+                       'html_body': html_body, 'text_body': text_body}
+        finally:
+            sessions.put(smtp_session)
+
+    last_id = broadcast.last_recipient_id
+    try:
+        with ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='broadcast') as executor:
+            while True:
+                recipients = _next_batch(target, last_id, batch_size)
+                if not recipients:
+                    _set_status(broadcast_id, 'done', finished_at=datetime.now(), heartbeat_at=datetime.now())
+                    break
+
+                started = time.monotonic()
+                results = list(executor.map(send_one, recipients))
+                elapsed = time.monotonic() - started
+                failures = [result for result in results if result is not None]
+
+                if failures and len(failures) == len(results) and \
+                        all(isinstance(error, SMTPUnavailable) for error, _ in failures):
+                    # Server SMTP tidak tersedia: jangan majukan checkpoint, jeda & laporkan
+                    _set_status(broadcast_id, 'paused', last_error=str(failures[0][0])[:1000])
+                    break
+
+                if failures:
+                    enqueue_email_batch([item for _, item in failures],
+                                        kategori='broadcast', ref_id=broadcast_id)
+
+                last_id = recipients[-1].id
+                status = _checkpoint(broadcast_id, last_id, len(results) - len(failures),
+                                     len(failures), elapsed)
+                if status != 'running':
+                    break
+    except Exception as e:
+        current_app.logger.error(f"Broadcast {broadcast_id} berhenti: {str(e)}")
+        _set_status(broadcast_id, 'paused', last_error=str(e)[:1000])
+    finally:
+        while not sessions.empty():
+            sessions.get().close()
+        db.session.remove()
+    return True
+
+
+def start_broadcast(app, broadcast_id):
+    """Jalankan broadcast di thread background proses ini"""
+    def target():
+        with app.app_context():
+            run_broadcast(broadcast_id)
+
+    thread = threading.Thread(target=target, name=f'broadcast-{broadcast_id}', daemon=True)
+    thread.start()
+    return thread
+
+
+def init_email_broadcast(app):
+    app.config.setdefault('BROADCAST_SMTP_POOL', 3)
+    app.config.setdefault('BROADCAST_RATE_LIMIT', 5)
+    app.config.setdefault('BROADCAST_BATCH_SIZE', 50)
+    # Detik tanpa heartbeat sebelum broadcast 'running' dianggap ditinggal worker yang mati
+    app.config.setdefault('BROADCAST_STALE_AFTER', 300)
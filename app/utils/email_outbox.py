@@ -0,0 +1,283 @@
+"""Outbox email: antrian di database + pengirim background.
+
+Route cukup memanggil enqueue_email() sebelum commit sehingga email tercatat
+dalam transaksi yang sama dengan perubahan datanya, lalu thread pengirim
+mengambil antrian, memakai ulang satu sesi SMTP yang sudah login untuk banyak
+email, dan mencoba ulang dengan backoff jika gagal. Beberapa worker gunicorn
+aman berjalan bersamaan karena setiap baris diklaim dengan UPDATE bersyarat.
+"""
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, insert, or_, select, update
+
+from app import db
+from app.models import EmailOutbox
+
+_tables_ready = False
+_sender = None
+_sender_lock = threading.Lock()
+
+
+def ensure_outbox_table():
+    global _tables_ready
+    if not _tables_ready:
+        EmailOutbox.__table__.create(db.engine, checkfirst=True)
+        _tables_ready = True
+
+
+def enqueue_email(to_email, subject, html_body, text_body, kategori=None, ref_id=None):
+    """Tambahkan email ke outbox pada sesi saat ini (ikut ter-commit bersama data route)"""
+    ensure_outbox_table()
+    item = EmailOutbox(
+        to_email=to_email,
+        subject=subject,
+        html_body=html_body,
+        text_body=text_body,
+        kategori=kategori,
+        ref_id=ref_id,
+        status='pending',
+        next_attempt_at=datetime.now()
+    )
+    db.session.add(item)
+    return item
+
+
+def enqueue_email_batch(items, kategori=None, ref_id=None):
+    """Simpan banyak email sekaligus di transaksi sendiri (untuk thread tanpa sesi route).
+
+    items: iterable dict berisi to_email, subject, html_body, text_body.
+    """
+    ensure_outbox_table()
+    now = datetime.now()
+    values = [dict(item, kategori=kategori, ref_id=ref_id, status='pending', attempts=0,
+                   next_attempt_at=now, created_at=now) for item in items]
+    if values:
+        with db.engine.begin() as conn:
+            conn.execute(insert(EmailOutbox.__table__), values)
+    return len(values)
+
+
+def _retry_delay(attempts):
+    """Backoff eksponensial: base, 2x base, 4x base, ... dibatasi EMAIL_OUTBOX_MAX_BACKOFF"""
+    base = current_app.config.get('EMAIL_OUTBOX_BACKOFF', 30)
+    return min(base * (2 ** max(attempts - 1, 0)), current_app.config.get('EMAIL_OUTBOX_MAX_BACKOFF', 3600))
+
+
+def _claim_batch(limit):
+    """Ambil email yang jatuh tempo dan tandai 'sending' (klaim atomik per baris)"""
+    table = EmailOutbox.__table__
+    now = datetime.now()
+    stale_lock = now - timedelta(seconds=current_app.config.get('EMAIL_OUTBOX_LOCK_TIMEOUT', 600))
+    due = or_(
+        and_(table.c.status == 'pending',
+             or_(table.c.next_attempt_at.is_(None), table.c.next_attempt_at <= now)),
+        # Worker yang mati di tengah pengiriman meninggalkan baris 'sending'
+        and_(table.c.status == 'sending', table.c.locked_at < stale_lock)
+    )
+
+    claimed = []
+    with db.engine.begin() as conn:
+        candidates = conn.execute(
+            select(table.c.id).where(due).order_by(table.c.id).limit(limit)
+        ).scalars().all()
+        for outbox_id in candidates:
+            result = conn.execute(update(table)
+                                  .where(table.c.id == outbox_id, due)
+                                  .values(status='sending', locked_at=now))
+            if result.rowcount:
+                claimed.append(outbox_id)
+        if not claimed:
+            return []
+        return conn.execute(select(table).where(table.c.id.in_(claimed)).order_by(table.c.id)).all()
+
+
+def _mark_sent(outbox_id):
+    table = EmailOutbox.__table__
+    with db.engine.begin() as conn:
+        conn.execute(update(table).where(table.c.id == outbox_id).values(
+            status='sent', sent_at=datetime.now(), locked_at=None,
+            attempts=table.c.attempts + 1, last_error=None))
+
+
+def _mark_failed(row, error):
+    """Jadwalkan ulang dengan backoff, atau tandai 'failed' jika percobaan sudah habis"""
+    table = EmailOutbox.__table__
+    attempts = (row.attempts or 0) + 1
+    max_attempts = current_app.config.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    values = {'attempts': attempts, 'last_error': str(error)[:1000], 'locked_at': None}
+    if attempts >= max_attempts:
+        values['status'] = 'failed'
+    else:
+        values['status'] = 'pending'
+        values['next_attempt_at'] = datetime.now() + timedelta(seconds=_retry_delay(attempts))
+    with db.engine.begin() as conn:
+        conn.execute(update(table).where(table.c.id == row.id).values(**values))
+
+
+def _release(rows):
+    """Kembalikan email yang belum sempat dicoba ke antrian (tanpa menambah attempts)"""
+    if not rows:
+        return
+    table = EmailOutbox.__table__
+    retry_at = datetime.now() + timedelta(seconds=_retry_delay(1))
+    with db.engine.begin() as conn:
+        conn.execute(update(table).where(table.c.id.in_([row.id for row in rows]))
+                     .values(status='pending', locked_at=None, next_attempt_at=retry_at))
+
+
+class SMTPUnavailable(Exception):
+    """Server SMTP tidak bisa dihubungi / login gagal"""
+
+
+class SMTPSession:
+    """Satu koneksi SMTP yang sudah login, dipakai ulang selama masih hidup"""
+
+    NOOP_AFTER = 30  # detik tanpa aktivitas sebelum koneksi dicek ulang dengan NOOP
+
+    def __init__(self, email_service):
+        self.email_service = email_service
+        self.server = None
+        self.last_used = 0
+
+    def get(self):
+        if self.server is not None:
+            if time.monotonic() - self.last_used < self.NOOP_AFTER:
+                return self.server
+            try:
+                # Cek koneksi lama masih hidup sebelum dipakai ulang
+                if self.server.noop()[0] == 250:
+                    return self.server
+            except smtplib.SMTPException:
+                pass
+            self.close()
+        try:
+            self.server = self.email_service._create_smtp_connection()
+        except Exception as e:
+            raise SMTPUnavailable(str(e)) from e
+        return self.server
+
+    def send(self, to_email, subject, html_body, text_body):
+        server = self.get()
+        self.email_service.send_message(server, to_email, subject, html_body, text_body)
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+            self.server = None
+
+    def close_if_idle(self, idle_timeout):
+        if self.server is not None and time.monotonic() - self.last_used > idle_timeout:
+            self.close()
+
+
+def process_outbox(smtp_session=None, limit=None):
+    """Kirim satu batch email yang jatuh tempo. Mengembalikan (terkirim, gagal)."""
+    from app.utils.email_utils import get_email_service
+
+    ensure_outbox_table()
+    limit = limit or current_app.config.get('EMAIL_OUTBOX_BATCH_SIZE', 20)
+    rows = _claim_batch(limit)
+    if not rows:
+        return 0, 0
+
+    own_session = smtp_session is None
+    if own_session:
+        smtp_session = SMTPSession(get_email_service())
+
+    sent = failed = 0
+    try:
+        for index, row in enumerate(rows):
+            try:
+                smtp_session.send(row.to_email, row.subject, row.html_body, row.text_body)
+                _mark_sent(row.id)
+                sent += 1
+            except (SMTPUnavailable, smtplib.SMTPServerDisconnected, OSError) as e:
+                # Server tidak tersedia: buang sesi, sisa batch dicoba lagi nanti
+                smtp_session.close()
+                _mark_failed(row, e)
+                _release(rows[index + 1:])
+                failed += 1
+                break
+            except Exception as e:
+                _mark_failed(row, e)
+                failed += 1
+    finally:
+        if own_session:
+            smtp_session.close()
+
+    current_app.logger.info(f"Outbox email: {sent} terkirim, {failed} gagal")
+    return sent, failed
+
+
+class OutboxSender(threading.Thread):
+    """Thread daemon per proses yang mengosongkan outbox secara berkala"""
+
+    def __init__(self, app):
+        super().__init__(name='email-outbox', daemon=True)
+        self.app = app
+        self.wake_event = threading.Event()
+
+    def run(self):
+        from app.utils.email_utils import get_email_service
+
+        with self.app.app_context():
+            interval = self.app.config.get('EMAIL_OUTBOX_INTERVAL', 10)
+            idle_timeout = self.app.config.get('EMAIL_OUTBOX_SMTP_IDLE', 60)
+            smtp_session = None
+            while True:
+                try:
+                    if smtp_session is None:
+                        smtp_session = SMTPSession(get_email_service())
+                    sent, failed = process_outbox(smtp_session)
+                    if sent or failed:
+                        # Masih mungkin ada antrian, lanjutkan tanpa menunggu
+                        continue
+                    smtp_session.close_if_idle(idle_timeout)
+                except Exception as e:
+                    self.app.logger.error(f"Outbox email error: {str(e)}")
+                    if smtp_session is not None:
+                        smtp_session.close()
+                    smtp_session = None
+                finally:
+                    db.session.remove()
+                self.wake_event.wait(interval)
+                self.wake_event.clear()
+
+
+def start_outbox_sender(app):
+    """Jalankan thread pengirim untuk proses ini (sekali saja)"""
+    global _sender
+    with _sender_lock:
+        if _sender is None or not _sender.is_alive():
+            _sender = OutboxSender(app)
+            _sender.start()
+    return _sender
+
+
+def notify_outbox():
+    """Bangunkan thread pengirim agar email baru segera diproses"""
+    if not current_app.config.get('EMAIL_OUTBOX_ENABLED', True):
+        return
+    sender = start_outbox_sender(current_app._get_current_object())
+    sender.wake_event.set()
+
+
+def init_email_outbox(app):
+    """Konfigurasi default outbox; thread pengirim dijalankan saat request pertama"""
+    app.config.setdefault('EMAIL_OUTBOX_ENABLED', True)
+    app.config.setdefault('EMAIL_OUTBOX_INTERVAL', 10)
+    app.config.setdefault('EMAIL_OUTBOX_BATCH_SIZE', 20)
+    app.config.setdefault('EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+
+    @app.before_request
+    def _start_outbox_sender():
+        if app.config.get('EMAIL_OUTBOX_ENABLED', True) and (_sender is None or not _sender.is_alive()):
+            start_outbox_sender(app)
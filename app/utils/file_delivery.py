@@ -0,0 +1,119 @@
+"""Pengiriman file: langsung dari Flask, atau dialihkan ke web server depan.
+
+FILE_DELIVERY:
+- 'direct' (default, development): send_file dengan dukungan Range dan
+  request kondisional.
+- 'x-accel': header `X-Accel-Redirect: <FILE_DELIVERY_ACCEL_PREFIX><path
+  relatif folder static>` untuk nginx; worker tidak membaca isi file.
+  Lokasi internal nginx harus menunjuk ke folder static, mis.
+      location /_berkas/ { internal; alias /srv/donasi/app/static/; }
+- 'x-sendfile': header `X-Sendfile` (Apache mod_xsendfile, lighttpd) lewat
+  USE_X_SENDFILE bawaan Flask, berlaku juga untuk file static.
+
+`upload_url('public/...')` menghasilkan URL berisi hash isi file
+(/static-v/<hash>/<path>) yang dikirim dengan Cache-Control immutable satu
+tahun; isi file yang berubah otomatis mendapat URL baru.
+"""
+import hashlib
+import mimetypes
+import os
+
+from flask import abort, current_app, redirect, send_file, url_for
+from werkzeug.security import safe_join
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Batas jumlah path yang hash-nya diingat per proses
+FINGERPRINT_CACHE_SIZE = 2048
+
+# path -> (mtime, size, hash); dihitung ulang hanya jika file berubah
+_fingerprints = {}
+
+
+def file_fingerprint(path):
+    """12 karakter pertama sha256 isi file"""
+    stat = os.stat(path)
+    cached = _fingerprints.get(path)
+    if cached is not None and cached[:2] == (stat.st_mtime, stat.st_size):
+        return cached[2]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    fingerprint = digest.hexdigest()[:12]
+    if len(_fingerprints) >= FINGERPRINT_CACHE_SIZE:
+        _fingerprints.clear()
+    _fingerprints[path] = (stat.st_mtime, stat.st_size, fingerprint)
+    return fingerprint
+
+
+def _accel_uri(app, path):
+    root = os.path.realpath(app.static_folder)
+    path = os.path.realpath(path)
+    if os.path.commonpath([root, path]) != root:
+        return None
+    return app.config['FILE_DELIVERY_ACCEL_PREFIX'] + os.path.relpath(path, root).replace(os.sep, '/')
+
+
+def _set_cache_headers(response, max_age, immutable):
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    elif max_age is not None:
+        response.cache_control.max_age = max_age
+
+
+def deliver_file(path, mimetype=None, as_attachment=False, download_name=None, max_age=None, immutable=False):
+    """Kirim file sesuai FILE_DELIVERY; 404 jika file tidak ada"""
+    app = current_app._get_current_object()
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    if app.config['FILE_DELIVERY'] == 'x-accel':
+        uri = _accel_uri(app, path)
+        if uri is not None:
+            response = app.response_class(mimetype=mimetype or mimetypes.guess_type(path)[0]
+                                          or 'application/octet-stream')
+            response.headers['X-Accel-Redirect'] = uri
+            if as_attachment:
+                response.headers.set('Content-Disposition', 'attachment',
+                                     filename=download_name or os.path.basename(path))
+            _set_cache_headers(response, max_age, immutable)
+            return response
+
+    # direct / x-sendfile (USE_X_SENDFILE) / file di luar folder static
+    response = send_file(path, mimetype=mimetype, as_attachment=as_attachment, download_name=download_name,
+                         conditional=True, max_age=IMMUTABLE_MAX_AGE if immutable else max_age)
+    _set_cache_headers(response, max_age, immutable)
+    return response
+
+
+def upload_url(filename, **kwargs):
+    """URL berversi hash isi untuk file di folder static (foto kegiatan, sertifikat, ...)"""
+    path = safe_join(current_app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        return url_for('static', filename=filename, **kwargs)
+    return url_for('static_versioned', fingerprint=file_fingerprint(path), filename=filename, **kwargs)
+
+
+def static_versioned(fingerprint, filename):
+    path = safe_join(current_app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    current = file_fingerprint(path)
+    if fingerprint != current:
+        # File sudah diganti: arahkan ke versi terbaru, jangan cache isi baru di URL lama
+        return redirect(url_for('static_versioned', fingerprint=current, filename=filename))
+    return deliver_file(path, immutable=True)
+
+
+def init_file_delivery(app):
+    app.config.setdefault('FILE_DELIVERY', 'direct')
+    app.config.setdefault('FILE_DELIVERY_ACCEL_PREFIX', '/_berkas/')
+    if app.config['FILE_DELIVERY'] not in ('direct', 'x-accel', 'x-sendfile'):
+        raise ValueError(f"FILE_DELIVERY tidak dikenal: {app.config['FILE_DELIVERY']}")
+    if app.config['FILE_DELIVERY'] == 'x-sendfile':
+        app.config['USE_X_SENDFILE'] = True
+
+    app.add_url_rule('/static-v/<fingerprint>/<path:filename>', 'static_versioned', static_versioned)
+    app.add_template_global(upload_url)
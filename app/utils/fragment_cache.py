@@ -0,0 +1,127 @@
+"""Cache fragmen template Jinja: `{% cache 'nama', bagian_kunci..., ttl=..., tags=... %}`.
+
+    {% cache 'navbar', request.endpoint, ttl=600 %} ... {% endcache %}
+    {% cache 'news_card', news.id, tags=('kegiatan_perpus', 'perpus_desa'), per_user=False %} ... {% endcache %}
+
+Argumen posisi pertama adalah nama fragmen, sisanya bagian kunci. Secara
+default kunci juga memuat data session semua role (user/admin/superadmin),
+sehingga pengunjung anonim berbagi satu salinan dan setiap pengguna login
+punya salinannya sendiri; `per_user=False` untuk fragmen yang tidak bergantung
+pada login. Versi template ikut dalam kunci, jadi deploy template baru tidak
+menyajikan HTML lama.
+
+Invalidasi: `fragment_cache.invalidate('navbar')` menghapus semua salinan satu
+fragmen; nama tabel di `tags` dihapus otomatis oleh hook commit query cache.
+Backend sama dengan query cache (FRAGMENT_CACHE_BACKEND sqlite/memory/none).
+"""
+import hashlib
+import os
+import sqlite3
+
+from flask import session
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from app.utils.conditional import template_version
+from app.utils.query_cache import MemoryBackend, SQLiteBackend, query_cache
+
+_ROLE_SESSION_KEYS = ('user_session', 'admin_session', 'superadmin_session')
+
+
+class FragmentCache:
+    def __init__(self):
+        self.backend = None
+        self.default_ttl = 600
+        self.version = 0
+
+    def init_app(self, app):
+        app.config.setdefault('FRAGMENT_CACHE_BACKEND', 'sqlite')
+        app.config.setdefault('FRAGMENT_CACHE_DEFAULT_TTL', 600)
+        app.config.setdefault('FRAGMENT_CACHE_MAX_ENTRIES', 2000)
+        app.config.setdefault('FRAGMENT_CACHE_PATH', os.path.join(app.instance_path, 'fragment_cache.db'))
+
+        self.default_ttl = app.config['FRAGMENT_CACHE_DEFAULT_TTL']
+        self.version = template_version(app)
+        backend = app.config['FRAGMENT_CACHE_BACKEND']
+        max_entries = app.config['FRAGMENT_CACHE_MAX_ENTRIES']
+        if backend == 'memory':
+            self.backend = MemoryBackend(max_entries)
+        elif backend == 'sqlite':
+            os.makedirs(os.path.dirname(app.config['FRAGMENT_CACHE_PATH']), exist_ok=True)
+            self.backend = SQLiteBackend(app.config['FRAGMENT_CACHE_PATH'], max_entries)
+        else:
+            self.backend = None
+
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        query_cache.add_invalidation_listener(self.invalidate)
+
+    def invalidate(self, *names):
+        """Hapus fragmen berdasarkan nama fragmen atau nama tabel di tags"""
+        if self.backend is not None and names:
+            self.backend.invalidate_tags(names)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def _key(self, name, parts, per_user):
+        source = [self.version, parts]
+        if per_user:
+            source.append([sorted(session[key].items()) if key in session else None
+                           for key in _ROLE_SESSION_KEYS])
+        # Namespace database sama dengan query cache: file cache di instance bisa dipakai app lain
+        return f'{query_cache.namespace}{name}:{hashlib.sha1(repr(source).encode("utf-8")).hexdigest()}'
+
+    def render(self, name, parts, caller, ttl=None, tags=(), per_user=True):
+        if self.backend is None:
+            return caller()
+        key = self._key(name, parts, per_user)
+        try:
+            entry = self.backend.get(key)
+        except sqlite3.Error:
+            entry = None
+        if entry is not None:
+            return Markup(entry[2])
+
+        html = caller()
+        try:
+            self.backend.set(key, str(html), ttl or self.default_ttl, (name,) + tuple(tags))
+        except sqlite3.Error:
+            # Cache penuh / terkunci tidak boleh menggagalkan render
+            pass
+        return html
+
+
+fragment_cache = FragmentCache()
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = []
+        kwargs = []
+        while parser.stream.current.type != 'block_end':
+            if args or kwargs:
+                parser.stream.expect('comma')
+            if parser.stream.current.type == 'name' and parser.stream.look().type == 'assign':
+                key = next(parser.stream).value
+                next(parser.stream)
+                kwargs.append(nodes.Keyword(key, parser.parse_expression()))
+            else:
+                args.append(parser.parse_expression())
+        if not args:
+            parser.fail('cache membutuhkan nama fragmen', lineno)
+
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        call = self.call_method('_render', [args[0], nodes.List(args[1:])], kwargs)
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, name, parts, caller, **options):
+        return fragment_cache.render(name, parts, caller, **options)
+
+
+def init_fragment_cache(app):
+    fragment_cache.init_app(app)
@@ -0,0 +1,204 @@
+"""Endpoint /metrics format Prometheus: latensi route, status, waktu DB, PDF, antrian email, upload.
+
+Metrik dicatat dengan prometheus_client. Di gunicorn set PROMETHEUS_MULTIPROC_DIR
+ke folder kosong yang bisa ditulis semua worker: setiap worker menulis counter
+ke file mmap di folder itu dan /metrics menjumlahkan semuanya, jadi hasil scrape
+sama worker mana pun yang menjawab. Folder dikosongkan sebelum gunicorn start
+dan worker yang mati dibersihkan lewat hook child_exit (lihat README).
+
+/metrics hanya dijawab untuk IP di METRICS_ALLOWED_IPS (default localhost) atau
+request dengan header `Authorization: Bearer <METRICS_TOKEN>`. Di belakang
+reverse proxy semua request datang dari 127.0.0.1, jadi allowlist IP gagal
+tertutup: request dengan header forwarding ditolak kecuali TRUSTED_PROXIES
+diset (ProxyFix memulihkan IP klien dari X-Forwarded-For).
+"""
+import hmac
+import os
+import time
+from contextlib import contextmanager
+
+from flask import Response, abort, g, request
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:  # pragma: no cover - dependensi opsional
+    prometheus_client = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PDF_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30)
+
+_metrics = None
+
+
+def _create_metrics():
+    return {
+        'latency': Histogram('http_request_duration_seconds', 'Latensi request per endpoint',
+                             ['blueprint', 'endpoint', 'method'], buckets=LATENCY_BUCKETS),
+        'requests': Counter('http_requests_total', 'Jumlah request per endpoint dan status',
+                            ['blueprint', 'endpoint', 'method', 'status']),
+        'db_time': Histogram('http_request_db_seconds', 'Waktu query database per request',
+                             ['blueprint', 'endpoint'], buckets=LATENCY_BUCKETS),
+        'db_queries': Counter('http_request_db_queries_total', 'Jumlah query database',
+                              ['blueprint', 'endpoint']),
+        'pdf': Histogram('pdf_render_duration_seconds', 'Durasi render PDF (wkhtmltopdf)',
+                         ['dokumen', 'status'], buckets=PDF_BUCKETS),
+        'upload': Counter('upload_bytes_total', 'Ukuran body upload multipart',
+                          ['blueprint', 'endpoint']),
+        'in_progress': Gauge('http_requests_in_progress', 'Request yang sedang diproses',
+                             multiprocess_mode='livesum')
+    }
+
+
+class EmailOutboxCollector:
+    """Kedalaman antrian email dibaca dari tabel outbox saat scrape (sudah dibagi semua worker)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def collect(self):
+        from sqlalchemy import func, select
+
+        from app import db
+        from app.models import EmailOutbox
+        from app.utils.email_outbox import ensure_outbox_table
+
+        gauge = GaugeMetricFamily('email_outbox_queue', 'Email di outbox per status', labels=['status'])
+        try:
+            with self.app.app_context():
+                # Tabel outbox dibuat saat email pertama diantrikan; bisa belum ada
+                ensure_outbox_table()
+                try:
+                    rows = db.session.execute(
+                        select(EmailOutbox.status, func.count(EmailOutbox.id)).group_by(EmailOutbox.status)).all()
+                finally:
+                    db.session.remove()
+        except Exception as e:
+            self.app.logger.warning(f"Gagal membaca antrian email untuk metrics: {str(e)}")
+            rows = []
+        counts = dict.fromkeys(('pending', 'sending', 'failed'), 0)
+        counts.update((status, count) for status, count in rows if status != 'sent')
+        for status, count in counts.items():
+            gauge.add_metric([status], count)
+        yield gauge
+
+
+@contextmanager
+def observe_pdf_render(dokumen):
+    """Catat durasi render PDF: `with observe_pdf_render('bukti_donasi'): pdfkit.from_string(...)`"""
+    if _metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    status = 'gagal'
+    try:
+        yield
+        status = 'ok'
+    finally:
+        _metrics['pdf'].labels(dokumen, status).observe(time.perf_counter() - started)
+
+
+def _labels():
+    return request.blueprint or '', request.endpoint or 'tidak_ditemukan'
+
+
+def _record_request(response_status):
+    started = g.pop('_metrics_start', None)
+    if started is None:
+        return
+    _metrics['in_progress'].dec()
+    blueprint, endpoint = _labels()
+    if endpoint == 'static':
+        return
+    _metrics['latency'].labels(blueprint, endpoint, request.method).observe(time.perf_counter() - started)
+    _metrics['requests'].labels(blueprint, endpoint, request.method, str(response_status)).inc()
+
+    from app.utils.sql_instrumentation import current_request_sql_stats
+    sql_stats = current_request_sql_stats()
+    if sql_stats is not None:
+        _metrics['db_time'].labels(blueprint, endpoint).observe(sql_stats['ms'] / 1000)
+        _metrics['db_queries'].labels(blueprint, endpoint).inc(sql_stats['count'])
+
+    if request.mimetype == 'multipart/form-data' and request.content_length:
+        _metrics['upload'].labels(blueprint, endpoint).inc(request.content_length)
+
+
+# Header yang menandakan request diteruskan reverse proxy
+_FORWARDED_HEADERS = ('X-Forwarded-For', 'X-Real-IP', 'Forwarded')
+
+
+def _scrape_allowed(app):
+    token = app.config['METRICS_TOKEN']
+    if token:
+        auth = request.headers.get('Authorization', '')
+        if auth.startswith('Bearer ') and hmac.compare_digest(auth[7:].encode(), token.encode()):
+            return True
+    if app.config.get('TRUSTED_PROXIES'):
+        # ProxyFix sudah mengganti remote_addr dengan IP klien dari X-Forwarded-For;
+        # tanpa header itu remote_addr hanyalah alamat proxy (127.0.0.1), jadi tolak
+        if 'X-Forwarded-For' not in request.headers:
+            return False
+    elif any(header in request.headers for header in _FORWARDED_HEADERS):
+        # Di belakang proxy tanpa TRUSTED_PROXIES semua request terlihat dari 127.0.0.1
+        return False
+    return request.remote_addr in app.config['METRICS_ALLOWED_IPS']
+
+
+def init_metrics(app):
+    global _metrics
+    app.config.setdefault('METRICS_ENABLED', True)
+    app.config.setdefault('METRICS_TOKEN', None)
+    app.config.setdefault('METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+    if not app.config['METRICS_ENABLED']:
+        return
+    if prometheus_client is None:
+        app.logger.warning("prometheus_client belum terpasang; endpoint /metrics dinonaktifkan")
+        return
+
+    if _metrics is None:
+        # Metrik terdaftar sekali per proses di REGISTRY global prometheus_client
+        _metrics = _create_metrics()
+
+    multiproc_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir:
+        from prometheus_client import multiprocess
+
+        def build_registry():
+            registry = prometheus_client.CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry, path=multiproc_dir)
+            return registry
+    else:
+        def build_registry():
+            return prometheus_client.REGISTRY
+
+    outbox_collector = EmailOutboxCollector(app)
+
+    @app.before_request
+    def _start_metrics():
+        if request.endpoint != 'metrics':
+            g._metrics_start = time.perf_counter()
+            _metrics['in_progress'].inc()
+
+    @app.after_request
+    def _record_metrics(response):
+        _record_request(response.status_code)
+        return response
+
+    @app.teardown_request
+    def _record_failed_metrics(exc=None):
+        # after_request tidak dipanggil jika view melempar exception yang tidak tertangani
+        if exc is not None:
+            _record_request(500)
+
+    def metrics():
+        if not _scrape_allowed(app):
+            abort(403)
+        registry = build_registry()
+        output = prometheus_client.generate_latest(registry)
+        # generate_latest() cukup butuh objek dengan collect()
+        output += prometheus_client.generate_latest(outbox_collector)
+        return Response(output, mimetype=prometheus_client.CONTENT_TYPE_LATEST)
+
+    app.add_url_rule('/metrics', 'metrics', metrics)
+
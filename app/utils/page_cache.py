@@ -0,0 +1,197 @@
+"""Cache halaman penuh untuk pengunjung publik yang belum login.
+
+View publik diberi decorator `@page_cache.cached(<tabel>...)`. Respons 200
+untuk pengunjung anonim disimpan per path + query string (diurutkan) di
+backend yang sama dengan query cache (default file SQLite di instance,
+dipakai bersama semua worker). Request berikutnya dilayani langsung dari
+cache tanpa query ke database.
+
+Invalidasi mengikuti hook commit query cache: begitu transaksi yang
+menyentuh salah satu tabel tag di-commit, semua halaman bertag itu dihapus.
+Halaman statis tanpa tag hanya kedaluwarsa lewat TTL.
+
+Stale-while-revalidate (PAGE_CACHE_STALE > 0): setelah PAGE_CACHE_TTL lewat,
+entri masih disajikan selama PAGE_CACHE_STALE detik berikutnya sementara
+halaman dirender ulang di thread background. Entri yang dihapus oleh
+invalidasi tidak pernah disajikan basi.
+
+Pasang decorator ini di atas `@conditional(...)`: HIT langsung dijawab dari
+cache (termasuk 304 lewat ETag yang tersimpan) tanpa query validator.
+
+Cache dilewati jika ada role yang login, ada flash message yang menunggu,
+method selain GET/HEAD, atau respons mengubah session / memasang cookie.
+Header `X-Page-Cache: HIT|MISS|STALE` menunjukkan asal respons.
+"""
+import functools
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlencode
+
+from flask import current_app, make_response, request, session
+
+from app.utils.query_cache import MemoryBackend, SQLiteBackend, query_cache
+from app.utils.session_manager import SessionManager
+
+CACHE_HEADER = 'X-Page-Cache'
+
+# Header respons yang tidak ikut disimpan (dihitung ulang / khusus pengunjung)
+_SKIP_HEADERS = {'content-length', 'set-cookie', 'vary'}
+
+
+class PageCache:
+    # Lama entri basi "dipesan" oleh worker yang sedang merender ulang
+    REVALIDATE_GRACE = 30
+
+    def __init__(self):
+        self.backend = None
+        self.ttl = 300
+        self.stale = 0
+        self._app = None
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('PAGE_CACHE_ENABLED', True)
+        app.config.setdefault('PAGE_CACHE_BACKEND', 'sqlite')
+        app.config.setdefault('PAGE_CACHE_TTL', 300)
+        app.config.setdefault('PAGE_CACHE_STALE', 600)
+        app.config.setdefault('PAGE_CACHE_MAX_ENTRIES', 1000)
+        app.config.setdefault('PAGE_CACHE_PATH', os.path.join(app.instance_path, 'page_cache.db'))
+
+        self._app = app
+        self.ttl = app.config['PAGE_CACHE_TTL']
+        self.stale = app.config['PAGE_CACHE_STALE']
+        backend = app.config['PAGE_CACHE_BACKEND'] if app.config['PAGE_CACHE_ENABLED'] else 'none'
+        max_entries = app.config['PAGE_CACHE_MAX_ENTRIES']
+        if backend == 'memory':
+            self.backend = MemoryBackend(max_entries)
+        elif backend == 'sqlite':
+            os.makedirs(os.path.dirname(app.config['PAGE_CACHE_PATH']), exist_ok=True)
+            self.backend = SQLiteBackend(app.config['PAGE_CACHE_PATH'], max_entries)
+        else:
+            self.backend = None
+
+        query_cache.add_invalidation_listener(self.invalidate)
+
+    def invalidate(self, *tags):
+        if self.backend is not None and tags:
+            self.backend.invalidate_tags(tags)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    @staticmethod
+    def _cacheable_request():
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        # Navbar / flash message berbeda untuk pengunjung yang login
+        return not (SessionManager.is_any_user_logged_in() or '_flashes' in session)
+
+    @staticmethod
+    def _request_key():
+        # Host ikut kunci: halaman memuat URL absolut (request.url untuk tombol share)
+        query = urlencode(sorted(request.args.items(multi=True)))
+        # Diawali namespace database query cache: file cache di instance bisa dipakai app lain
+        key = query_cache.namespace + request.url_root.rstrip('/') + request.path
+        return f'{key}?{query}' if query else key
+
+    def _store(self, key, response, tags):
+        """Simpan respons anonim yang aman dibagi ke semua pengunjung"""
+        if response.status_code != 200 or response.direct_passthrough or session.modified:
+            return
+        if 'Set-Cookie' in response.headers:
+            return
+        entry = {
+            'body': response.get_data(),
+            'status': response.status_code,
+            'headers': [(k, v) for k, v in response.headers.items() if k.lower() not in _SKIP_HEADERS],
+            'fresh_until': time.time() + self.ttl
+        }
+        try:
+            self.backend.set(key, entry, self.ttl + self.stale, tags)
+        except sqlite3.Error:
+            # Cache penuh / terkunci tidak boleh menggagalkan request
+            pass
+
+    def _respond(self, entry, state):
+        response = current_app.response_class(entry['body'], status=entry['status'], headers=entry['headers'])
+        response.headers[CACHE_HEADER] = state
+        # ETag / Last-Modified dari @conditional ikut tersimpan: jawab 304 tanpa
+        # menjalankan validator (entri sudah dihapus saat tabel bertag berubah)
+        if 'ETag' in response.headers or 'Last-Modified' in response.headers:
+            response.make_conditional(request.environ)
+        return response
+
+    def _revalidate(self, key, entry, func, kwargs, tags):
+        """Pesan entri basi untuk worker ini, lalu render ulang di background"""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        reserved = dict(entry, fresh_until=time.time() + self.REVALIDATE_GRACE)
+        try:
+            self.backend.set(key, reserved, self.REVALIDATE_GRACE + self.stale, tags)
+        except sqlite3.Error:
+            pass
+        # Render ulang memakai scheme/host request asli (setelah ProxyFix), bukan
+        # http://localhost bawaan test_request_context, karena halaman memuat request.url
+        request_args = {
+            'path': request.path,
+            'base_url': request.url_root,
+            'query_string': request.query_string,
+            'headers': {'User-Agent': request.headers.get('User-Agent', '')},
+            'environ_base': {'REMOTE_ADDR': request.remote_addr or ''}
+        }
+        thread = threading.Thread(target=self._refresh, args=(key, request_args, func, kwargs, tags),
+                                  name='page-cache-refresh', daemon=True)
+        thread.start()
+
+    def _refresh(self, key, request_args, func, kwargs, tags):
+        app = self._app
+        path = request_args['path']
+        try:
+            with app.test_request_context(**request_args):
+                response = make_response(func(**kwargs))
+                self._store(key, response, tags)
+        except Exception as e:
+            app.logger.error(f"Gagal merender ulang cache halaman {path}: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def cached(self, *tags):
+        """Decorator view: cache respons anonim, dihapus saat tabel bertag di-commit"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(**kwargs):
+                if self.backend is None or not self._cacheable_request():
+                    return func(**kwargs)
+
+                key = self._request_key()
+                try:
+                    cached = self.backend.get(key)
+                except sqlite3.Error:
+                    cached = None
+                if cached is not None:
+                    entry = cached[2]
+                    if entry['fresh_until'] >= time.time():
+                        return self._respond(entry, 'HIT')
+                    self._revalidate(key, entry, func, kwargs, tags)
+                    return self._respond(entry, 'STALE')
+
+                response = make_response(func(**kwargs))
+                self._store(key, response, tags)
+                response.headers[CACHE_HEADER] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+
+page_cache = PageCache()
+
+
+def init_page_cache(app):
+    page_cache.init_app(app)
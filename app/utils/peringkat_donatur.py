@@ -0,0 +1,149 @@
+"""Tabel peringkat donatur (PeringkatDonatur) untuk halaman Daftar Donatur.
+
+Agregat per donatur (subjek unik & total buku dari donasi confirmed) disimpan
+di tabel sendiri dan dihitung ulang hanya untuk user yang donasinya berubah
+setelah commit, sehingga daftar donatur cukup membaca satu tabel ber-index.
+Jika tambalan gagal, penghitung CacheVersion 'peringkat_donatur_basi' dinaikkan
+dan tabel dihitung ulang penuh pada pemakaian berikutnya.
+"""
+from flask import current_app
+from sqlalchemy import delete, event, func, insert, inspect, select, update
+
+from app import db
+from app.models import CacheVersion, Donasi, DetailDonasi, User, PeringkatDonatur
+from app.utils.cache_version import bump_version, ensure_cache_version_table, get_version
+
+PERINGKAT_COLUMNS = ['user_id', 'jumlah_subjek', 'total_buku']
+
+_PENDING_KEY = 'peringkat_donatur_users'
+# Jumlah tambalan gagal sejak rebuild penuh terakhir (0 = tabel benar)
+STALE_VERSION = 'peringkat_donatur_basi'
+_tables_ready = False
+
+
+def _peringkat_select(user_ids=None):
+    query = select(
+        Donasi.user_id,
+        func.count(func.distinct(DetailDonasi.subjek_id)),
+        func.coalesce(func.sum(DetailDonasi.jumlah), 0)
+    ).select_from(DetailDonasi)\
+     .join(Donasi, Donasi.id == DetailDonasi.donasi_id)\
+     .where(Donasi.status == 'confirmed')
+    if user_ids is not None:
+        query = query.where(Donasi.user_id.in_(user_ids))
+    return query.group_by(Donasi.user_id)
+
+
+def ensure_peringkat_tables():
+    """Buat tabel peringkat (dan isi awal jika masih kosong), lalu perbaiki jika
+    ada tambalan yang gagal. Aman dipanggil berulang."""
+    _create_tables()
+    repair_peringkat_donatur()
+
+
+def _create_tables():
+    global _tables_ready
+    if _tables_ready:
+        return
+    PeringkatDonatur.__table__.create(db.engine, checkfirst=True)
+    for index in Donasi.__table__.indexes:
+        if 'user_id' in index.columns:
+            index.create(db.engine, checkfirst=True)
+    _tables_ready = True
+
+    with db.engine.connect() as conn:
+        is_empty = conn.execute(select(PeringkatDonatur.user_id).limit(1)).first() is None
+    if is_empty:
+        refresh_peringkat_donatur()
+
+
+def refresh_peringkat_donatur():
+    """Hitung ulang seluruh tabel peringkat dalam satu transaksi"""
+    _create_tables()
+    ensure_cache_version_table()
+    table = PeringkatDonatur.__table__
+    versions = CacheVersion.__table__
+    with db.engine.begin() as conn:
+        stale = conn.execute(select(versions.c.versi).where(versions.c.nama == STALE_VERSION)).scalar()
+        conn.execute(delete(table))
+        conn.execute(insert(table).from_select(PERINGKAT_COLUMNS, _peringkat_select()))
+        if stale:
+            # Hanya kegagalan yang terjadi sebelum rebuild ini yang dianggap beres
+            conn.execute(update(versions).where(versions.c.nama == STALE_VERSION, versions.c.versi == stale)
+                         .values(versi=0))
+    current_app.logger.info("Peringkat donatur dibangun ulang")
+
+
+def repair_peringkat_donatur():
+    """Rebuild penuh jika ada tambalan setelah commit yang gagal; True jika dibangun ulang"""
+    if not get_version(STALE_VERSION):
+        return False
+    refresh_peringkat_donatur()
+    return True
+
+
+def patch_peringkat_donatur(user_ids):
+    """Hitung ulang baris peringkat untuk user tertentu saja"""
+    _create_tables()
+    user_ids = sorted(user_ids)
+    table = PeringkatDonatur.__table__
+    with db.engine.begin() as conn:
+        conn.execute(delete(table).where(table.c.user_id.in_(user_ids)))
+        conn.execute(insert(table).from_select(PERINGKAT_COLUMNS, _peringkat_select(user_ids)))
+
+
+def _user_ids_of(obj):
+    """user_id saat ini beserta nilai lama (jika Donasi dipindah ke user lain)"""
+    history = inspect(obj).attrs.user_id.history
+    return {value for value in [obj.user_id, *history.deleted] if value is not None}
+
+
+def _attr_changed(obj, *names):
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in names)
+
+
+def _collect_users(session, flush_context, instances):
+    """before_flush: catat donatur yang agregatnya perlu dihitung ulang"""
+    user_ids = session.info.setdefault(_PENDING_KEY, set())
+    with session.no_autoflush:
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if obj in session.dirty and not (
+                    isinstance(obj, Donasi) and _attr_changed(obj, 'status', 'user_id') or
+                    isinstance(obj, DetailDonasi) and _attr_changed(obj, 'jumlah', 'subjek_id', 'donasi_id')):
+                continue
+            if isinstance(obj, Donasi):
+                user_ids.update(_user_ids_of(obj))
+            elif isinstance(obj, DetailDonasi):
+                parent = obj.donasi or session.get(Donasi, obj.donasi_id)
+                if parent is not None and parent.user_id is not None:
+                    user_ids.add(parent.user_id)
+            elif isinstance(obj, User) and obj in session.deleted:
+                user_ids.add(obj.id)
+
+
+def _apply_after_commit(session):
+    user_ids = session.info.pop(_PENDING_KEY, None)
+    if not user_ids:
+        return
+    try:
+        if not repair_peringkat_donatur():
+            patch_peringkat_donatur(user_ids)
+    except Exception as e:
+        current_app.logger.error(f"Gagal memperbarui peringkat donatur: {str(e)}")
+        try:
+            bump_version(STALE_VERSION)
+        except Exception:
+            pass
+
+
+def _discard_pending(session, previous_transaction=None):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def init_peringkat_donatur(app):
+    """Pasang hook sesi SQLAlchemy untuk menjaga tabel peringkat setelah commit"""
+    if not event.contains(db.session, 'before_flush', _collect_users):
+        event.listen(db.session, 'before_flush', _collect_users)
+        event.listen(db.session, 'after_commit', _apply_after_commit)
+        event.listen(db.session, 'after_soft_rollback', _discard_pending)
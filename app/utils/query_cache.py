@@ -0,0 +1,274 @@
+"""Cache hasil query dengan tag per tabel, diinvalidasi otomatis setelah commit.
+
+Setiap entri disimpan dengan TTL dan daftar tag (nama tabel sumber datanya).
+Hook sesi SQLAlchemy mencatat tabel yang disentuh flush / bulk update-delete,
+lalu setelah commit semua entri dengan tag tabel tersebut dihapus.
+
+Backend (QUERY_CACHE_BACKEND):
+- 'sqlite' (default): file SQLite di folder instance, dipakai bersama semua
+  worker gunicorn sehingga invalidasi di satu worker berlaku untuk semua.
+- 'memory': dict LRU per proses, untuk development / satu worker.
+- 'none': cache dimatikan.
+
+Kunci diawali hash DATABASE_URL aktif, sehingga app lain yang memakai folder
+instance yang sama dengan database berbeda (salinan DB, benchmark, CLI) tidak
+saling membaca entri.
+
+Nilai yang di-cache harus bisa di-pickle (list/dict/tuple), jangan objek ORM.
+"""
+import functools
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import event
+
+from app import db
+
+_PENDING_KEY = 'query_cache_tables'
+
+
+class MemoryBackend:
+    """LRU + TTL per proses"""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, tags, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, ttl, tags):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, frozenset(tags), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_tags(self, tags):
+        tags = set(tags)
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[1] & tags]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteBackend:
+    """LRU + TTL di file SQLite terpisah, dipakai bersama antar proses"""
+
+    # last_access hanya ditulis ulang jika lebih tua dari ini (hindari write di setiap hit)
+    TOUCH_INTERVAL = 30
+
+    def __init__(self, path, max_entries=512):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._sets = 0
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS cache_entry ('
+                         'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                         'expires_at REAL NOT NULL, last_access REAL NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS cache_tag ('
+                         'tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key))')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_entry_last_access ON cache_entry (last_access)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute('SELECT value, expires_at, last_access FROM cache_entry WHERE key = ?',
+                           (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if row[1] < now:
+            return None
+        if now - row[2] > self.TOUCH_INTERVAL:
+            conn.execute('UPDATE cache_entry SET last_access = ? WHERE key = ?', (now, key))
+        return row[1], None, pickle.loads(row[0])
+
+    def set(self, key, value, ttl, tags):
+        conn = self._connect()
+        now = time.time()
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('INSERT OR REPLACE INTO cache_entry (key, value, expires_at, last_access) '
+                         'VALUES (?, ?, ?, ?)', (key, blob, now + ttl, now))
+            conn.execute('DELETE FROM cache_tag WHERE key = ?', (key,))
+            conn.executemany('INSERT OR IGNORE INTO cache_tag (tag, key) VALUES (?, ?)',
+                             [(tag, key) for tag in tags])
+        self._sets += 1
+        if self._sets % 50 == 0:
+            self._evict(conn)
+
+    def _evict(self, conn):
+        """Buang entri kedaluwarsa dan yang paling lama tidak dipakai di atas max_entries"""
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM cache_entry WHERE expires_at < ?', (time.time(),))
+            conn.execute('DELETE FROM cache_entry WHERE key IN ('
+                         'SELECT key FROM cache_entry ORDER BY last_access DESC LIMIT -1 OFFSET ?)',
+                         (self.max_entries,))
+            conn.execute('DELETE FROM cache_tag WHERE key NOT IN (SELECT key FROM cache_entry)')
+
+    def invalidate_tags(self, tags):
+        tags = list(tags)
+        if not tags:
+            return
+        placeholders = ', '.join('?' for _ in tags)
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(f'DELETE FROM cache_entry WHERE key IN '
+                         f'(SELECT key FROM cache_tag WHERE tag IN ({placeholders}))', tags)
+            conn.execute(f'DELETE FROM cache_tag WHERE tag IN ({placeholders})', tags)
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM cache_entry')
+            conn.execute('DELETE FROM cache_tag')
+
+
+class QueryCache:
+    def __init__(self):
+        self.backend = None
+        self.default_ttl = 300
+        self.namespace = ''
+        self.invalidation_listeners = []
+
+    def init_app(self, app):
+        app.config.setdefault('QUERY_CACHE_BACKEND', 'sqlite')
+        app.config.setdefault('QUERY_CACHE_DEFAULT_TTL', 300)
+        app.config.setdefault('QUERY_CACHE_MAX_ENTRIES', 512)
+        app.config.setdefault('QUERY_CACHE_PATH', os.path.join(app.instance_path, 'query_cache.db'))
+
+        self.default_ttl = app.config['QUERY_CACHE_DEFAULT_TTL']
+        database_uri = str(app.config.get('SQLALCHEMY_DATABASE_URI', ''))
+        self.namespace = hashlib.sha1(database_uri.encode('utf-8')).hexdigest()[:12] + ':'
+        backend = app.config['QUERY_CACHE_BACKEND']
+        max_entries = app.config['QUERY_CACHE_MAX_ENTRIES']
+        if backend == 'memory':
+            self.backend = MemoryBackend(max_entries)
+        elif backend == 'sqlite':
+            os.makedirs(os.path.dirname(app.config['QUERY_CACHE_PATH']), exist_ok=True)
+            self.backend = SQLiteBackend(app.config['QUERY_CACHE_PATH'], max_entries)
+        else:
+            self.backend = None
+
+        if not event.contains(db.session, 'before_flush', _collect_tables):
+            event.listen(db.session, 'before_flush', _collect_tables)
+            event.listen(db.session, 'do_orm_execute', _collect_bulk_tables)
+            event.listen(db.session, 'after_commit', _invalidate_after_commit)
+            event.listen(db.session, 'after_soft_rollback', _discard_pending)
+
+    def get_or_set(self, key, build, tags, ttl=None):
+        """Ambil nilai dari cache, atau jalankan build() dan simpan dengan tag tabel"""
+        if self.backend is None:
+            return build()
+        key = self.namespace + key
+        try:
+            entry = self.backend.get(key)
+        except sqlite3.Error:
+            entry = None
+        if entry is not None:
+            return entry[2]
+
+        value = build()
+        try:
+            self.backend.set(key, value, ttl or self.default_ttl, tags)
+        except sqlite3.Error:
+            # Cache penuh / terkunci tidak boleh menggagalkan request
+            pass
+        return value
+
+    def add_invalidation_listener(self, listener):
+        """listener(*tables) dipanggil setelah commit bersama invalidasi query cache (mis. page cache)"""
+        if listener not in self.invalidation_listeners:
+            self.invalidation_listeners.append(listener)
+
+    def invalidate(self, *tags):
+        if self.backend is not None and tags:
+            self.backend.invalidate_tags(tags)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def cached(self, *tags, ttl=None):
+        """Decorator: cache hasil fungsi per argumen, ditandai dengan nama tabel sumber"""
+        def decorator(func):
+            prefix = f'{func.__module__}.{func.__qualname__}'
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                key = prefix + repr((args, sorted(kwargs.items())))
+                return self.get_or_set(key, lambda: func(*args, **kwargs), tags, ttl)
+
+            wrapper.invalidate = lambda: self.invalidate(*tags)
+            return wrapper
+        return decorator
+
+
+query_cache = QueryCache()
+
+
+def _collect_tables(session, flush_context, instances):
+    """before_flush: catat tabel yang berubah di transaksi ini"""
+    tables = session.info.setdefault(_PENDING_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None:
+            tables.add(table.name)
+
+
+def _collect_bulk_tables(orm_execute_state):
+    """Query.update()/delete() tidak lewat flush, catat tabelnya di sini"""
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            orm_execute_state.session.info.setdefault(_PENDING_KEY, set()).add(table.name)
+
+
+def _invalidate_after_commit(session):
+    tables = session.info.pop(_PENDING_KEY, None)
+    if tables:
+        for invalidate in [query_cache.invalidate] + query_cache.invalidation_listeners:
+            try:
+                invalidate(*tables)
+            except sqlite3.Error as e:
+                current_app.logger.error(f"Gagal menginvalidasi cache {sorted(tables)}: {str(e)}")
+
+
+def _discard_pending(session, previous_transaction=None):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def init_query_cache(app):
+    query_cache.init_app(app)
@@ -0,0 +1,33 @@
+"""Data referensi yang jarang berubah (subjek buku, daftar perpustakaan, kecamatan).
+
+Hasilnya di-cache lewat query_cache dengan tag nama tabel, sehingga otomatis
+dibuang setelah ada commit yang mengubah tabel tersebut. Nilai berupa dict
+biasa (template tetap bisa memakai subjek.id / perpus.nama).
+"""
+from app import db
+from app.models import SubjekBuku, PerpusDesa
+from app.utils.query_cache import query_cache
+
+
+@query_cache.cached('subjek_buku')
+def get_subjek_list(order_by='nama'):
+    """Semua subjek buku sebagai [{'id', 'nama'}], urut nama (atau id)"""
+    column = SubjekBuku.id if order_by == 'id' else SubjekBuku.nama
+    rows = db.session.query(SubjekBuku.id, SubjekBuku.nama).order_by(column.asc()).all()
+    return [{'id': row.id, 'nama': row.nama} for row in rows]
+
+
+@query_cache.cached('perpus_desa')
+def get_perpus_options():
+    """Daftar perpustakaan untuk dropdown: [{'id', 'nama', 'kecamatan', 'desa'}] urut nama"""
+    rows = db.session.query(PerpusDesa.id, PerpusDesa.nama, PerpusDesa.kecamatan, PerpusDesa.desa)\
+        .order_by(PerpusDesa.nama.asc()).all()
+    return [{'id': row.id, 'nama': row.nama, 'kecamatan': row.kecamatan, 'desa': row.desa}
+            for row in rows]
+
+
+@query_cache.cached('perpus_desa')
+def get_kecamatan_list():
+    """Nama kecamatan unik yang punya perpustakaan, urut abjad"""
+    rows = db.session.query(PerpusDesa.kecamatan).distinct().order_by(PerpusDesa.kecamatan.asc()).all()
+    return [row[0] for row in rows]
@@ -0,0 +1,188 @@
+"""Profil request on-demand untuk superadmin (cProfile + sampling stack).
+
+Superadmin yang login memicu profil dengan header `X-Profile: 1` atau query
+`?_profile=1` pada halaman mana pun. Request itu dijalankan di bawah cProfile
+sementara thread sampler mencatat stack setiap PROFILER_SAMPLE_MS. Hasilnya
+disimpan di PROFILER_DIR:
+
+  <id>.prof       pstats (snakeviz, `python -m pstats`)
+  <id>.collapsed  stack terlipat untuk flamegraph.pl / speedscope
+  <id>.json       metadata (endpoint, durasi, status)
+
+Request lain hanya membayar satu pengecekan header/query di before_request.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import g, request
+
+from app.utils.session_manager import SessionManager
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ARG = '_profile'
+
+_SAFE_ID = re.compile(r'^[\w.-]+$')
+_UNSAFE_CHARS = re.compile(r'[^\w.-]')
+
+
+class StackSampler(threading.Thread):
+    """Ambil stack thread request secara berkala -> Counter stack terlipat"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _profile_requested():
+    flag = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_ARG)
+    return flag not in (None, '', '0') and SessionManager.is_logged_in('superadmin')
+
+
+def list_profiles(directory, limit=50):
+    """Metadata profil terbaru (baru -> lama)"""
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+        if len(profiles) >= limit:
+            break
+    return profiles
+
+
+def profile_path(directory, profile_id, ext):
+    """Path file profil; None jika id tidak valid atau file tidak ada"""
+    if not _SAFE_ID.match(profile_id):
+        return None
+    path = os.path.join(directory, f'{profile_id}.{ext}')
+    return path if os.path.isfile(path) else None
+
+
+def profile_summary(directory, profile_id, sort='cumulative', limit=40):
+    """Tabel pstats teratas sebagai teks"""
+    path = profile_path(directory, profile_id, 'prof')
+    if path is None:
+        return None
+    output = io.StringIO()
+    stats = pstats.Stats(path, stream=output)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+
+def _prune(directory, keep):
+    ids = sorted({name.rsplit('.', 1)[0] for name in os.listdir(directory)}, reverse=True)
+    for profile_id in ids[keep:]:
+        for ext in ('prof', 'collapsed', 'json'):
+            try:
+                os.remove(os.path.join(directory, f'{profile_id}.{ext}'))
+            except FileNotFoundError:
+                pass
+
+
+def _save_profile(app, state, status_code):
+    profiler, sampler, started = state
+    profiler.disable()
+    sampler.stop()
+    duration_ms = (time.perf_counter() - started) * 1000
+
+    directory = app.config['PROFILER_DIR']
+    os.makedirs(directory, exist_ok=True)
+    now = datetime.now()
+    endpoint = request.endpoint or 'tidak_ditemukan'
+    profile_id = f"{now:%Y%m%d-%H%M%S}-{_UNSAFE_CHARS.sub('_', endpoint)}-{secrets.token_hex(3)}"
+    base = os.path.join(directory, profile_id)
+
+    profiler.dump_stats(base + '.prof')
+    with open(base + '.collapsed', 'w', encoding='utf-8') as f:
+        for stack, count in sampler.stacks.most_common():
+            f.write(f'{stack} {count}\n')
+    meta = {
+        'id': profile_id,
+        'endpoint': endpoint,
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'status': status_code,
+        'duration_ms': round(duration_ms, 1),
+        'samples': sum(sampler.stacks.values()),
+        'user': SessionManager.get_current_username('superadmin'),
+        'created_at': now.isoformat(timespec='seconds')
+    }
+    with open(base + '.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    _prune(directory, app.config['PROFILER_KEEP'])
+    app.logger.info(f"Profil request {endpoint} ({duration_ms:.0f} ms) disimpan: {profile_id}")
+
+
+def init_request_profiler(app):
+    app.config.setdefault('PROFILER_ENABLED', True)
+    app.config.setdefault('PROFILER_DIR', os.path.join(app.instance_path, 'profiles'))
+    app.config.setdefault('PROFILER_KEEP', 50)
+    app.config.setdefault('PROFILER_SAMPLE_MS', 2)
+    if not app.config['PROFILER_ENABLED']:
+        return
+
+    @app.before_request
+    def _start_profile():
+        if request.endpoint == 'static' or not _profile_requested():
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Profiler lain (mis. debugger) sedang aktif di thread ini
+            return
+        sampler = StackSampler(threading.get_ident(), app.config['PROFILER_SAMPLE_MS'] / 1000)
+        sampler.start()
+        g._request_profile = (profiler, sampler, time.perf_counter())
+
+    @app.after_request
+    def _stop_profile(response):
+        state = g.pop('_request_profile', None)
+        if state is not None:
+            try:
+                _save_profile(app, state, response.status_code)
+            except Exception as e:
+                app.logger.error(f"Gagal menyimpan profil request: {str(e)}")
+        return response
+
+    @app.teardown_request
+    def _stop_failed_profile(exc=None):
+        state = g.pop('_request_profile', None)
+        if state is not None:
+            state[0].disable()
+            state[1].stop()
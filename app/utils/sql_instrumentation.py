@@ -0,0 +1,211 @@
+"""Instrumentasi SQL per request: jumlah query, waktu DB, dugaan N+1, query lambat.
+
+Event engine SQLAlchemy mencatat setiap statement selama request (flask.g).
+Statement dengan bentuk sama (parameter & isi IN (...) diabaikan) yang diulang
+>= SQL_NPLUS1_THRESHOLD kali dalam satu request ditandai dugaan N+1.
+Statement SELECT yang lebih lama dari SQL_SLOW_QUERY_MS dicatat ke log beserta
+EXPLAIN QUERY PLAN-nya.
+
+Ringkasan per endpoint dikumpulkan di memori lalu digabung berkala ke file
+SQLite di folder instance (SQL_STATS_PATH) sehingga halaman superadmin
+menampilkan data semua worker gunicorn.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from app import db
+
+_IN_LIST = re.compile(r'\(\s*(?:\?|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+))*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+_STATS_COLUMNS = ('requests', 'queries', 'max_queries', 'db_ms', 'max_db_ms', 'nplus1', 'slow')
+
+
+def statement_shape(statement):
+    """Bentuk statement tanpa variasi parameter (IN (?, ?, ?) -> IN (?))"""
+    return _IN_LIST.sub('(?)', _WHITESPACE.sub(' ', statement).strip())
+
+
+class SQLStatsStore:
+    """Agregat per endpoint; buffer per proses, digabung ke file SQLite bersama"""
+
+    def __init__(self, path, flush_interval=10):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._buffer = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS route_stats ('
+                         'endpoint TEXT PRIMARY KEY, requests INTEGER NOT NULL, queries INTEGER NOT NULL, '
+                         'max_queries INTEGER NOT NULL, db_ms REAL NOT NULL, max_db_ms REAL NOT NULL, '
+                         'nplus1 INTEGER NOT NULL, slow INTEGER NOT NULL, last_nplus1 TEXT, updated_at REAL)')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def record(self, endpoint, queries, db_ms, nplus1_shapes, slow):
+        with self._lock:
+            stats = self._buffer.setdefault(endpoint, dict.fromkeys(_STATS_COLUMNS, 0))
+            stats['requests'] += 1
+            stats['queries'] += queries
+            stats['max_queries'] = max(stats['max_queries'], queries)
+            stats['db_ms'] += db_ms
+            stats['max_db_ms'] = max(stats['max_db_ms'], db_ms)
+            stats['nplus1'] += 1 if nplus1_shapes else 0
+            stats['slow'] += slow
+            if nplus1_shapes:
+                stats['last_nplus1'] = '\n'.join(nplus1_shapes)[:4000]
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            buffer, self._buffer = self._buffer, {}
+            self._last_flush = time.monotonic()
+        if not buffer:
+            return
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                for endpoint, stats in buffer.items():
+                    conn.execute(
+                        'INSERT INTO route_stats (endpoint, requests, queries, max_queries, db_ms, max_db_ms, '
+                        'nplus1, slow, last_nplus1, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                        'ON CONFLICT(endpoint) DO UPDATE SET '
+                        'requests = requests + excluded.requests, queries = queries + excluded.queries, '
+                        'max_queries = MAX(max_queries, excluded.max_queries), db_ms = db_ms + excluded.db_ms, '
+                        'max_db_ms = MAX(max_db_ms, excluded.max_db_ms), nplus1 = nplus1 + excluded.nplus1, '
+                        'slow = slow + excluded.slow, '
+                        'last_nplus1 = COALESCE(excluded.last_nplus1, last_nplus1), updated_at = excluded.updated_at',
+                        (endpoint, stats['requests'], stats['queries'], stats['max_queries'], stats['db_ms'],
+                         stats['max_db_ms'], stats['nplus1'], stats['slow'], stats.get('last_nplus1'), now))
+        except sqlite3.Error:
+            # Statistik tidak boleh menggagalkan request; data buffer ini dibuang
+            pass
+
+    def worst_routes(self, order_by='avg_queries', limit=50):
+        self.flush()
+        order = {
+            'avg_queries': 'queries * 1.0 / requests',
+            'avg_db_ms': 'db_ms / requests',
+            'nplus1': 'nplus1',
+            'slow': 'slow'
+        }.get(order_by, 'queries * 1.0 / requests')
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(f'SELECT * FROM route_stats ORDER BY {order} DESC LIMIT ?', (limit,)).fetchall()
+        return [dict(row, avg_queries=row['queries'] / row['requests'], avg_db_ms=row['db_ms'] / row['requests'])
+                for row in rows]
+
+    def reset(self):
+        with self._lock:
+            self._buffer = {}
+        with self._connect() as conn:
+            conn.execute('DELETE FROM route_stats')
+
+
+_store = None
+
+
+def get_sql_stats():
+    return _store
+
+
+def current_request_sql_stats():
+    """{'count', 'ms'} request yang sedang berjalan, None jika instrumentasi tidak aktif"""
+    if _store is None:
+        return None
+    stats = g.get('_sql_stats')
+    return {'count': stats['count'], 'ms': stats['ms']} if stats else {'count': 0, 'ms': 0.0}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Waktu mulai disimpan di execution context, bukan stack per koneksi: statement
+    # yang gagal tidak memicu after_cursor_execute dan tidak boleh meninggalkan sisa
+    if context is not None and has_request_context():
+        context._sql_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context():
+        return
+    started = getattr(context, '_sql_query_start', None)
+    if started is None:
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    stats = g.get('_sql_stats')
+    if stats is None:
+        stats = g._sql_stats = {'count': 0, 'ms': 0.0, 'shapes': Counter(), 'slow': 0}
+    stats['count'] += 1
+    stats['ms'] += elapsed_ms
+    stats['shapes'][statement_shape(statement)] += 1
+
+    config = g.get('_sql_config')
+    if config and elapsed_ms >= config['slow_ms']:
+        stats['slow'] += 1
+        _log_slow_query(conn, cursor, statement, parameters, elapsed_ms, executemany)
+
+
+def _log_slow_query(conn, cursor, statement, parameters, elapsed_ms, executemany):
+    from flask import current_app
+
+    plan = ''
+    if not executemany and statement.lstrip().upper().startswith('SELECT'):
+        prefix = {'sqlite': 'EXPLAIN QUERY PLAN ', 'postgresql': 'EXPLAIN '}.get(conn.dialect.name)
+        if prefix:
+            try:
+                # Cursor DBAPI terpisah: tidak memicu event ini lagi
+                explain = cursor.connection.cursor()
+                explain.execute(prefix + statement, parameters)
+                plan = '\n'.join(str(row[-1]) for row in explain.fetchall())
+                explain.close()
+            except Exception as e:
+                plan = f'(EXPLAIN gagal: {e})'
+    current_app.logger.warning(
+        f"Query lambat {elapsed_ms:.1f} ms di {request.endpoint}: {_WHITESPACE.sub(' ', statement)[:1000]}"
+        + (f"\n{plan}" if plan else ''))
+
+
+def init_sql_instrumentation(app):
+    global _store
+    app.config.setdefault('SQL_INSTRUMENTATION', True)
+    app.config.setdefault('SQL_SLOW_QUERY_MS', 200)
+    app.config.setdefault('SQL_NPLUS1_THRESHOLD', 5)
+    app.config.setdefault('SQL_STATS_PATH', os.path.join(app.instance_path, 'sql_stats.db'))
+    if not app.config['SQL_INSTRUMENTATION']:
+        return
+
+    os.makedirs(os.path.dirname(app.config['SQL_STATS_PATH']), exist_ok=True)
+    _store = SQLStatsStore(app.config['SQL_STATS_PATH'])
+    with app.app_context():
+        if not event.contains(db.engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+
+    config = {'slow_ms': app.config['SQL_SLOW_QUERY_MS'], 'nplus1': app.config['SQL_NPLUS1_THRESHOLD']}
+
+    @app.before_request
+    def _start_sql_stats():
+        g._sql_config = config
+
+    @app.teardown_request
+    def _record_sql_stats(exc=None):
+        stats = g.pop('_sql_stats', None)
+        if stats is None or request.endpoint in (None, 'static'):
+            return
+        nplus1 = [f'{count}x {shape}' for shape, count in stats['shapes'].most_common()
+                  if count >= config['nplus1']]
+        if nplus1:
+            app.logger.warning(f"Dugaan N+1 di {request.endpoint} ({stats['count']} query): {nplus1[0][:500]}")
+        _store.record(request.endpoint, stats['count'], stats['ms'], nplus1, stats['slow'])
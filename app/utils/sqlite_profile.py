@@ -0,0 +1,70 @@
+"""Profil koneksi SQLite (SQLITE_PROFILE).
+
+- 'production' (default): WAL sehingga pembaca tidak diblokir penulis,
+  busy_timeout agar penulis menunggu giliran alih-alih langsung gagal
+  'database is locked', synchronous=NORMAL (aman di WAL), cache halaman dan
+  mmap yang lebih besar. PRAGMA dipasang di setiap koneksi baru dari pool.
+- 'default': perilaku bawaan SQLAlchemy / sqlite3 tanpa PRAGMA tambahan.
+
+Dipanggil dua tahap dari create_app: configure_sqlite_engine() sebelum
+db.init_app (opsi engine & pool), init_sqlite_profile() sesudahnya (PRAGMA).
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from app import db
+
+SQLITE_PROFILES = {
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -20000,        # KiB (nilai negatif), ~20 MB per koneksi
+        'mmap_size': 134217728,      # 128 MB
+        'temp_store': 'MEMORY'
+    },
+    'default': {}
+}
+
+
+def _is_sqlite(app):
+    return make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name() == 'sqlite'
+
+
+def configure_sqlite_engine(app):
+    """Opsi engine & pool untuk SQLite; harus dipanggil sebelum db.init_app"""
+    app.config.setdefault('SQLITE_PROFILE', 'production')
+    app.config.setdefault('SQLITE_BUSY_TIMEOUT', 15000)  # milidetik
+    app.config.setdefault('SQLITE_POOL_SIZE', 10)
+    if not _is_sqlite(app) or app.config['SQLITE_PROFILE'] == 'default':
+        return
+
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    # File SQLite memakai QueuePool; cukup besar untuk thread gunicorn + thread background
+    options.setdefault('pool_size', app.config['SQLITE_POOL_SIZE'])
+    options.setdefault('max_overflow', app.config['SQLITE_POOL_SIZE'])
+    options.setdefault('pool_timeout', 30)
+    connect_args = options.setdefault('connect_args', {})
+    # timeout sqlite3 = busy handler; disamakan dengan PRAGMA busy_timeout di bawah
+    connect_args.setdefault('timeout', app.config['SQLITE_BUSY_TIMEOUT'] / 1000)
+
+
+def init_sqlite_profile(app):
+    """Pasang PRAGMA profil pada setiap koneksi baru engine aplikasi"""
+    profile = app.config.get('SQLITE_PROFILE', 'production')
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"SQLITE_PROFILE tidak dikenal: {profile}")
+    pragmas = dict(SQLITE_PROFILES[profile])
+    if not _is_sqlite(app) or not pragmas:
+        return
+    pragmas['busy_timeout'] = app.config['SQLITE_BUSY_TIMEOUT']
+
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+    with app.app_context():
+        event.listen(db.engine, 'connect', _apply_pragmas)
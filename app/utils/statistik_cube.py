@@ -0,0 +1,373 @@
+"""Rollup statistik (StatistikBulanan) untuk halaman statistik superadmin.
+
+Setelah commit, baris baru (kunjungan, detail donasi confirmed, detail
+distribusi) ditambahkan sebagai delta `kolom = kolom + n`; hanya update/hapus
+yang menghitung ulang bulan terdampak. Rebuild penuh tidak pernah berjalan di
+dalam request: jika rollup basi atau lebih tua dari STATISTIK_CUBE_MAX_AGE,
+request tetap membaca data lama dan satu thread background (diklaim lewat
+kolom `rebuild_started_at`, jadi hanya satu worker) membangunnya ulang. Cron
+bisa memakai `flask statistik-refresh`.
+"""
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import (
+    Integer, String, and_, cast, delete, event, func, insert, inspect, literal, null, or_, select, text, update
+)
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import (
+    Donasi, DetailDonasi, RiwayatDistribusi, DetailRiwayatDistribusi, Kunjungan, PerpusDesa,
+    StatistikBulanan, StatistikRefresh, get_wib_datetime
+)
+
+CUBE_COLUMNS = ['tahun', 'bulan', 'perpus_id', 'kecamatan', 'subjek_id',
+                'buku_donasi', 'buku_distribusi', 'kunjungan']
+
+# Kolom rollup yang diisi masing-masing sumber
+DELTA_COLUMNS = ('buku_donasi', 'buku_distribusi', 'kunjungan')
+
+_PENDING_KEY = 'statistik_cube_periode'
+_DELTA_KEY = 'statistik_cube_delta'
+_STALE_KEY = 'statistik_cube_stale'
+_tables_ready = False
+_rebuild_thread = None
+
+
+def month_range(tahun, bulan):
+    """Half-open datetime range [awal bulan, awal bulan berikutnya)"""
+    start = datetime(tahun, bulan, 1)
+    end = datetime(tahun + 1, 1, 1) if bulan == 12 else datetime(tahun, bulan + 1, 1)
+    return start, end
+
+
+def _period_filter(column, periode):
+    if periode is None:
+        return None
+    start, end = month_range(*periode)
+    return and_(column >= start, column < end)
+
+
+def _donasi_select(periode=None):
+    tahun = func.extract('year', Donasi.created_at)
+    bulan = func.extract('month', Donasi.created_at)
+    query = select(
+        cast(tahun, Integer), cast(bulan, Integer),
+        cast(null(), Integer), cast(null(), String), DetailDonasi.subjek_id,
+        func.sum(DetailDonasi.diterima), literal(0), literal(0)
+    ).select_from(DetailDonasi)\
+     .join(Donasi, Donasi.id == DetailDonasi.donasi_id)\
+     .where(Donasi.status == 'confirmed', Donasi.created_at.isnot(None))
+    if periode is not None:
+        query = query.where(_period_filter(Donasi.created_at, periode))
+    return query.group_by(tahun, bulan, DetailDonasi.subjek_id)
+
+
+def _distribusi_select(periode=None):
+    tahun = func.extract('year', RiwayatDistribusi.created_at)
+    bulan = func.extract('month', RiwayatDistribusi.created_at)
+    query = select(
+        cast(tahun, Integer), cast(bulan, Integer),
+        RiwayatDistribusi.perpus_id, PerpusDesa.kecamatan, DetailRiwayatDistribusi.subjek_id,
+        literal(0), func.sum(DetailRiwayatDistribusi.jumlah), literal(0)
+    ).select_from(DetailRiwayatDistribusi)\
+     .join(RiwayatDistribusi, RiwayatDistribusi.id == DetailRiwayatDistribusi.distribusi_id)\
+     .outerjoin(PerpusDesa, PerpusDesa.id == RiwayatDistribusi.perpus_id)\
+     .where(RiwayatDistribusi.created_at.isnot(None))
+    if periode is not None:
+        query = query.where(_period_filter(RiwayatDistribusi.created_at, periode))
+    return query.group_by(tahun, bulan, RiwayatDistribusi.perpus_id, PerpusDesa.kecamatan,
+                          DetailRiwayatDistribusi.subjek_id)
+
+
+def _kunjungan_select(periode=None):
+    tahun = func.extract('year', Kunjungan.tanggal)
+    bulan = func.extract('month', Kunjungan.tanggal)
+    query = select(
+        cast(tahun, Integer), cast(bulan, Integer),
+        Kunjungan.perpus_id, PerpusDesa.kecamatan, cast(null(), Integer),
+        literal(0), literal(0), func.count(Kunjungan.id)
+    ).select_from(Kunjungan)\
+     .outerjoin(PerpusDesa, PerpusDesa.id == Kunjungan.perpus_id)\
+     .where(Kunjungan.tanggal.isnot(None))
+    if periode is not None:
+        query = query.where(_period_filter(Kunjungan.tanggal, periode))
+    return query.group_by(tahun, bulan, Kunjungan.perpus_id, PerpusDesa.kecamatan)
+
+
+def _insert_rollup(conn, periode=None):
+    table = StatistikBulanan.__table__
+    for source in (_donasi_select, _distribusi_select, _kunjungan_select):
+        conn.execute(insert(table).from_select(CUBE_COLUMNS, source(periode)))
+
+
+def _range_indexes():
+    """Index kolom waktu yang dipakai filter rentang [awal, akhir) saat menambal rollup"""
+    return [index for model, column in ((Kunjungan, 'tanggal'), (Donasi, 'created_at'),
+                                        (RiwayatDistribusi, 'created_at'))
+            for index in model.__table__.indexes if column in index.columns]
+
+
+def ensure_statistik_tables():
+    """Buat tabel rollup dan index rentang waktu jika belum ada (aman dipanggil berulang)"""
+    global _tables_ready
+    if _tables_ready:
+        return
+    StatistikBulanan.__table__.create(db.engine, checkfirst=True)
+    StatistikRefresh.__table__.create(db.engine, checkfirst=True)
+    # Tabel penanda dari versi sebelumnya belum punya kolom klaim rebuild
+    columns = [c['name'] for c in inspect(db.engine).get_columns(StatistikRefresh.__tablename__)]
+    if 'rebuild_started_at' not in columns:
+        with db.engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {StatistikRefresh.__tablename__} ADD COLUMN rebuild_started_at DATETIME"))
+    for index in _range_indexes():
+        index.create(db.engine, checkfirst=True)
+    _tables_ready = True
+
+
+def _set_refresh_state(conn, **values):
+    """Update baris penanda (id=1) dan naikkan versi rollup"""
+    table = StatistikRefresh.__table__
+    result = conn.execute(update(table).where(table.c.id == 1)
+                          .values(versi=table.c.versi + 1, **values))
+    if result.rowcount == 0:
+        conn.execute(insert(table).values(id=1, versi=1, **values))
+
+
+def refresh_statistik_cube():
+    """Bangun ulang seluruh rollup dalam satu transaksi"""
+    ensure_statistik_tables()
+    with db.engine.begin() as conn:
+        conn.execute(delete(StatistikBulanan.__table__))
+        _insert_rollup(conn)
+        _set_refresh_state(conn, refreshed_at=datetime.now(), is_stale=False, rebuild_started_at=None)
+    current_app.logger.info("Statistik rollup dibangun ulang")
+
+
+def _add_delta(conn, key, values):
+    """Tambahkan delta ke satu baris rollup (buat baris baru jika belum ada)"""
+    table = StatistikBulanan.__table__
+    criteria = [table.c[name].is_not_distinct_from(value) for name, value in zip(CUBE_COLUMNS, key)]
+    row_id = conn.execute(select(table.c.id).where(*criteria).limit(1)).scalar()
+    if row_id is None:
+        conn.execute(insert(table).values(**dict(zip(CUBE_COLUMNS, key)), **dict(zip(DELTA_COLUMNS, values))))
+    else:
+        conn.execute(update(table).where(table.c.id == row_id).values(
+            **{name: table.c[name] + value for name, value in zip(DELTA_COLUMNS, values) if value}))
+
+
+def patch_statistik(periode_list=(), deltas=None):
+    """Hitung ulang bulan yang baris sumbernya diubah/dihapus, lalu tambahkan
+    delta baris baru untuk bulan lainnya (bulan yang dihitung ulang sudah
+    memuat baris baru tersebut)."""
+    ensure_statistik_tables()
+    table = StatistikBulanan.__table__
+    periode_list = set(periode_list)
+    with db.engine.begin() as conn:
+        for tahun, bulan in sorted(periode_list):
+            conn.execute(delete(table).where(table.c.tahun == tahun, table.c.bulan == bulan))
+            _insert_rollup(conn, (tahun, bulan))
+        for key, values in sorted((deltas or {}).items(), key=lambda item: repr(item[0])):
+            if key[:2] not in periode_list and any(values):
+                _add_delta(conn, key, values)
+        _set_refresh_state(conn)
+
+
+def mark_statistik_stale():
+    ensure_statistik_tables()
+    with db.engine.begin() as conn:
+        _set_refresh_state(conn, is_stale=True)
+
+
+def statistik_version():
+    """Versi rollup saat ini (untuk ETag); hanya membaca baris penanda"""
+    ensure_statistik_tables()
+    table = StatistikRefresh.__table__
+    return db.session.execute(select(table.c.versi).where(table.c.id == 1)).scalar() or 0
+
+
+def _claim_rebuild(stale_after):
+    """Tandai rebuild sedang berjalan jika belum diklaim worker lain (atau klaim lama sudah kedaluwarsa)"""
+    table = StatistikRefresh.__table__
+    now = datetime.now()
+    try:
+        with db.engine.begin() as conn:
+            result = conn.execute(update(table).where(
+                table.c.id == 1,
+                or_(table.c.rebuild_started_at.is_(None),
+                    table.c.rebuild_started_at < now - timedelta(seconds=stale_after))
+            ).values(rebuild_started_at=now))
+            if result.rowcount == 0 and conn.execute(select(table.c.id).where(table.c.id == 1)).first() is None:
+                conn.execute(insert(table).values(id=1, versi=0, is_stale=True, rebuild_started_at=now))
+                return True
+    except IntegrityError:
+        return False
+    return result.rowcount == 1
+
+
+def _release_rebuild():
+    table = StatistikRefresh.__table__
+    with db.engine.begin() as conn:
+        conn.execute(update(table).where(table.c.id == 1).values(rebuild_started_at=None))
+
+
+def start_statistik_refresh(app):
+    """Bangun ulang rollup di thread background jika belum ada worker lain yang mengerjakannya"""
+    global _rebuild_thread
+    if _rebuild_thread is not None and _rebuild_thread.is_alive():
+        return None
+    if not _claim_rebuild(app.config.get('STATISTIK_CUBE_REBUILD_TIMEOUT', 600)):
+        return None
+
+    def target():
+        with app.app_context():
+            try:
+                refresh_statistik_cube()
+            except Exception as e:
+                current_app.logger.error(f"Gagal membangun ulang rollup statistik: {str(e)}")
+                _release_rebuild()
+
+    _rebuild_thread = threading.Thread(target=target, name='statistik-refresh', daemon=True)
+    _rebuild_thread.start()
+    return _rebuild_thread
+
+
+def ensure_statistik_fresh():
+    """Jadwalkan rebuild background jika rollup belum ada, ditandai basi, atau
+    lebih tua dari batas umur. Tidak pernah membangun ulang di request ini:
+    pemanggil tetap membaca rollup yang ada.
+
+    Mengembalikan versi rollup saat ini (untuk ETag).
+    """
+    ensure_statistik_tables()
+    table = StatistikRefresh.__table__
+    state = db.session.execute(
+        select(table.c.refreshed_at, table.c.is_stale, table.c.versi).where(table.c.id == 1)
+    ).first()
+    max_age = current_app.config.get('STATISTIK_CUBE_MAX_AGE', 900)
+    if (state is None or state.is_stale or state.refreshed_at is None
+            or datetime.now() - state.refreshed_at > timedelta(seconds=max_age)):
+        start_statistik_refresh(current_app._get_current_object())
+    return state.versi if state is not None else 0
+
+
+def _periode_of(value):
+    value = value or get_wib_datetime()
+    return (value.year, value.month)
+
+
+def _periode_history(obj, column):
+    """Bulan nilai saat ini dan nilai lama kolom waktu (jika tanggal dipindah)"""
+    history = inspect(obj).attrs[column].history
+    return {_periode_of(value) for value in [getattr(obj, column), *history.deleted]}
+
+
+def _attr_changed(obj, *names):
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in names)
+
+
+# Atribut yang memengaruhi rollup; perubahan kolom lain (catatan, bukti foto, ...) diabaikan
+_TRACKED_ATTRS = {
+    Kunjungan: ('tanggal', 'perpus_id'),
+    Donasi: ('status', 'created_at'),
+    RiwayatDistribusi: ('perpus_id', 'created_at'),
+    DetailDonasi: ('diterima', 'subjek_id', 'donasi_id'),
+    DetailRiwayatDistribusi: ('jumlah', 'subjek_id', 'distribusi_id'),
+}
+
+
+def _kecamatan_of(session, perpus_id):
+    perpus = session.get(PerpusDesa, perpus_id) if perpus_id is not None else None
+    return perpus.kecamatan if perpus is not None else None
+
+
+def _delta_of(session, obj):
+    """(kunci rollup, (buku_donasi, buku_distribusi, kunjungan)) untuk baris sumber baru, atau None"""
+    if isinstance(obj, Kunjungan):
+        tahun, bulan = _periode_of(obj.tanggal)
+        return (tahun, bulan, obj.perpus_id, _kecamatan_of(session, obj.perpus_id), None), (0, 0, 1)
+    if isinstance(obj, DetailDonasi):
+        parent = obj.donasi or session.get(Donasi, obj.donasi_id)
+        if parent is None or parent.status != 'confirmed' or not obj.diterima:
+            return None
+        tahun, bulan = _periode_of(parent.created_at)
+        return (tahun, bulan, None, None, obj.subjek_id), (obj.diterima, 0, 0)
+    if isinstance(obj, DetailRiwayatDistribusi):
+        parent = obj.distribusi or session.get(RiwayatDistribusi, obj.distribusi_id)
+        if parent is None or not obj.jumlah:
+            return None
+        tahun, bulan = _periode_of(parent.created_at)
+        return (tahun, bulan, parent.perpus_id, _kecamatan_of(session, parent.perpus_id),
+                obj.subjek_id), (0, obj.jumlah, 0)
+    return None
+
+
+def _collect_periode(session, flush_context, instances):
+    """before_flush: catat delta baris baru dan bulan yang perlu dihitung ulang"""
+    periode = session.info.setdefault(_PENDING_KEY, set())
+    deltas = session.info.setdefault(_DELTA_KEY, {})
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, (Kunjungan, DetailDonasi, DetailRiwayatDistribusi)):
+                delta = _delta_of(session, obj)
+                if delta is not None:
+                    key, values = delta
+                    deltas[key] = tuple(a + b for a, b in zip(deltas.get(key, (0, 0, 0)), values))
+            # Donasi / RiwayatDistribusi baru belum punya isi; detailnya dihitung di atas
+
+        for obj in list(session.dirty) + list(session.deleted):
+            tracked = _TRACKED_ATTRS.get(type(obj))
+            if tracked is None:
+                if isinstance(obj, PerpusDesa) and (obj in session.deleted or _attr_changed(obj, 'kecamatan')):
+                    session.info[_STALE_KEY] = True
+                continue
+            if obj in session.dirty and not _attr_changed(obj, *tracked):
+                continue
+            if isinstance(obj, Kunjungan):
+                periode.update(_periode_history(obj, 'tanggal'))
+            elif isinstance(obj, (Donasi, RiwayatDistribusi)):
+                periode.update(_periode_history(obj, 'created_at'))
+            elif isinstance(obj, DetailDonasi):
+                parent = obj.donasi or session.get(Donasi, obj.donasi_id)
+                periode.add(_periode_of(parent.created_at if parent else None))
+            elif isinstance(obj, DetailRiwayatDistribusi):
+                parent = obj.distribusi or session.get(RiwayatDistribusi, obj.distribusi_id)
+                periode.add(_periode_of(parent.created_at if parent else None))
+
+
+def _apply_after_commit(session):
+    periode = session.info.pop(_PENDING_KEY, None)
+    deltas = session.info.pop(_DELTA_KEY, None)
+    stale = session.info.pop(_STALE_KEY, False)
+    if not periode and not deltas and not stale:
+        return
+    try:
+        if stale:
+            mark_statistik_stale()
+        else:
+            patch_statistik(periode or (), deltas)
+    except Exception as e:
+        current_app.logger.error(f"Gagal memperbarui rollup statistik: {str(e)}")
+        try:
+            mark_statistik_stale()
+        except Exception:
+            pass
+
+
+def _discard_pending(session, previous_transaction=None):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_DELTA_KEY, None)
+    session.info.pop(_STALE_KEY, False)
+
+
+def init_statistik_cube(app):
+    """Pasang hook sesi SQLAlchemy untuk menambal rollup setelah commit"""
+    app.config.setdefault('STATISTIK_CUBE_MAX_AGE', 900)
+    app.config.setdefault('STATISTIK_CUBE_REBUILD_TIMEOUT', 600)
+    if not event.contains(db.session, 'before_flush', _collect_periode):
+        event.listen(db.session, 'before_flush', _collect_periode)
+        event.listen(db.session, 'after_commit', _apply_after_commit)
+        event.listen(db.session, 'after_soft_rollback', _discard_pending)
@@ -0,0 +1,361 @@
+"""Generator data sintetis berskala besar untuk uji beban (`flask data-sintetis`).
+
+Semua baris dimasukkan dengan insert Core per batch (executemany) dan id
+eksplisit, sehingga jutaan kunjungan atau ratusan ribu donasi selesai dalam
+hitungan menit. Tanggal dihitung mundur dari `sampai` (default tanggal tetap
+DEFAULT_SAMPAI, bukan jam dinding), jadi hasil sama persis untuk seed dan
+`sampai` yang sama kapan pun dijalankan. Gambar placeholder
+(PNG gradasi) dibuat lokal, tanpa unduhan.
+
+Tabel turunan (rollup statistik, peringkat donatur) dibangun ulang di akhir
+karena insert Core tidak melewati hook sesi ORM.
+"""
+import os
+import random
+import struct
+import zlib
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import bindparam, func, insert, select, update
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models import (
+    DetailDonasi, DetailKebutuhanKoleksi, DetailRiwayatDistribusi, Donasi, KebutuhanKoleksi, KegiatanPerpus,
+    Kunjungan, PerpusDesa, RiwayatDistribusi, SubjekBuku, User
+)
+from app.utils.db_compat import sync_sequences
+
+SCALE_PRESETS = {
+    'kecil': {'donatur': 200, 'kunjungan': 10_000, 'donasi': 1_000, 'distribusi': 100,
+              'kebutuhan': 100, 'kegiatan': 50},
+    'sedang': {'donatur': 1_000, 'kunjungan': 100_000, 'donasi': 10_000, 'distribusi': 1_000,
+               'kebutuhan': 500, 'kegiatan': 500},
+    'produksi': {'donatur': 10_000, 'kunjungan': 1_000_000, 'donasi': 100_000, 'distribusi': 10_000,
+                 'kebutuhan': 2_000, 'kegiatan': 5_000}
+}
+
+# Tanggal data terbaru jika `sampai` tidak diberikan
+DEFAULT_SAMPAI = datetime(2026, 6, 30)
+
+IMAGE_FOLDERS = {
+    'kegiatan': 'kegiatan-perpus',
+    'pengiriman': 'bukti-pengiriman',
+    'distribusi': 'bukti-distribusi'
+}
+
+_NAMA_DEPAN = ['Ahmad', 'Siti', 'Budi', 'Dewi', 'Rizky', 'Nur', 'Agus', 'Rina', 'Hendra', 'Wulan',
+               'Fajar', 'Indah', 'Yusuf', 'Lestari', 'Eko', 'Ayu', 'Bayu', 'Fitri', 'Dimas', 'Putri']
+_NAMA_BELAKANG = ['Pratama', 'Wijaya', 'Santoso', 'Hidayat', 'Saputra', 'Kusuma', 'Rahmawati',
+                  'Setiawan', 'Nugroho', 'Lestari', 'Purnomo', 'Anggraini', 'Firmansyah', 'Utami']
+_KEGIATAN = ['Workshop Literasi Digital', 'Bimbingan Belajar Gratis', 'Dongeng Bergilir', 'Pelatihan Komputer',
+             'Lomba Membaca Puisi', 'Kelas Menulis Cerpen', 'Pameran Buku', 'Gerakan Gemar Membaca',
+             'Bedah Buku', 'Pojok Baca Keliling']
+
+
+def _placeholder_png(width, height, top, bottom):
+    """PNG RGB gradasi vertikal dari warna top ke bottom (tanpa Pillow)"""
+    rows = []
+    for y in range(height):
+        t = y / max(height - 1, 1)
+        pixel = bytes(round(a + (b - a) * t) for a, b in zip(top, bottom))
+        rows.append(b'\x00' + pixel * width)
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(b''.join(rows), 6)) + chunk(b'IEND', b''))
+
+
+def generate_placeholder_images(rng, count):
+    """Tulis `count` gambar placeholder ke tiap folder upload; mengembalikan nama file per jenis"""
+    static_folder = os.path.join(current_app.root_path, 'static', 'public')
+    palette = [tuple(rng.randint(40, 220) for _ in range(3)) for _ in range(count * 2)]
+    images = {}
+    for kind, folder in IMAGE_FOLDERS.items():
+        path = os.path.join(static_folder, folder)
+        os.makedirs(path, exist_ok=True)
+        names = []
+        for i in range(count):
+            name = f'sintetis_{kind}_{i + 1:02d}.png'
+            with open(os.path.join(path, name), 'wb') as f:
+                f.write(_placeholder_png(800, 600, palette[i * 2], palette[i * 2 + 1]))
+            names.append(name)
+        images[kind] = names
+    return images
+
+
+class SyntheticDataGenerator:
+    """Bangun dataset sintetis; setiap bagian memakai Random(seed) yang sama urutannya"""
+
+    def __init__(self, seed=42, hari=730, batch_size=5000, progress=None, sampai=None):
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.batch_size = batch_size
+        self.progress = progress or (lambda message: None)
+        self.now = (sampai or DEFAULT_SAMPAI).replace(hour=23, minute=59, second=59, microsecond=0)
+        self.start = self.now - timedelta(days=hari)
+        self.span = int((self.now - self.start).total_seconds())
+        self.counts = {}
+
+    def _random_datetime(self, after=None):
+        start = after or self.start
+        span = max(int((self.now - start).total_seconds()), 1)
+        return start + timedelta(seconds=self.rng.randrange(span))
+
+    def _next_id(self, conn, model):
+        return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+    def _insert(self, conn, model, rows):
+        for i in range(0, len(rows), self.batch_size):
+            conn.execute(insert(model.__table__), rows[i:i + self.batch_size])
+        self.counts[model.__tablename__] = self.counts.get(model.__tablename__, 0) + len(rows)
+
+    def _reference(self, conn):
+        self.perpus_ids = conn.execute(select(PerpusDesa.id)).scalars().all()
+        self.subjek_ids = conn.execute(select(SubjekBuku.id)).scalars().all()
+        admins = conn.execute(select(User.id, User.perpus_id)
+                              .where(User.role == 'admin', User.perpus_id.isnot(None))).all()
+        self.admin_by_perpus = {perpus_id: user_id for user_id, perpus_id in admins}
+        self.fallback_user = conn.execute(select(func.min(User.id))
+                                          .where(User.role.in_(['superadmin', 'admin']))).scalar()
+        if not self.perpus_ids or not self.subjek_ids:
+            raise ValueError("Data perpustakaan dan subjek buku belum ada; jalankan setup awal terlebih dahulu")
+
+    def generate_donatur(self, conn, jumlah):
+        first_id = self._next_id(conn, User)
+        password = generate_password_hash(f'sintetis{self.seed}')
+        rows = []
+        for i in range(jumlah):
+            user_id = first_id + i
+            created = self._random_datetime()
+            rows.append({
+                'id': user_id,
+                'username': f'sintetis{user_id}',
+                'full_name': f'{self.rng.choice(_NAMA_DEPAN)} {self.rng.choice(_NAMA_BELAKANG)}',
+                'email': f'donatur{user_id}@sintetis.test',
+                'password': password,
+                'role': 'user',
+                'is_active': True,
+                'is_verified': True,
+                'created_at': created,
+                'updated_at': created
+            })
+        self._insert(conn, User, rows)
+        self.donatur_ids = [row['id'] for row in rows] or \
+            conn.execute(select(User.id).where(User.role == 'user')).scalars().all()
+        if not self.donatur_ids:
+            raise ValueError("Belum ada donatur; gunakan --donatur lebih dari 0")
+        self.progress(f"{jumlah} donatur")
+
+    def generate_kunjungan(self, conn, jumlah):
+        first_id = self._next_id(conn, Kunjungan)
+        rng, perpus_ids = self.rng, self.perpus_ids
+        # Beberapa perpustakaan jauh lebih ramai (distribusi miring seperti data asli)
+        weights = [rng.paretovariate(1.2) for _ in perpus_ids]
+        done = 0
+        while done < jumlah:
+            size = min(self.batch_size * 4, jumlah - done)
+            chosen = rng.choices(perpus_ids, weights=weights, k=size)
+            rows = []
+            for i, perpus_id in enumerate(chosen):
+                tanggal = self.start + timedelta(seconds=rng.randrange(self.span))
+                rows.append({'id': first_id + done + i, 'perpus_id': perpus_id, 'tanggal': tanggal,
+                             'created_at': tanggal, 'updated_at': tanggal})
+            self._insert(conn, Kunjungan, rows)
+            done += size
+            self.progress(f"{done}/{jumlah} kunjungan")
+
+    def generate_donasi(self, conn, jumlah, images):
+        rng = self.rng
+        donasi_id = self._next_id(conn, Donasi)
+        detail_id = self._next_id(conn, DetailDonasi)
+        # (detail_id, donasi_id, subjek_id, kuota, tanggal) detail confirmed yang bisa didistribusikan
+        self.stok = []
+        done = 0
+        while done < jumlah:
+            size = min(self.batch_size, jumlah - done)
+            donasi_rows, detail_rows = [], []
+            for _ in range(size):
+                created = self._random_datetime()
+                status = rng.choices(['draft', 'pending', 'confirmed'], weights=[1, 2, 7])[0]
+                donasi_rows.append({
+                    'id': donasi_id,
+                    'user_id': rng.choice(self.donatur_ids),
+                    'invoice': f'DNSISINTETIS{donasi_id:08d}',
+                    'whatsapp': f'08{rng.randrange(10 ** 9, 10 ** 10)}',
+                    'metode': 'mandiri',
+                    'notes': None,
+                    'tanggal_pengiriman': created,
+                    'sampul_buku': None,
+                    'bukti_pengiriman': rng.choice(images['pengiriman']) if status != 'draft' else None,
+                    'status': status,
+                    'sertifikat': None,
+                    'created_at': created,
+                    'updated_at': created
+                })
+                for subjek_id in rng.sample(self.subjek_ids, min(len(self.subjek_ids), rng.randint(1, 4))):
+                    jumlah_buku = rng.randint(1, 30)
+                    diterima = rng.randint(jumlah_buku // 2, jumlah_buku) if status == 'confirmed' else 0
+                    detail_rows.append({
+                        'id': detail_id,
+                        'donasi_id': donasi_id,
+                        'subjek_id': subjek_id,
+                        'jumlah': jumlah_buku,
+                        'diterima': diterima,
+                        'ditolak': jumlah_buku - diterima if status == 'confirmed' else 0,
+                        'kuota': diterima,
+                        'alasan_ditolak': 'Kondisi buku rusak' if status == 'confirmed' and diterima < jumlah_buku else None,
+                        'created_at': created,
+                        'updated_at': created
+                    })
+                    if diterima:
+                        self.stok.append([detail_id, donasi_id, subjek_id, diterima, created])
+                    detail_id += 1
+                donasi_id += 1
+            self._insert(conn, Donasi, donasi_rows)
+            self._insert(conn, DetailDonasi, detail_rows)
+            done += size
+            self.progress(f"{done}/{jumlah} donasi")
+
+    def generate_distribusi(self, conn, jumlah, images):
+        rng = self.rng
+        if not getattr(self, 'stok', None):
+            self.progress("0 distribusi (tidak ada donasi confirmed baru)")
+            return
+        distribusi_id = self._next_id(conn, RiwayatDistribusi)
+        detail_id = self._next_id(conn, DetailRiwayatDistribusi)
+        distribusi_rows, detail_rows, touched = [], [], {}
+        for _ in range(jumlah):
+            items = [item for item in rng.sample(self.stok, min(len(self.stok), rng.randint(1, 5))) if item[3] > 0]
+            if not items:
+                continue
+            created = self._random_datetime(after=max(item[4] for item in items))
+            status = rng.choices(['pengiriman', 'diterima'], weights=[1, 4])[0]
+            distribusi_rows.append({
+                'id': distribusi_id,
+                'perpus_id': rng.choice(self.perpus_ids),
+                'status': status,
+                'bukti_foto': rng.choice(images['distribusi']) if status == 'diterima' else None,
+                'created_at': created,
+                'updated_at': created
+            })
+            for item in items:
+                ambil = rng.randint(1, item[3])
+                item[3] -= ambil
+                touched[item[0]] = item[3]
+                detail_rows.append({'id': detail_id, 'distribusi_id': distribusi_id, 'donasi_id': item[1],
+                                    'subjek_id': item[2], 'jumlah': ambil, 'created_at': created,
+                                    'updated_at': created})
+                detail_id += 1
+            distribusi_id += 1
+        self._insert(conn, RiwayatDistribusi, distribusi_rows)
+        self._insert(conn, DetailRiwayatDistribusi, detail_rows)
+
+        # Kuota detail donasi berkurang sebanyak yang sudah didistribusikan
+        table = DetailDonasi.__table__
+        stmt = update(table).where(table.c.id == bindparam('detail_id')).values(kuota=bindparam('sisa'))
+        params = [{'detail_id': key, 'sisa': value} for key, value in touched.items()]
+        for i in range(0, len(params), self.batch_size):
+            conn.execute(stmt, params[i:i + self.batch_size])
+        self.progress(f"{len(distribusi_rows)} distribusi")
+
+    def generate_kebutuhan(self, conn, jumlah):
+        rng = self.rng
+        kebutuhan_id = self._next_id(conn, KebutuhanKoleksi)
+        detail_id = self._next_id(conn, DetailKebutuhanKoleksi)
+        kebutuhan_rows, detail_rows = [], []
+        for _ in range(jumlah):
+            created = self._random_datetime()
+            status = rng.choices(['pending', 'approved', 'rejected'], weights=[3, 5, 1])[0]
+            kebutuhan_rows.append({
+                'id': kebutuhan_id,
+                'perpus_id': rng.choice(self.perpus_ids),
+                'prioritas': rng.choice(['tinggi', 'sedang', 'rendah']),
+                'lokasi': None,
+                'alasan': 'Menambah koleksi untuk program literasi desa',
+                'status': status,
+                'pesan': 'Pengajuan diproses' if status != 'pending' else None,
+                'tanggal_pengajuan': created,
+                'created_at': created,
+                'updated_at': created
+            })
+            for subjek_id in rng.sample(self.subjek_ids, min(len(self.subjek_ids), rng.randint(1, 3))):
+                detail_rows.append({'id': detail_id, 'kebutuhan_id': kebutuhan_id, 'subjek_id': subjek_id,
+                                    'jumlah_buku': rng.randint(5, 50), 'created_at': created,
+                                    'updated_at': created})
+                detail_id += 1
+            kebutuhan_id += 1
+        self._insert(conn, KebutuhanKoleksi, kebutuhan_rows)
+        self._insert(conn, DetailKebutuhanKoleksi, detail_rows)
+        self.progress(f"{jumlah} kebutuhan koleksi")
+
+    def generate_kegiatan(self, conn, jumlah, images):
+        rng = self.rng
+        first_id = self._next_id(conn, KegiatanPerpus)
+        rows = []
+        for i in range(jumlah):
+            perpus_id = rng.choice(self.perpus_ids)
+            created = self._random_datetime()
+            latitude = round(-8.13 + rng.uniform(-0.15, 0.15), 6)
+            longitude = round(113.22 + rng.uniform(-0.2, 0.2), 6)
+            nama = f'{rng.choice(_KEGIATAN)} #{first_id + i}'
+            paragraf = ''.join(f'<p>{nama} bagian {n + 1}: kegiatan literasi bersama warga desa.</p>'
+                               for n in range(rng.randint(2, 6)))
+            rows.append({
+                'id': first_id + i,
+                'user_id': self.admin_by_perpus.get(perpus_id, self.fallback_user),
+                'perpus_id': perpus_id,
+                'nama_kegiatan': nama,
+                'tanggal_kegiatan': created.date(),
+                'deskripsi_kegiatan': f'<h2>{nama}</h2>{paragraf}',
+                'lokasi_kegiatan': f'https://www.google.com/maps?q={latitude},{longitude}',
+                'latitude': latitude,
+                'longitude': longitude,
+                'foto_kegiatan': rng.choice(images['kegiatan']),
+                'status': rng.choices(['active', 'archived'], weights=[9, 1])[0],
+                'created_at': created,
+                'updated_at': created
+            })
+        self._insert(conn, KegiatanPerpus, rows)
+        self.progress(f"{jumlah} kegiatan")
+
+    def run(self, skala, gambar=12):
+        """Isi database sesuai skala (dict jumlah per jenis); mengembalikan jumlah baris per tabel"""
+        images = generate_placeholder_images(self.rng, gambar)
+        with db.engine.begin() as conn:
+            self._reference(conn)
+            if skala['kegiatan'] and self.fallback_user is None and not self.admin_by_perpus:
+                raise ValueError("Belum ada user admin/superadmin untuk pemilik kegiatan")
+            self.generate_donatur(conn, skala['donatur'])
+            self.generate_kunjungan(conn, skala['kunjungan'])
+            self.generate_donasi(conn, skala['donasi'], images)
+            self.generate_distribusi(conn, skala['distribusi'], images)
+            self.generate_kebutuhan(conn, skala['kebutuhan'])
+            self.generate_kegiatan(conn, skala['kegiatan'], images)
+            sync_sequences(conn, [User.__table__, Kunjungan.__table__, Donasi.__table__,
+                                  DetailDonasi.__table__, RiwayatDistribusi.__table__,
+                                  DetailRiwayatDistribusi.__table__, KebutuhanKoleksi.__table__,
+                                  DetailKebutuhanKoleksi.__table__, KegiatanPerpus.__table__])
+        self._refresh_derived()
+        return self.counts
+
+    def _refresh_derived(self):
+        from app.utils.dashboard_cache import invalidate_dashboard_summary
+        from app.utils.fragment_cache import fragment_cache
+        from app.utils.page_cache import page_cache
+        from app.utils.peringkat_donatur import refresh_peringkat_donatur
+        from app.utils.query_cache import query_cache
+        from app.utils.statistik_cube import refresh_statistik_cube
+
+        self.progress("membangun ulang rollup statistik & peringkat donatur")
+        refresh_statistik_cube()
+        refresh_peringkat_donatur()
+        invalidate_dashboard_summary()
+        query_cache.clear()
+        page_cache.clear()
+        fragment_cache.clear()
@@ -0,0 +1,51 @@
+"""Cache bytecode Jinja di disk agar worker baru tidak mengompilasi ulang template.
+
+Tanpa cache, setiap worker gunicorn mengompilasi template (donasi.html,
+pengajuan_perpusdes.html, kegiatan_perpus.html masing-masing >900 baris) saat
+pertama kali dirender. Dengan FileSystemBytecodeCache hasil kompilasi disimpan
+di TEMPLATE_CACHE_DIR dan dipakai bersama semua worker; kunci memuat checksum
+sumber template sehingga template yang diubah otomatis dikompilasi ulang.
+`flask template-warmup` mengisi cache saat deploy.
+"""
+import os
+import time
+
+from jinja2 import FileSystemBytecodeCache, TemplateNotFound
+
+
+def init_template_cache(app):
+    app.config.setdefault('TEMPLATE_BYTECODE_CACHE', True)
+    app.config.setdefault('TEMPLATE_CACHE_DIR', os.path.join(app.instance_path, 'jinja_cache'))
+    if not app.config['TEMPLATE_BYTECODE_CACHE']:
+        return
+    os.makedirs(app.config['TEMPLATE_CACHE_DIR'], exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_DIR'])
+
+
+def warm_templates(app, clear=True):
+    """Kompilasi semua template -> [(nama, ms, error)]"""
+    env = app.jinja_env
+    if clear and env.bytecode_cache is not None:
+        env.bytecode_cache.clear()
+    env.cache.clear()
+
+    names = []
+    for name in env.list_templates():
+        names.append(name)
+        # View merender 'pengguna/...'; di filesystem case-insensitive itu nama
+        # cache yang berbeda dari 'Pengguna/...', jadi hangatkan keduanya
+        if name.startswith('Pengguna/'):
+            names.append('p' + name[1:])
+
+    results = []
+    for name in names:
+        started = time.perf_counter()
+        try:
+            env.get_template(name)
+        except TemplateNotFound:
+            continue
+        except Exception as e:
+            results.append((name, (time.perf_counter() - started) * 1000, str(e)))
+            continue
+        results.append((name, (time.perf_counter() - started) * 1000, None))
+    return results
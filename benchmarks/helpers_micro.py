@@ -0,0 +1,171 @@
+"""Micro-benchmark helper listing di public_routes: slug, tanggal, nama penulis, excerpt.
+
+Membandingkan implementasi sebelumnya (disalin apa adanya di bawah sebagai
+`*_lama`) dengan versi di app.controllers.public_routes (regex terkompilasi,
+lru_cache untuk slug, excerpt yang berhenti setelah batas). Input meniru
+listing sungguhan: nama perpustakaan dan judul kegiatan yang sama muncul
+berulang kali. Slug diukur dua kali: 'dingin' (cache dikosongkan sebelum setiap
+halaman) dan 'hangat' (kondisi normal worker yang sudah melayani beberapa
+request).
+
+Jalankan dari root repo:
+    python benchmarks/helpers_micro.py --putaran 200
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+from datetime import date, datetime
+
+from flask import Flask, current_app
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+
+def create_slug_lama(text):
+    slug = re.sub(r'[^a-zA-Z0-9\s-]', '', text).strip().lower()
+    slug = re.sub(r'[-\s]+', '-', slug)
+    return slug
+
+
+def create_perpus_slug_lama(perpus_name, kecamatan_name=None):
+    if not perpus_name:
+        return 'perpusdesa'
+    clean_perpus = perpus_name.lower()
+    clean_perpus = clean_perpus.replace('perpustakaan', '').replace('perpusdes', '').replace('desa', '').replace('tbm', '')
+    clean_perpus = re.sub(r'[^a-zA-Z0-9\s-]', '', clean_perpus).strip()
+    clean_perpus = re.sub(r'[-\s]+', '', clean_perpus)
+    clean_kecamatan = ''
+    if kecamatan_name:
+        clean_kecamatan = kecamatan_name.lower()
+        clean_kecamatan = clean_kecamatan.replace('kecamatan', '').replace('kec', '')
+        clean_kecamatan = re.sub(r'[^a-zA-Z0-9\s-]', '', clean_kecamatan).strip()
+        clean_kecamatan = re.sub(r'[-\s]+', '', clean_kecamatan)
+    if clean_perpus and clean_kecamatan:
+        result = f'perpus{clean_perpus}{clean_kecamatan}'
+    elif clean_perpus:
+        result = f'perpus{clean_perpus}'
+    else:
+        result = 'perpusdesa'
+    current_app.logger.debug(f"Python slug creation: '{perpus_name}' + '{kecamatan_name}' -> '{result}'")
+    return result
+
+
+def format_indonesian_date_lama(date_obj):
+    months = {
+        1: 'Januari', 2: 'Februari', 3: 'Maret', 4: 'April',
+        5: 'Mei', 6: 'Juni', 7: 'Juli', 8: 'Agustus',
+        9: 'September', 10: 'Oktober', 11: 'November', 12: 'Desember'
+    }
+    if isinstance(date_obj, str):
+        date_obj = datetime.strptime(date_obj, '%Y-%m-%d').date()
+    day = date_obj.day
+    month = months[date_obj.month]
+    year = date_obj.year
+    return f"{day:02d} {month} {year}"
+
+
+def format_author_name_lama(full_name):
+    if not full_name:
+        return 'Perpus Desa'
+    if full_name.startswith('Admin '):
+        perpus_part = full_name.replace('Admin ', '', 1)
+        return f'Perpus {perpus_part}'
+    if not full_name.lower().startswith('perpus'):
+        return f'Perpus {full_name}'
+    return full_name
+
+
+def make_excerpt_lama(html, limit=150):
+    excerpt = re.sub(r'<[^>]+>', '', html)
+    if len(excerpt) > limit:
+        excerpt = excerpt[:limit] + '...'
+    return excerpt
+
+
+def build_inputs(seed):
+    rng = random.Random(seed)
+    desa = ['Sumberejo', 'Kedungjajang', 'Tempeh Tengah', 'Pasirian', 'Sukodono', 'Jatiroto', 'Klakah',
+            'Ranuyoso', 'Senduro', 'Gucialit', 'Pronojiwo', 'Candipuro', 'Yosowilangun', 'Kunir']
+    perpus = [(f"{rng.choice(['Perpustakaan Desa', 'Perpusdes', 'TBM'])} {name}",
+               f"Kecamatan {rng.choice(desa)}") for name in desa * 4]
+    judul = [f"{kegiatan} {name} {tahun}" for kegiatan in ('Workshop Literasi Digital', 'Dongeng Bergilir',
+                                                           'Lomba Membaca Puisi', 'Bedah Buku')
+             for name in desa[:6] for tahun in (2024, 2025)]
+    # Deskripsi panjang dan pendek (lebih pendek dari batas excerpt)
+    deskripsi = ''.join(f'<h2>Bagian {n}</h2><p>Kegiatan literasi <b>bersama</b> warga desa, '
+                        f'<a href="#">tautan</a> dan <i>dokumentasi</i>.</p>' for n in range(12))
+    # Satu "halaman listing": 12 berita + 60 kartu perpus, dipilih dari kumpulan nama berulang
+    return {
+        'judul': [rng.choice(judul) for _ in range(12)],
+        'perpus': [rng.choice(perpus) for _ in range(60)],
+        'tanggal': [date(2025, rng.randint(1, 12), rng.randint(1, 28)) for _ in range(12)],
+        'penulis': [rng.choice(['Admin Sumberejo', 'Perpus Klakah', 'Budi Santoso']) for _ in range(12)],
+        'deskripsi': [deskripsi] * 10 + ['<p>Singkat</p>', '<p>Tanpa tag penutup']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--putaran', type=int, default=200, help='jumlah halaman listing per pengukuran')
+    parser.add_argument('--ulang', type=int, default=5, help='pengukuran diulang, diambil yang tercepat')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    from app.controllers.public_routes import (
+        create_perpus_slug, create_slug, format_author_name, format_indonesian_date, make_excerpt
+    )
+
+    data = build_inputs(args.seed)
+
+    def clear_slug_cache():
+        create_slug.cache_clear()
+        create_perpus_slug.cache_clear()
+
+    cases = [
+        ('create_slug', data['judul'],
+         lambda items: [create_slug_lama(x) for x in items], lambda items: [create_slug(x) for x in items]),
+        ('create_perpus_slug', data['perpus'],
+         lambda items: [create_perpus_slug_lama(*x) for x in items],
+         lambda items: [create_perpus_slug(*x) for x in items]),
+        ('format_indonesian_date', data['tanggal'],
+         lambda items: [format_indonesian_date_lama(x) for x in items],
+         lambda items: [format_indonesian_date(x) for x in items]),
+        ('format_author_name', data['penulis'],
+         lambda items: [format_author_name_lama(x) for x in items],
+         lambda items: [format_author_name(x) for x in items]),
+        ('excerpt', data['deskripsi'],
+         lambda items: [make_excerpt_lama(x) for x in items], lambda items: [make_excerpt(x) for x in items]),
+    ]
+
+    def per_call_ns(func, items, setup=None):
+        def body():
+            if setup:
+                setup()
+            func(items)
+        best = min(timeit.repeat(body, number=args.putaran, repeat=args.ulang))
+        return best / (args.putaran * len(items)) * 1e9
+
+    app = Flask('bench')
+    with app.app_context():
+        for name, items, old, new in cases:
+            assert old(items) == new(items), f"hasil {name} berbeda"
+
+        print(f"{'helper':<32}{'lama (ns)':>12}{'baru (ns)':>12}{'hemat':>9}")
+        for name, items, old, new in cases:
+            old_ns = per_call_ns(old, items)
+            if name in ('create_slug', 'create_perpus_slug'):
+                variants = [('dingin', per_call_ns(new, items, setup=clear_slug_cache)),
+                            ('hangat', per_call_ns(new, items))]
+            else:
+                variants = [('', per_call_ns(new, items))]
+            for label, new_ns in variants:
+                title = f"{name} ({label})" if label else name
+                print(f"{title:<32}{old_ns:>12.0f}{new_ns:>12.0f}{1 - new_ns / old_ns:>9.0%}")
+
+
+if __name__ == '__main__':
+    main()
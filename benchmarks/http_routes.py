@@ -0,0 +1,357 @@
+"""Benchmark HTTP end-to-end untuk route utama publik, admin dan superadmin.
+
+`run` menyalin instance/users.db ke folder sementara, mengisinya dengan
+`flask data-sintetis`, menjalankan gunicorn sungguhan, lalu setiap route
+dipukul oleh beberapa klien bersamaan. Cookie sesi tiap peran dibuat lewat
+SessionManager (tanpa form login). Jumlah query per request diambil dari
+selisih /metrics sebelum dan sesudah route dijalankan.
+
+`compare` membandingkan dua hasil JSON dan keluar dengan kode 1 jika ada
+regresi (p95 / throughput / query per request) melewati ambang.
+
+Jalankan dari root repo:
+    python benchmarks/http_routes.py run --skala sedang --output hasil.json
+    python benchmarks/http_routes.py compare dasar.json hasil.json --ambang 0.15
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import requests
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+SOURCE_DB = os.path.join(ROOT, 'instance', 'users.db')
+
+# (nama, endpoint Flask, peran yang login, path atau None jika ditentukan dari data)
+ROUTES = [
+    ('home', 'public.home', None, '/'),
+    ('semua_berita', 'public.semua_berita', None, '/semua-berita'),
+    ('detail_berita', 'public.detail_berita', None, None),
+    ('perpusdes', 'public.perpusdes', None, '/perpusdes'),
+    ('transparansi', 'public.transparansi', 'user', '/transparansi'),
+    ('riwayat', 'public.riwayat', 'user', '/riwayat'),
+    ('admin.dashboard', 'admin.dashboard', 'admin', '/admin/dashboard'),
+    ('superadmin.list_donasi', 'superadmin.list_donasi', 'superadmin', '/superadmin/donasi'),
+    ('superadmin.api_statistik_data', 'superadmin.api_statistik_data', 'superadmin', '/superadmin/api/statistik-data'),
+    ('superadmin.api_visit_data', 'superadmin.api_visit_data', 'superadmin', '/superadmin/api/visit-data'),
+    ('superadmin.api_donation_data', 'superadmin.api_donation_data', 'superadmin', None),
+]
+
+BASE_ENV = {
+    'EMAIL_OUTBOX_ENABLED': 'false',
+    'SQL_INSTRUMENTATION': 'true',
+    'METRICS_ENABLED': 'true',
+    'FLASK_DEBUG': 'false'
+}
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def seed_database(db_path, skala, seed):
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + db_path, **BASE_ENV)
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'run.py', 'data-sintetis',
+                    '--skala', skala, '--seed', str(seed)],
+                   cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+
+
+def prepare_clients(db_path):
+    """Cookie sesi per peran dan path route yang bergantung data"""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+    os.environ.update(BASE_ENV)
+
+    from flask import session
+    from sqlalchemy import func
+
+    from app import create_app, db
+    from app.controllers.public_routes import create_perpus_slug, create_slug
+    from app.models import Donasi, KegiatanPerpus, Kunjungan, PerpusDesa, User
+    from app.utils.session_manager import SessionManager
+
+    app = create_app()
+    with app.app_context():
+        superadmin = User.query.filter_by(role='superadmin').order_by(User.id).first()
+        donatur = db.session.query(User).join(Donasi, Donasi.user_id == User.id)\
+            .group_by(User.id).order_by(func.count(Donasi.id).desc()).first()
+        perpus_ramai = db.session.query(Kunjungan.perpus_id).group_by(Kunjungan.perpus_id)\
+            .order_by(func.count(Kunjungan.id).desc()).limit(20).all()
+        admin = User.query.filter(User.role == 'admin',
+                                  User.perpus_id.in_([row[0] for row in perpus_ramai])).first() \
+            or User.query.filter_by(role='admin').first()
+        berita = db.session.query(KegiatanPerpus.nama_kegiatan, PerpusDesa.nama, PerpusDesa.kecamatan)\
+            .join(PerpusDesa, PerpusDesa.id == KegiatanPerpus.perpus_id)\
+            .filter(KegiatanPerpus.status == 'active')\
+            .order_by(KegiatanPerpus.tanggal_kegiatan.desc()).first()
+
+        cookies = {}
+        serializer = app.session_interface.get_signing_serializer(app)
+        for role, user in (('user', donatur), ('admin', admin), ('superadmin', superadmin)):
+            if user is None:
+                continue
+            with app.test_request_context():
+                SessionManager.set_user_session({
+                    'user_id': user.id, 'username': user.username, 'full_name': user.full_name,
+                    'email': user.email, 'perpus_id': user.perpus_id, 'is_verified': True
+                }, role)
+                cookies[role] = serializer.dumps(dict(session))
+
+        paths = {'superadmin.api_donation_data': f'/superadmin/api/donation-data/{time.localtime().tm_year}'}
+        if berita:
+            paths['detail_berita'] = f'/berita/{create_perpus_slug(berita[1], berita[2])}/{create_slug(berita[0])}'
+        db.session.remove()
+    return cookies, paths, app.config['SESSION_COOKIE_NAME']
+
+
+class GunicornServer:
+    def __init__(self, db_path, workers, workdir):
+        self.port = _free_port()
+        self.url = f'http://127.0.0.1:{self.port}'
+        metrics_dir = os.path.join(workdir, 'prometheus')
+        os.makedirs(metrics_dir, exist_ok=True)
+        self.env = dict(os.environ, DATABASE_URL='sqlite:///' + db_path, PROMETHEUS_MULTIPROC_DIR=metrics_dir,
+                        **BASE_ENV)
+        self.workers = workers
+        self.proc = None
+
+    def __enter__(self):
+        self.proc = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-w', str(self.workers), '-b', f'127.0.0.1:{self.port}',
+             '--timeout', '120', '--log-level', 'warning', 'run:app'],
+            cwd=ROOT, env=self.env)
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            try:
+                if requests.get(self.url + '/metrics', timeout=2).status_code == 200:
+                    return self
+            except requests.ConnectionError:
+                pass
+            if self.proc.poll() is not None:
+                raise RuntimeError("gunicorn berhenti sebelum siap")
+            time.sleep(0.3)
+        raise RuntimeError("gunicorn tidak siap dalam 60 detik")
+
+    def __exit__(self, *exc):
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=20)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+    def endpoint_counters(self):
+        """{endpoint: [jumlah request, jumlah query DB]} dari /metrics (semua worker)"""
+        from prometheus_client.parser import text_string_to_metric_families
+
+        counters = {}
+        text = requests.get(self.url + '/metrics', timeout=10).text
+        for family in text_string_to_metric_families(text):
+            for sample in family.samples:
+                if sample.name == 'http_requests_total':
+                    counters.setdefault(sample.labels['endpoint'], [0, 0])[0] += sample.value
+                elif sample.name == 'http_request_db_queries_total':
+                    counters.setdefault(sample.labels['endpoint'], [0, 0])[1] += sample.value
+        return counters
+
+
+def drive_route(server, path, cookie_name, cookie, clients, duration, warmup):
+    deadline_holder = {}
+    lock = threading.Lock()
+    latencies, statuses = [], Counter()
+
+    def make_session():
+        http = requests.Session()
+        if cookie:
+            http.cookies.set(cookie_name, cookie, domain='127.0.0.1')
+        return http
+
+    warm = make_session()
+    for _ in range(warmup):
+        warm.get(server.url + path, allow_redirects=False, timeout=120)
+
+    def client():
+        http = make_session()
+        local_latencies, local_statuses = [], Counter()
+        while time.monotonic() < deadline_holder['deadline']:
+            started = time.perf_counter()
+            try:
+                status = http.get(server.url + path, allow_redirects=False, timeout=120).status_code
+            except requests.RequestException:
+                status = 'error'
+            local_latencies.append(time.perf_counter() - started)
+            local_statuses[status] += 1
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.monotonic()
+    deadline_holder['deadline'] = started + duration
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    return latencies, statuses, elapsed
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='http-bench-')
+    try:
+        db_path = os.path.join(workdir, 'users.db')
+        shutil.copyfile(args.database or SOURCE_DB, db_path)
+        if args.skala != 'none':
+            print(f"Mengisi data sintetis skala '{args.skala}'...", flush=True)
+            seed_database(db_path, args.skala, args.seed)
+        cookies, paths, cookie_name = prepare_clients(db_path)
+
+        selected = [route for route in ROUTES if not args.routes or route[0] in args.routes.split(',')]
+        results = {}
+        with GunicornServer(db_path, args.workers, workdir) as server:
+            for name, endpoint, role, path in selected:
+                path = path or paths.get(name)
+                if path is None or (role and role not in cookies):
+                    print(f"- {name}: dilewati (data tidak tersedia)")
+                    continue
+                before = server.endpoint_counters().get(endpoint, [0, 0])
+                latencies, statuses, elapsed = drive_route(server, path, cookie_name, cookies.get(role),
+                                                           args.clients, args.duration, args.warmup)
+                after = server.endpoint_counters().get(endpoint, [0, 0])
+                measured = after[0] - before[0]
+                errors = sum(count for status, count in statuses.items()
+                             if status == 'error' or status >= 400)
+                results[name] = {
+                    'path': path,
+                    'role': role,
+                    'requests': len(latencies),
+                    'errors': errors,
+                    'statuses': {str(status): count for status, count in statuses.items()},
+                    'throughput_rps': round(len(latencies) / elapsed, 2),
+                    'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+                    'p95_ms': round(_percentile(latencies, 95) * 1000, 2),
+                    'p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+                    'queries_per_request': round((after[1] - before[1]) / measured, 2) if measured else None
+                }
+                print(f"- {name}: {results[name]['throughput_rps']} req/s, "
+                      f"p95 {results[name]['p95_ms']} ms, {errors} error", flush=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'skala': args.skala,
+            'seed': args.seed,
+            'workers': args.workers,
+            'clients': args.clients,
+            'duration': args.duration,
+            'git': _git_revision()
+        },
+        'routes': results
+    }
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Hasil disimpan ke {args.output}")
+    return report
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results):
+    print(f"{'route':<32}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'query':>8}{'error':>7}")
+    for name, row in results.items():
+        queries = '-' if row['queries_per_request'] is None else f"{row['queries_per_request']:g}"
+        print(f"{name:<32}{row['throughput_rps']:>9.1f}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}"
+              f"{row['p99_ms']:>9.1f}{queries:>8}{row['errors']:>7}")
+
+
+def compare(args):
+    with open(args.dasar, encoding='utf-8') as f:
+        base = json.load(f)['routes']
+    with open(args.baru, encoding='utf-8') as f:
+        new = json.load(f)['routes']
+
+    regressions = []
+    print(f"{'route':<32}{'p95 lama':>10}{'p95 baru':>10}{'req/s lama':>12}{'req/s baru':>12}{'query':>16}")
+    for name in sorted(set(base) & set(new)):
+        old_row, new_row = base[name], new[name]
+        notes = []
+        if old_row['p95_ms'] and new_row['p95_ms'] > old_row['p95_ms'] * (1 + args.ambang):
+            notes.append('p95')
+        if old_row['throughput_rps'] and new_row['throughput_rps'] < old_row['throughput_rps'] * (1 - args.ambang):
+            notes.append('throughput')
+        old_q, new_q = old_row['queries_per_request'], new_row['queries_per_request']
+        if old_q is not None and new_q is not None and new_q > old_q + 0.5:
+            notes.append('query')
+        if new_row['errors'] > old_row['errors']:
+            notes.append('error')
+        queries = f"{old_q if old_q is not None else '-'}->{new_q if new_q is not None else '-'}"
+        print(f"{name:<32}{old_row['p95_ms']:>10.1f}{new_row['p95_ms']:>10.1f}{old_row['throughput_rps']:>12.1f}"
+              f"{new_row['throughput_rps']:>12.1f}{queries:>16}" + (f"  REGRESI: {', '.join(notes)}" if notes else ''))
+        if notes:
+            regressions.append((name, notes))
+
+    if regressions:
+        print(f"{len(regressions)} route mengalami regresi (ambang {args.ambang:.0%})")
+        return 1
+    print("Tidak ada regresi")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='perintah', required=True)
+
+    run_parser = sub.add_parser('run', help='jalankan benchmark')
+    run_parser.add_argument('--skala', default='kecil', choices=['none', 'kecil', 'sedang', 'produksi'],
+                            help="preset flask data-sintetis ('none' = pakai database apa adanya)")
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--database', help='database sumber (default instance/users.db, tidak diubah)')
+    run_parser.add_argument('--workers', type=int, default=2, help='worker gunicorn')
+    run_parser.add_argument('--clients', type=int, default=8, help='klien bersamaan per route')
+    run_parser.add_argument('--duration', type=float, default=10, help='detik per route')
+    run_parser.add_argument('--warmup', type=int, default=3, help='request pemanasan per route')
+    run_parser.add_argument('--routes', help='daftar nama route dipisah koma (default semua)')
+    run_parser.add_argument('--output', help='simpan hasil JSON ke file ini')
+
+    compare_parser = sub.add_parser('compare', help='bandingkan dua hasil JSON')
+    compare_parser.add_argument('dasar')
+    compare_parser.add_argument('baru')
+    compare_parser.add_argument('--ambang', type=float, default=0.1,
+                                help='toleransi penurunan p95/throughput (0.1 = 10%%)')
+
+    args = parser.parse_args()
+    if args.perintah == 'run':
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == '__main__':
+    main()
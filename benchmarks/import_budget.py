@@ -0,0 +1,81 @@
+"""Anggaran waktu impor: gagal jika create_app() terlalu lambat atau memuat modul berat.
+
+Setiap worker gunicorn dan setiap perintah `flask ...` membayar impor ini.
+Skrip menjalankan `python -X importtime` di proses baru beberapa kali, memakai
+waktu tercepat, dan keluar dengan kode 1 jika:
+  - create_app() (impor + inisialisasi) melebihi --budget-ms, atau
+  - modul yang seharusnya dimuat saat dipakai saja (pandas, pdfkit, ...)
+    sudah ada di sys.modules setelah create_app().
+
+Jalankan dari root repo (mis. di CI):
+    python benchmarks/import_budget.py --budget-ms 800
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Dimuat di dalam fungsi yang memakainya (PDF, impor Excel, unduhan gambar)
+LAZY_MODULES = ('pandas', 'numpy', 'pdfkit', 'authlib', 'requests', 'openpyxl')
+
+_PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+create_app()
+elapsed = (time.perf_counter() - started) * 1000
+print(json.dumps({{'ms': elapsed, 'loaded': [name for name in {lazy!r} if name in sys.modules]}}))
+'''
+
+_IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def run_probe():
+    env = dict(os.environ, EMAIL_OUTBOX_ENABLED='false', DB_AUTO_INDEX='false', PYTHONPATH=ROOT)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', _PROBE.format(lazy=LAZY_MODULES)],
+                          cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    modules = []
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        # Paket tingkat atas (tanpa titik) selain app sendiri: waktu kumulatif paket itu
+        if match and '.' not in match.group(4) and match.group(4) not in ('app', 'site', 'encodings'):
+            modules.append((int(match.group(2)) / 1000, match.group(4)))
+    result['modules'] = sorted(modules, reverse=True)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('IMPORT_BUDGET_MS', 800)),
+                        help='batas waktu create_app() dalam milidetik (env IMPORT_BUDGET_MS)')
+    parser.add_argument('--ulang', type=int, default=3, help='jumlah percobaan, diambil yang tercepat')
+    parser.add_argument('--top', type=int, default=10, help='jumlah modul terberat yang ditampilkan')
+    args = parser.parse_args()
+
+    runs = [run_probe() for _ in range(args.ulang)]
+    best = min(runs, key=lambda run: run['ms'])
+
+    print(f"create_app(): {best['ms']:.0f} ms (anggaran {args.budget_ms:.0f} ms, terbaik dari {args.ulang})")
+    print("Paket terberat (kumulatif):")
+    for ms, name in best['modules'][:args.top]:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    failed = False
+    if best['loaded']:
+        print(f"❌ Modul berat dimuat saat start: {', '.join(best['loaded'])} (impor di dalam fungsi yang memakainya)")
+        failed = True
+    if best['ms'] > args.budget_ms:
+        print(f"❌ create_app() melebihi anggaran {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("✅ Dalam anggaran")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""Benchmark konkurensi SQLite: profil 'default' vs 'production' (SQLITE_PROFILE).
+
+Mensimulasikan beberapa worker gunicorn (proses) dengan beberapa thread masing-
+masing yang bersamaan mencatat kunjungan, menyimpan donasi dan membaca
+ringkasan. Setiap profil dijalankan pada salinan instance/users.db sendiri,
+lalu dilaporkan jumlah operasi per detik, error 'database is locked' dan
+latensi p95.
+
+Jalankan dari root repo:
+    python benchmarks/sqlite_concurrency.py --workers 4 --threads 4 --duration 10
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+SOURCE_DB = os.path.join(ROOT, 'instance', 'users.db')
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def _prepare(db_path):
+    """Buat tabel turunan (rollup, peringkat, cache) sekali sebelum worker berjalan bersamaan"""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+    os.environ['SQLITE_PROFILE'] = 'default'
+
+    from app import create_app
+    from app.utils.cache_version import ensure_cache_version_table
+    from app.utils.peringkat_donatur import ensure_peringkat_tables
+    from app.utils.statistik_cube import refresh_statistik_cube
+
+    app = create_app()
+    with app.app_context():
+        ensure_cache_version_table()
+        ensure_peringkat_tables()
+        refresh_statistik_cube()
+
+
+def _worker(db_path, profile, threads, duration, write_ratio, results):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+    os.environ['SQLITE_PROFILE'] = profile
+    os.environ['EMAIL_OUTBOX_ENABLED'] = 'false'
+    os.environ['QUERY_CACHE_BACKEND'] = 'none'
+
+    from sqlalchemy import func
+    from sqlalchemy.exc import OperationalError
+    from app import create_app, db
+    from app.models import Donasi, DetailDonasi, Kunjungan, PerpusDesa, SubjekBuku, User
+
+    app = create_app()
+    with app.app_context():
+        perpus_ids = [row[0] for row in db.session.query(PerpusDesa.id).all()]
+        subjek_ids = [row[0] for row in db.session.query(SubjekBuku.id).all()]
+        user_ids = [row[0] for row in db.session.query(User.id).filter(User.role == 'user').all()]
+        db.session.remove()
+
+    deadline = time.monotonic() + duration
+    lock = threading.Lock()
+    totals = {'reads': 0, 'writes': 0, 'locked': 0, 'latencies': []}
+
+    def write_kunjungan():
+        db.session.add(Kunjungan(perpus_id=random.choice(perpus_ids)))
+        db.session.commit()
+
+    def write_donasi():
+        donasi = Donasi(user_id=random.choice(user_ids), invoice=f'BENCH{random.getrandbits(48):x}',
+                        whatsapp='081234567890', status='pending')
+        db.session.add(donasi)
+        db.session.flush()
+        for subjek_id in random.sample(subjek_ids, 2):
+            db.session.add(DetailDonasi(donasi_id=donasi.id, subjek_id=subjek_id, jumlah=random.randint(1, 20)))
+        db.session.commit()
+
+    def read_summary():
+        db.session.query(func.count(Donasi.id), func.coalesce(func.sum(DetailDonasi.jumlah), 0))\
+            .outerjoin(DetailDonasi, DetailDonasi.donasi_id == Donasi.id).one()
+        db.session.query(Kunjungan.perpus_id, func.count(Kunjungan.id))\
+            .group_by(Kunjungan.perpus_id).all()
+
+    def run():
+        reads = writes = locked = 0
+        latencies = []
+        with app.app_context():
+            while time.monotonic() < deadline:
+                is_write = random.random() < write_ratio
+                started = time.perf_counter()
+                try:
+                    if is_write:
+                        random.choice((write_kunjungan, write_donasi))()
+                        writes += 1
+                    else:
+                        read_summary()
+                        reads += 1
+                    latencies.append(time.perf_counter() - started)
+                except OperationalError as e:
+                    db.session.rollback()
+                    if 'locked' not in str(e):
+                        raise
+                    locked += 1
+                finally:
+                    db.session.remove()
+        with lock:
+            totals['reads'] += reads
+            totals['writes'] += writes
+            totals['locked'] += locked
+            totals['latencies'].extend(latencies)
+
+    pool = [threading.Thread(target=run) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put(totals)
+
+
+def run_profile(profile, args, workdir):
+    db_path = os.path.join(workdir, f'{profile}.db')
+    shutil.copyfile(SOURCE_DB, db_path)
+
+    ctx = multiprocessing.get_context('spawn')
+    prepare = ctx.Process(target=_prepare, args=(db_path,))
+    prepare.start()
+    prepare.join()
+    # Salinan bisa saja sudah WAL; profil 'default' harus mulai dari rollback journal
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('PRAGMA journal_mode=DELETE')
+
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(db_path, profile, args.threads, args.duration,
+                                                args.write_ratio, results))
+             for _ in range(args.workers)]
+    for proc in procs:
+        proc.start()
+    totals = {'reads': 0, 'writes': 0, 'locked': 0, 'latencies': []}
+    for _ in procs:
+        item = results.get()
+        for key in ('reads', 'writes', 'locked'):
+            totals[key] += item[key]
+        totals['latencies'].extend(item['latencies'])
+    for proc in procs:
+        proc.join()
+
+    ops = totals['reads'] + totals['writes']
+    return {
+        'profile': profile,
+        'ops_per_sec': ops / args.duration,
+        'writes_per_sec': totals['writes'] / args.duration,
+        'locked': totals['locked'],
+        'p95_ms': _percentile(totals['latencies'], 95) * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4, help='jumlah proses (worker gunicorn)')
+    parser.add_argument('--threads', type=int, default=4, help='thread per proses')
+    parser.add_argument('--duration', type=float, default=10, help='detik per profil')
+    parser.add_argument('--write-ratio', type=float, default=0.3, help='porsi operasi tulis (0-1)')
+    parser.add_argument('--profiles', default='default,production')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='sqlite-bench-')
+    try:
+        rows = [run_profile(profile, args, workdir) for profile in args.profiles.split(',')]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.workers} proses x {args.threads} thread, {args.duration:g} detik, "
+          f"{args.write_ratio:.0%} tulis")
+    print(f"{'profil':<12}{'ops/detik':>12}{'tulis/detik':>14}{'locked':>9}{'p95 (ms)':>11}")
+    for row in rows:
+        print(f"{row['profile']:<12}{row['ops_per_sec']:>12.1f}{row['writes_per_sec']:>14.1f}"
+              f"{row['locked']:>9}{row['p95_ms']:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Latensi request pertama worker baru: tanpa cache bytecode, cache kosong, cache hangat.
+
+Setiap pengukuran berjalan di proses Python baru (seperti worker gunicorn yang
+baru di-fork setelah deploy): create_app(), lalu setiap route dipanggil dua
+kali lewat test client. Selisih request pertama dan kedua adalah biaya
+"dingin" (kompilasi template, koneksi DB pertama, dst.).
+
+Mode:
+  tanpa   TEMPLATE_BYTECODE_CACHE=false (perilaku lama)
+  dingin  cache aktif tapi kosong (worker pertama setelah deploy tanpa warm-up)
+  hangat  cache diisi `flask template-warmup` lebih dulu
+
+Database yang dipakai salinan instance/users.db di folder sementara.
+
+Jalankan dari root repo:
+    python benchmarks/template_cold_start.py --ulang 5
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+SOURCE_DB = os.path.join(ROOT, 'instance', 'users.db')
+
+# (nama, peran yang login, path) - halaman dengan template terbesar
+ROUTES = [
+    ('superadmin.list_donasi', 'superadmin', '/superadmin/donasi'),
+    ('superadmin.pengajuan_perpusdes', 'superadmin', '/superadmin/pengajuan-perpusdes'),
+    ('superadmin.dashboard', 'superadmin', '/superadmin/dashboard'),
+    ('admin.kegiatan_perpus', 'admin', '/admin/kegiatan-perpus'),
+    ('admin.dashboard', 'admin', '/admin/dashboard'),
+]
+
+MODES = ('tanpa', 'dingin', 'hangat')
+
+BASE_ENV = {
+    'EMAIL_OUTBOX_ENABLED': 'false',
+    'METRICS_ENABLED': 'false',
+    'PROFILER_ENABLED': 'false',
+    'PAGE_CACHE_ENABLED': 'false',
+    'FRAGMENT_CACHE_BACKEND': 'memory',
+    'FLASK_DEBUG': 'false'
+}
+
+
+def measure():
+    """Dijalankan di proses anak: cetak JSON {route: [pertama_ms, kedua_ms]}"""
+    from app import create_app
+    from app.models import User
+
+    app = create_app()
+    with app.app_context():
+        users = {
+            'superadmin': User.query.filter_by(role='superadmin').order_by(User.id).first(),
+            'admin': User.query.filter(User.role == 'admin', User.perpus_id.isnot(None)).order_by(User.id).first()
+        }
+    clients = {}
+    for role, user in users.items():
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess[f'{role}_session'] = {'user_id': user.id, 'username': user.username, 'full_name': user.full_name,
+                                       'email': user.email, 'role': role, 'perpus_id': user.perpus_id,
+                                       'is_verified': True}
+        clients[role] = client
+
+    result = {}
+    for name, role, path in ROUTES:
+        timings = []
+        for _ in range(2):
+            started = time.perf_counter()
+            response = clients[role].get(path)
+            timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise SystemExit(f"{path} -> {response.status_code}")
+        result[name] = timings
+    print(json.dumps(result))
+
+
+def run_child(args, env):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__)] + args, cwd=ROOT, env=env,
+                            check=True, capture_output=True, text=True).stdout
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ulang', type=int, default=5, help='jumlah proses baru per mode (diambil median)')
+    parser.add_argument('--ukur', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.ukur:
+        measure()
+        return
+
+    workdir = tempfile.mkdtemp(prefix='bench-template-')
+    try:
+        db_path = os.path.join(workdir, 'users.db')
+        shutil.copy(SOURCE_DB, db_path)
+        cache_dir = os.path.join(workdir, 'jinja_cache')
+        base_env = dict(os.environ, DATABASE_URL='sqlite:///' + db_path, TEMPLATE_CACHE_DIR=cache_dir,
+                        PYTHONPATH=ROOT, **BASE_ENV)
+
+        # Satu proses pembuka agar index / tabel turunan dibuat sebelum pengukuran
+        run_child(['--ukur'], dict(base_env, TEMPLATE_BYTECODE_CACHE='false'))
+
+        hasil = {}
+        for mode in MODES:
+            env = dict(base_env, TEMPLATE_BYTECODE_CACHE='false' if mode == 'tanpa' else 'true')
+            samples = []
+            for _ in range(args.ulang):
+                shutil.rmtree(cache_dir, ignore_errors=True)
+                if mode == 'hangat':
+                    subprocess.run([sys.executable, '-m', 'flask', '--app', 'run.py', 'template-warmup'],
+                                   cwd=ROOT, env=env, check=True, capture_output=True)
+                samples.append(json.loads(run_child(['--ukur'], env)))
+            hasil[mode] = {name: [statistics.median(sample[name][i] for sample in samples) for i in (0, 1)]
+                           for name, _, _ in ROUTES}
+
+        print(f"{'route':<34}" + ''.join(f"{mode + ' (ms)':>16}" for mode in MODES) + f"{'kedua (ms)':>14}")
+        for name, _, _ in ROUTES:
+            print(f"{name:<34}" + ''.join(f"{hasil[mode][name][0]:>16.1f}" for mode in MODES)
+                  + f"{hasil['hangat'][name][1]:>14.1f}")
+        totals = {mode: sum(hasil[mode][name][0] for name, _, _ in ROUTES) for mode in MODES}
+        print(f"{'total request pertama':<34}" + ''.join(f"{totals[mode]:>16.1f}" for mode in MODES))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Fixture pytest: aplikasi dengan database SQLite sementara dan cache di memori.
+
+Jalankan dari root repo:
+    python -m pytest -q
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+TEST_ENV = {
+    'SQLITE_PROFILE': 'default',
+    'EMAIL_OUTBOX_ENABLED': 'false',
+    'PROFILER_ENABLED': 'false',
+    'QUERY_CACHE_BACKEND': 'memory',
+    'PAGE_CACHE_BACKEND': 'memory',
+    'FRAGMENT_CACHE_BACKEND': 'memory',
+    'TEMPLATE_BYTECODE_CACHE': 'false',
+    'COMPRESS_ENABLED': 'false',
+    'METRICS_TOKEN': '',
+    'TRUSTED_PROXIES': '0',
+}
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """make_app(**env) -> app baru dengan tabel kosong; env menimpa TEST_ENV"""
+    from app import db
+
+    apps = []
+
+    def factory(**env):
+        from app import create_app
+
+        monkeypatch.setenv('DATABASE_URL', 'sqlite:///' + str(tmp_path / 'test.db'))
+        for key, value in dict(TEST_ENV, **env).items():
+            monkeypatch.setenv(key, value)
+        app = create_app()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+        apps.append(app)
+        return app
+
+    yield factory
+
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login():
+    """login(client, role, user): isi session role seperti SessionManager.set_user_session"""
+    def set_session(client, role, user):
+        with client.session_transaction() as sess:
+            sess[f'{role}_session'] = {'user_id': user.id, 'username': user.username, 'full_name': user.full_name,
+                                       'email': user.email, 'role': role, 'perpus_id': user.perpus_id,
+                                       'is_verified': True}
+    return set_session
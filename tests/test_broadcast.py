@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import EmailBroadcast, User
+
+
+@pytest.fixture
+def superadmin(app):
+    with app.app_context():
+        user = User(username='dinas', email='dinas@example.id', full_name='Dinas', role='superadmin')
+        user.set_password('rahasia')
+        db.session.add(user)
+        db.session.commit()
+        db.session.refresh(user)
+        db.session.expunge(user)
+    return user
+
+
+@pytest.fixture
+def started(monkeypatch):
+    """Catat broadcast yang dijalankan route tanpa membuka thread / koneksi SMTP"""
+    calls = []
+    monkeypatch.setattr('app.controllers.superadmin_routes.start_broadcast',
+                        lambda app, broadcast_id: calls.append(broadcast_id))
+    return calls
+
+
+def _broadcast(app, status, heartbeat_age=None):
+    with app.app_context():
+        heartbeat = datetime.now() - timedelta(seconds=heartbeat_age) if heartbeat_age is not None else None
+        broadcast = EmailBroadcast(subject='Info', isi='Halo {{ nama }}', target='donatur', status=status,
+                                   total=10, heartbeat_at=heartbeat)
+        db.session.add(broadcast)
+        db.session.commit()
+        return broadcast.id
+
+
+@pytest.mark.parametrize('status, heartbeat_age, resumable', [
+    ('paused', 5, True),
+    ('running', 5, False),        # worker masih hidup
+    ('running', 3600, True),      # worker mati, heartbeat basi
+    ('done', 3600, False),
+])
+def test_lanjutkan_broadcast(app, client, login, superadmin, started, status, heartbeat_age, resumable):
+    broadcast_id = _broadcast(app, status, heartbeat_age)
+    login(client, 'superadmin', superadmin)
+
+    response = client.post(f'/superadmin/broadcast/{broadcast_id}/lanjutkan')
+
+    assert response.get_json()['success'] is resumable
+    assert started == ([broadcast_id] if resumable else [])
+
+
+def test_stale_running_broadcast_is_claimable(app):
+    from app.utils.email_broadcast import _claim, can_resume
+
+    stale_id = _broadcast(app, 'running', 3600)
+    live_id = _broadcast(app, 'running', 5)
+    with app.app_context():
+        stale_after = app.config['BROADCAST_STALE_AFTER']
+        assert can_resume(stale_id, stale_after) and _claim(stale_id, stale_after)
+        # Setelah diambil alih heartbeat baru: worker lain tidak bisa mengklaim lagi
+        assert not can_resume(stale_id, stale_after) and not _claim(stale_id, stale_after)
+        assert not can_resume(live_id, stale_after) and not _claim(live_id, stale_after)
@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy import inspect, text
+
+from app import db
+from app.utils.db_indexes import ensure_indexes, explain_key_queries
+
+
+def _index_names():
+    inspector = inspect(db.engine)
+    return {index['name'] for table in inspector.get_table_names() for index in inspector.get_indexes(table)}
+
+
+def _model_index_names():
+    return {index.name for table in db.metadata.sorted_tables for index in table.indexes}
+
+
+def test_key_queries_use_indexes(app):
+    with app.app_context():
+        results = explain_key_queries()
+
+    assert results
+    assert [(name, scans) for name, _, scans in results if scans] == []
+
+
+def test_ensure_indexes_upgrades_old_database(app):
+    with app.app_context():
+        # Database lama: tabel ada, index belum
+        dropped = sorted(_model_index_names() - {'uq_user_email'})
+        with db.engine.begin() as conn:
+            for name in dropped:
+                conn.execute(text(f'DROP INDEX IF EXISTS {name}'))
+        assert not set(dropped) & _index_names()
+        assert any(scans for _, _, scans in explain_key_queries())
+
+        assert sorted(ensure_indexes()) == dropped
+        assert ensure_indexes() == []
+        assert not any(scans for _, _, scans in explain_key_queries())
+
+
+@pytest.mark.parametrize('drop, exit_code', [(None, 0), ('ix_donasi_invoice', 1)])
+def test_db_explain_command(app, drop, exit_code):
+    if drop:
+        with app.app_context(), db.engine.begin() as conn:
+            conn.execute(text(f'DROP INDEX {drop}'))
+
+    result = app.test_cli_runner().invoke(args=['db-explain'])
+
+    assert result.exit_code == exit_code, result.output
+    assert ('full scan: donasi' in result.output) == bool(drop)
@@ -0,0 +1,121 @@
+import socket
+from datetime import datetime
+
+import pytest
+
+from app import db
+from app.models import EmailOutbox
+from app.utils.email_outbox import enqueue_email_batch, process_outbox
+
+aiosmtpd = pytest.importorskip('aiosmtpd')
+from aiosmtpd.controller import Controller  # noqa: E402
+from aiosmtpd.smtp import AuthResult  # noqa: E402
+
+
+class RecordingHandler:
+    """Server SMTP lokal: catat setiap pesan beserta koneksi (peer) pengirimnya"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((session.peer, envelope.rcpt_tos))
+        return '250 OK'
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _controller(handler, port):
+    # Terima login apa saja tanpa TLS, cukup untuk EmailService._create_smtp_connection
+    return Controller(handler, hostname='127.0.0.1', port=port, auth_require_tls=False,
+                      authenticator=lambda *args: AuthResult(success=True))
+
+
+@pytest.fixture
+def port():
+    return _free_port()
+
+
+@pytest.fixture
+def smtp_server(port):
+    handler = RecordingHandler()
+    controller = _controller(handler, port)
+    controller.start()
+    yield handler
+    controller.stop()
+
+
+@pytest.fixture
+def app(make_app, port):
+    return make_app(MAIL_SERVER='127.0.0.1', MAIL_PORT=str(port), MAIL_USE_TLS='false',
+                    MAIL_USERNAME='outbox@example.id', MAIL_PASSWORD='rahasia')
+
+
+def _enqueue(app, count):
+    with app.app_context():
+        enqueue_email_batch([{'to_email': f'donatur{i}@example.id', 'subject': 'Info',
+                              'html_body': '<p>Halo</p>', 'text_body': 'Halo'} for i in range(count)],
+                            kategori='test')
+
+
+def _rows(app):
+    with app.app_context():
+        return [(row.status, row.attempts) for row in EmailOutbox.query.order_by(EmailOutbox.id)]
+
+
+def test_batch_is_sent_over_one_smtp_session(app, smtp_server):
+    _enqueue(app, 3)
+
+    with app.app_context():
+        assert process_outbox() == (3, 0)
+
+    assert len(smtp_server.messages) == 3
+    assert len({peer for peer, _ in smtp_server.messages}) == 1
+    assert [rcpt for _, rcpt in smtp_server.messages] == [[f'donatur{i}@example.id'] for i in range(3)]
+    assert _rows(app) == [('sent', 1)] * 3
+
+
+def test_unreachable_server_backs_off_then_delivers(app, port):
+    _enqueue(app, 3)
+
+    with app.app_context():
+        assert process_outbox() == (0, 1)
+    # Email pertama dihitung gagal, sisa batch dikembalikan tanpa menambah attempts
+    assert _rows(app) == [('pending', 1), ('pending', 0), ('pending', 0)]
+    with app.app_context():
+        assert all(row.next_attempt_at > datetime.now() for row in EmailOutbox.query)
+        # Belum jatuh tempo: tidak ada yang diklaim
+        assert process_outbox() == (0, 0)
+
+    handler = RecordingHandler()
+    controller = _controller(handler, port)
+    controller.start()
+    try:
+        with app.app_context():
+            EmailOutbox.query.update({'next_attempt_at': datetime.now()})
+            db.session.commit()
+            assert process_outbox() == (3, 0)
+    finally:
+        controller.stop()
+
+    assert len(handler.messages) == 3
+    assert _rows(app) == [('sent', 2), ('sent', 1), ('sent', 1)]
+
+
+def test_gives_up_after_max_attempts(app):
+    app.config['EMAIL_OUTBOX_MAX_ATTEMPTS'] = 2
+    _enqueue(app, 1)
+
+    for _ in range(2):
+        with app.app_context():
+            assert process_outbox() == (0, 1)
+            EmailOutbox.query.update({'next_attempt_at': datetime.now()})
+            db.session.commit()
+
+    assert _rows(app) == [('failed', 2)]
+    with app.app_context():
+        assert process_outbox() == (0, 0)
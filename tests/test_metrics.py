@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip('prometheus_client')
+
+
+def test_metrics_localhost_allowed(client):
+    response = client.get('/metrics', environ_base={'REMOTE_ADDR': '127.0.0.1'})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+
+
+def test_metrics_remote_denied(client):
+    response = client.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.7'})
+    assert response.status_code == 403
+
+
+def test_metrics_proxied_without_proxyfix_denied(client):
+    # nginx -> gunicorn: remote_addr 127.0.0.1, IP asli hanya di header
+    response = client.get('/metrics', environ_base={'REMOTE_ADDR': '127.0.0.1'},
+                          headers={'X-Forwarded-For': '203.0.113.7'})
+    assert response.status_code == 403
+
+
+def test_metrics_proxied_with_proxyfix_uses_client_ip(make_app):
+    client = make_app(TRUSTED_PROXIES='1').test_client()
+    remote = client.get('/metrics', environ_base={'REMOTE_ADDR': '127.0.0.1'},
+                        headers={'X-Forwarded-For': '203.0.113.7'})
+    assert remote.status_code == 403
+    # Klien tidak bisa memalsukan IP: nginx menambahkan IP asli di akhir header
+    spoofed = client.get('/metrics', environ_base={'REMOTE_ADDR': '127.0.0.1'},
+                         headers={'X-Forwarded-For': '127.0.0.1, 203.0.113.7'})
+    assert spoofed.status_code == 403
+    # Tanpa X-Forwarded-For asal request tidak diketahui: gagal tertutup
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '127.0.0.1'}).status_code == 403
+    local = client.get('/metrics', environ_base={'REMOTE_ADDR': '127.0.0.1'},
+                       headers={'X-Forwarded-For': '127.0.0.1'})
+    assert local.status_code == 200
+
+
+def test_metrics_token(make_app):
+    client = make_app(METRICS_TOKEN='rahasia').test_client()
+    headers = {'X-Forwarded-For': '203.0.113.7'}
+    assert client.get('/metrics', headers=headers).status_code == 403
+    assert client.get('/metrics', headers=dict(headers, Authorization='Bearer salah')).status_code == 403
+    assert client.get('/metrics', headers=dict(headers, Authorization='Bearer rahasia')).status_code == 200
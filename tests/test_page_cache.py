@@ -0,0 +1,62 @@
+import time
+
+import pytest
+from flask import request
+
+from app.utils.page_cache import page_cache
+from app.utils.query_cache import SQLiteBackend
+
+
+def _with_probe(app):
+    """Route uji yang memuat URL absolut, seperti tombol share detail_berita"""
+    @app.route('/_probe')
+    @page_cache.cached()
+    def probe():
+        return f'url={request.url}'
+    return app
+
+
+@pytest.fixture
+def app(make_app):
+    return _with_probe(make_app())
+
+
+def test_stale_refresh_keeps_request_host(app):
+    client = app.test_client()
+    base = {'base_url': 'https://donasi.example.id'}
+    assert client.get('/_probe', **base).headers['X-Page-Cache'] == 'MISS'
+
+    # Paksa entri basi -> STALE + render ulang di thread background
+    for key in list(page_cache.backend._entries):
+        page_cache.backend._entries[key][2]['fresh_until'] = 0
+    assert client.get('/_probe', **base).headers['X-Page-Cache'] == 'STALE'
+    for _ in range(50):
+        if not page_cache._refreshing:
+            break
+        time.sleep(0.02)
+
+    response = client.get('/_probe', **base)
+    assert response.headers['X-Page-Cache'] == 'HIT'
+    assert response.data == b'url=https://donasi.example.id/_probe'
+
+
+def test_host_is_part_of_key(app):
+    client = app.test_client()
+    client.get('/_probe', base_url='https://donasi.example.id')
+    other = client.get('/_probe', base_url='https://mirror.example.id')
+    assert other.headers['X-Page-Cache'] == 'MISS'
+    assert other.data == b'url=https://mirror.example.id/_probe'
+
+
+def test_shared_cache_file_is_namespaced_by_database(make_app, tmp_path):
+    shared = tmp_path / 'page_cache.db'
+
+    first = _with_probe(make_app())
+    page_cache.backend = SQLiteBackend(str(shared), 100)
+    assert first.test_client().get('/_probe').headers['X-Page-Cache'] == 'MISS'
+    assert first.test_client().get('/_probe').headers['X-Page-Cache'] == 'HIT'
+
+    # App kedua dengan database lain memakai file cache yang sama
+    second = _with_probe(make_app(DATABASE_URL='sqlite:///' + str(tmp_path / 'lain.db')))
+    page_cache.backend = SQLiteBackend(str(shared), 100)
+    assert second.test_client().get('/_probe').headers['X-Page-Cache'] == 'MISS'
@@ -0,0 +1,82 @@
+import logging
+
+import pytest
+from flask import jsonify
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models import SubjekBuku
+from app.utils import sql_instrumentation
+from app.utils.sql_instrumentation import SQLStatsStore, current_request_sql_stats, statement_shape
+
+
+@pytest.fixture
+def store(app, tmp_path, monkeypatch):
+    """Statistik ke file sementara, bukan instance/sql_stats.db"""
+    stats_store = SQLStatsStore(str(tmp_path / 'sql_stats.db'))
+    monkeypatch.setattr(sql_instrumentation, '_store', stats_store)
+    return stats_store
+
+
+def _with_probes(app):
+    @app.route('/_probe/<int:count>')
+    def probe(count):
+        for subjek_id in range(count):
+            db.session.get(SubjekBuku, subjek_id + 1)
+        return jsonify(current_request_sql_stats())
+
+    @app.route('/_probe/gagal')
+    def probe_gagal():
+        try:
+            db.session.execute(text('SELECT * FROM tabel_tidak_ada'))
+        except OperationalError:
+            db.session.rollback()
+        db.session.execute(text('SELECT 1'))
+        return jsonify(current_request_sql_stats())
+    return app
+
+
+@pytest.fixture
+def app(make_app, request):
+    return _with_probes(make_app(**getattr(request, 'param', {})))
+
+
+def test_statement_shape_ignores_in_list_length():
+    assert statement_shape('SELECT *\n  FROM donasi WHERE id IN (?, ?, ?)') == \
+        statement_shape('SELECT * FROM donasi WHERE id IN (?)')
+
+
+def test_counts_queries_per_request(client, store):
+    assert client.get('/_probe/3').get_json()['count'] == 3
+    assert client.get('/_probe/1').get_json()['count'] == 1
+
+    [route] = store.worst_routes()
+    assert route['endpoint'] == 'probe'
+    assert (route['requests'], route['queries'], route['max_queries']) == (2, 4, 3)
+    assert route['nplus1'] == 0
+
+
+def test_flags_repeated_statement_as_nplus1(client, store):
+    client.get('/_probe/5')
+
+    [route] = store.worst_routes()
+    assert route['nplus1'] == 1
+    assert route['last_nplus1'].startswith('5x SELECT')
+
+
+def test_failed_statement_is_not_counted(client, store):
+    assert client.get('/_probe/gagal').get_json()['count'] == 1
+    # Query berikutnya tidak mewarisi waktu mulai statement yang gagal
+    assert client.get('/_probe/1').get_json()['count'] == 1
+
+
+@pytest.mark.parametrize('app', [{'SQL_SLOW_QUERY_MS': '0'}], indirect=True)
+def test_slow_query_is_logged_with_plan(client, store, caplog):
+    with caplog.at_level(logging.WARNING):
+        client.get('/_probe/1')
+
+    assert store.worst_routes()[0]['slow'] == 1
+    [message] = [record.getMessage() for record in caplog.records if record.getMessage().startswith('Query lambat')]
+    assert 'di probe' in message
+    assert 'subjek_buku' in message.splitlines()[-1]
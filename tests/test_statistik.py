@@ -0,0 +1,57 @@
+from datetime import datetime
+
+import pytest
+
+from app import db
+from app.models import (Donasi, DetailRiwayatDistribusi, PerpusDesa, RiwayatDistribusi, SubjekBuku,
+                        User)
+from app.utils.statistik_cube import refresh_statistik_cube
+
+
+@pytest.fixture
+def wilayah(app):
+    """Dua perpus di kecamatan berbeda, masing-masing satu distribusi di bulan Maret"""
+    year = datetime.now().year
+    with app.app_context():
+        superadmin = User(username='dinas', email='dinas@example.id', full_name='Dinas', role='superadmin')
+        superadmin.set_password('rahasia')
+        donatur = User(username='budi', email='budi@example.id', full_name='Budi', role='donatur')
+        donatur.set_password('rahasia')
+        subjek = SubjekBuku(nama='Sains')
+        kota = PerpusDesa(nama='Perpus Kota', kecamatan='Kota', desa='Kauman')
+        gunung = PerpusDesa(nama='Perpus Gunung', kecamatan='Gunung', desa='Sidomulyo')
+        db.session.add_all([superadmin, donatur, subjek, kota, gunung])
+        db.session.flush()
+        donasi = Donasi(user_id=donatur.id, whatsapp='0812', status='confirmed')
+        db.session.add(donasi)
+        db.session.flush()
+        for perpus, jumlah in ((kota, 7), (gunung, 3)):
+            distribusi = RiwayatDistribusi(perpus_id=perpus.id, created_at=datetime(year, 3, 10))
+            db.session.add(distribusi)
+            db.session.flush()
+            db.session.add(DetailRiwayatDistribusi(distribusi_id=distribusi.id, donasi_id=donasi.id,
+                                                   subjek_id=subjek.id, jumlah=jumlah))
+        db.session.commit()
+        refresh_statistik_cube()
+        ids = {'kota': kota.id, 'gunung': gunung.id}
+        db.session.refresh(superadmin)
+        db.session.expunge(superadmin)
+        return dict(ids, superadmin=superadmin, year=year)
+
+
+@pytest.mark.parametrize('filters, total', [
+    ({}, 10),
+    ({'perpus_id': 'kota'}, 7),
+    ({'kecamatan': 'Gunung'}, 3),
+])
+def test_statistik_data_filters_distributions(app, client, login, wilayah, monkeypatch, filters, total):
+    monkeypatch.setattr('app.utils.statistik_cube.start_statistik_refresh', lambda app: None)
+    login(client, 'superadmin', wilayah['superadmin'])
+    query = {key: wilayah[value] if key == 'perpus_id' else value for key, value in filters.items()}
+
+    response = client.get('/superadmin/api/statistik-data', query_string=dict(query, year=wilayah['year']))
+
+    assert response.status_code == 200
+    distributions = response.get_json()['distributions']
+    assert distributions['total'] == total
+    assert distributions['data'][2] == {'month': 3, 'count': total}